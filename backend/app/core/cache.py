@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from app.core.responses import FastJSONResponse
+from app.middleware.compression import negotiate_encoding, compress
+from app.core.metrics import Counter, Gauge
+from app.core.config import settings
+
+
+class CacheEntry:
+    """A cached JSON body plus lazily built compressed variants of it."""
+
+    __slots__ = ("body", "meta", "expires_at", "_encoded")
+
+    def __init__(self, body: bytes, meta: Optional[dict], expires_at: float):
+        self.body = body
+        self.meta = meta or {}
+        self.expires_at = expires_at
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        """Compressed body for ``encoding``, compressed once and then reused."""
+        body = self._encoded.get(encoding)
+        if body is None:
+            level = settings.COMPRESSION_BROTLI_QUALITY if encoding == "br" else settings.COMPRESSION_GZIP_LEVEL
+            body = self._encoded[encoding] = compress(self.body, encoding, level)
+        return body
+
+    def response(self, request: Request) -> Response:
+        """Build a response, using a precompressed variant when the client accepts one."""
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = None
+        if len(self.body) >= settings.COMPRESSION_MINIMUM_SIZE:
+            encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+
+        if encoding is None:
+            return Response(self.body, media_type="application/json", headers=headers)
+
+        headers["Content-Encoding"] = encoding
+        return Response(self.encoded(encoding), media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """In-process TTL cache of rendered JSON responses, bounded in size (LRU)."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: Hashable, content: Any, meta: Optional[dict] = None) -> CacheEntry:
+        """Render ``content`` to JSON once and store it."""
+        body = FastJSONResponse(content).body
+        entry = CacheEntry(body, meta, time.monotonic() + self.ttl_seconds)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def get_or_set(self, key: Hashable, build: Callable[[], Any]) -> CacheEntry:
+        entry = self.get(key)
+        if entry is None:
+            entry = self.set(key, build())
+        return entry
+
+    def invalidate(self, prefix: Optional[str] = None):
+        """Drop every entry, or only those whose key starts with ``prefix``."""
+        if prefix is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if isinstance(k, tuple) and k and k[0] == prefix]:
+            del self._entries[key]
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Restaurants, menus and countries change rarely and are read on every page view
+catalog_cache = ResponseCache(
+    ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS,
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+)
+
+CACHES = {"catalog": catalog_cache}
+
+Counter(
+    "nextbite_cache_hits_total", "Response cache hits", ["cache"],
+    function=lambda: {(name,): cache.hits for name, cache in CACHES.items()},
+)
+Counter(
+    "nextbite_cache_misses_total", "Response cache misses", ["cache"],
+    function=lambda: {(name,): cache.misses for name, cache in CACHES.items()},
+)
+Gauge(
+    "nextbite_cache_hit_ratio", "Share of response cache lookups served from the cache", ["cache"],
+    function=lambda: {(name,): cache.hit_ratio for name, cache in CACHES.items()},
+)
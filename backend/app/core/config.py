@@ -7,6 +7,27 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DB_CONNECTION_BUDGET: int = 15  # Total connections across all workers; keep below Postgres max_connections
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    SQLITE_CACHE_SIZE_KB: int = 65536  # Page cache per SQLite connection (DATABASE_URL=sqlite:///...)
+    SQLITE_BUSY_TIMEOUT_SECONDS: float = 5.0  # How long a SQLite writer waits for the write lock
+    
+    # Read replicas
+    # Optional: without replica URLs every query goes to DATABASE_URL
+    DATABASE_REPLICA_URLS: Optional[str] = None  # Comma-separated; read-only endpoints use them round-robin
+    REPLICA_HEALTH_CHECK_SECONDS: float = 5.0
+    REPLICA_MAX_LAG_SECONDS: float = 5.0  # Replicas further behind get no reads (Postgres)
+    READ_YOUR_WRITES_SECONDS: float = 5.0  # After a user's write, their reads stay on the primary this long (X-Read-After)
+    
+    # Country shards
+    # Optional: restaurants, menus and orders of the listed countries live in their own database
+    DATABASE_SHARDS: Optional[str] = None  # Comma-separated Country=URL pairs; set up with scripts/init_shards.py
+    
+    # Server
+    WEB_CONCURRENCY: Optional[int] = None  # Worker processes; set by app.serve
+    SHUTDOWN_DRAIN_DELAY_SECONDS: float = 5.0  # app.serve: keep serving (with /ready failing) before closing the listener
+    SHUTDOWN_TIMEOUT_SECONDS: float = 30.0  # Deadline for in-flight requests to finish
+    SHUTDOWN_WORKER_TIMEOUT_SECONDS: float = 10.0  # Deadline for background workers to finish their batch
     
     # JWT
     JWT_SECRET_KEY: str
@@ -14,19 +35,90 @@ class Settings(BaseSettings):
     JWT_EXPIRATION_MINUTES: int = 1440  # 24 hours
     
     # Stripe
-    STRIPE_SECRET_KEY: str
-    STRIPE_PUBLISHABLE_KEY: str
+    # Optional: card payments are disabled (cash still works) when not set
+    STRIPE_SECRET_KEY: Optional[str] = None
+    STRIPE_PUBLISHABLE_KEY: Optional[str] = None
+    STRIPE_API_BASE: Optional[str] = None  # e.g. http://127.0.0.1:12111 for scripts/fake_stripe.py
+    STRIPE_WEBHOOK_SECRET: Optional[str] = None
+    
+    # Payment event workers (webhook inbox)
+    PAYMENT_EVENT_WORKERS: int = 2  # 0 disables in-process processing
+    PAYMENT_EVENT_BATCH_SIZE: int = 100
+    PAYMENT_EVENT_POLL_SECONDS: float = 1.0
+    PAYMENT_EVENT_MAX_ATTEMPTS: int = 5
+    PAYMENT_EVENT_RETRY_SECONDS: float = 5.0  # First retry delay, doubled on each attempt
+    
+    # Abandoned-cart sweeper
+    CART_TTL_SECONDS: float = 7 * 24 * 3600.0  # Carts idle this long are deleted; 0 disables the sweeper
+    CART_SWEEP_BATCH_SIZE: int = 500  # Carts deleted per transaction
+    CART_SWEEP_INTERVAL_SECONDS: float = 60.0  # Pause once no expired carts are left
     
     # CORS
     FRONTEND_URL: str = "http://localhost:5173"
     
     # Email
-    SMTP_HOST: str
+    # Optional: without SMTP_HOST emails are kept in the outbox but not sent
+    SMTP_HOST: Optional[str] = None
     SMTP_PORT: int = 587
-    SMTP_USER: str
-    SMTP_PASSWORD: str
-    SMTP_FROM_EMAIL: str
+    SMTP_USER: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_FROM_EMAIL: str = "noreply@nextbite.com"
     SMTP_FROM_NAME: str = "NextBite"
+    SMTP_USE_TLS: bool = True
+    SMTP_TIMEOUT_SECONDS: float = 30.0
+    
+    # Email outbox sender
+    EMAIL_OUTBOX_ENABLED: bool = True
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_POLL_SECONDS: float = 2.0
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    EMAIL_OUTBOX_RETRY_SECONDS: float = 30.0  # First retry delay, doubled on each attempt
+    EMAIL_TEMPLATE_CACHE_DIR: Optional[str] = None  # Jinja2 bytecode cache shared by workers
+    
+    # Adaptive concurrency limit per worker (defaults derive from the DB pool size)
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_INITIAL_LIMIT: Optional[int] = None  # Default: pool_size + max_overflow
+    CONCURRENCY_MIN_LIMIT: int = 2
+    CONCURRENCY_MAX_LIMIT: Optional[int] = None  # Default: twice the initial limit
+    CONCURRENCY_MAX_QUEUE: int = 50
+    CONCURRENCY_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    CONCURRENCY_RETRY_AFTER_SECONDS: int = 1
+    CONCURRENCY_LATENCY_TOLERANCE: float = 2.0  # Back off when recent latency exceeds baseline by this factor
+    
+    # Response compression
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Bytes; smaller responses are sent uncompressed
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Catalog cache (restaurants, menus, countries)
+    CATALOG_CACHE_TTL_SECONDS: float = 60.0
+    CATALOG_CACHE_MAX_ENTRIES: int = 1024
+    
+    # Streaming exports (GET /orders/export, GET /users/export)
+    EXPORT_MAX_CONCURRENT: int = 2  # Per worker; each export holds a DB connection while it streams
+    
+    # Order export (scripts/export_orders.py)
+    ORDER_EXPORT_DIR: str = "exports/orders"  # Arrow files of completed orders, by month and country
+    
+    # Metrics
+    METRICS_MULTIPROC_DIR: Optional[str] = None  # Shared directory for merging metrics of all workers
+    METRICS_FLUSH_SECONDS: float = 5.0  # How often each worker writes its snapshot there
+    
+    # Tracing (disabled unless an export target is set)
+    TRACING_SAMPLE_RATE: float = 0.0  # Share of requests without a sampled traceparent to trace
+    TRACING_EXPORT_FILE: Optional[str] = None  # JSON lines, one span per line
+    TRACING_OTLP_ENDPOINT: Optional[str] = None  # e.g. http://localhost:4318/v1/traces
+    TRACING_BATCH_SIZE: int = 512
+    TRACING_FLUSH_SECONDS: float = 2.0
+    
+    # Readiness (/ready returns 503 when a threshold is exceeded)
+    READY_DB_PROBE_INTERVAL_SECONDS: float = 2.0  # DB probe result is reused for this long
+    READY_DB_PROBE_TIMEOUT_SECONDS: float = 2.0
+    READY_LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+    READY_MAX_LOOP_LAG_SECONDS: float = 0.5
+    READY_MAX_POOL_SATURATION: float = 1.0  # Share of pool + overflow checked out
+    READY_MAX_PAYMENT_EVENT_BACKLOG: Optional[int] = None  # Queue limits are off by default:
+    READY_MAX_EMAIL_BACKLOG: Optional[int] = None  # queues are shared by all workers
     
     # App
     APP_NAME: str = "NextBite"
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+
+class Lifecycle:
+    """Process-wide shutdown state shared by the server, middleware and readiness probe.
+
+    Shutdown happens in stages: ``begin_drain()`` marks the worker as draining
+    (``/ready`` turns 503 so the load balancer stops routing here, and responses
+    ask clients to close keep-alive connections), in-flight requests are then
+    allowed to finish, and only after that are background workers and the
+    database engine shut down.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self.drain_started_at = None
+        self.in_flight = 0
+
+    def begin_drain(self):
+        if not self.draining:
+            self.draining = True
+            self.drain_started_at = time.monotonic()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Wait until no request is in flight; returns False if the deadline passed first."""
+        deadline = time.monotonic() + timeout
+        while self.in_flight > 0:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+
+lifecycle = Lifecycle()
@@ -0,0 +1,285 @@
+"""
+Minimal Prometheus metrics.
+
+Recording is lock-free: every thread writes to its own shard of a metric (a
+plain dict only that thread mutates), and shards are summed when the metrics
+are collected. A request handled on the event loop therefore never waits on
+a lock held by a threadpool thread, and vice versa.
+
+With several worker processes each process only sees its own numbers. When
+METRICS_MULTIPROC_DIR is set, workers periodically write a snapshot of their
+metrics to that directory and ``/metrics`` merges all snapshots.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import orjson
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Registry:
+    """Holds metrics and turns them into Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+
+    def register(self, metric: "_Metric"):
+        if any(m.name == metric.name for m in self._metrics):
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics.append(metric)
+
+    def collect(self) -> Dict[str, dict]:
+        """Current values of every metric, keyed by metric name."""
+        return {metric.name: metric.collect() for metric in self._metrics}
+
+    def write_snapshot(self, directory: str):
+        """Write this process's metrics to ``directory`` (atomically, via rename)."""
+        families = self.collect()
+        for family in families.values():
+            family["samples"] = [[list(labels), value] for labels, value in family["samples"].items()]
+
+        path = Path(directory) / f"{os.getpid()}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(families))
+        os.replace(tmp_path, path)
+
+    def collect_multiprocess(self, directory: str) -> Dict[str, dict]:
+        """Merge the snapshots of all worker processes (including a fresh one of our own).
+
+        Counters and histograms of exited workers are kept so totals never go
+        backwards; their gauges are dropped since they describe a dead process.
+        """
+        self.write_snapshot(directory)
+
+        merged: Dict[str, dict] = {}
+        for path in Path(directory).glob("*.json"):
+            try:
+                families = orjson.loads(path.read_bytes())
+            except (OSError, orjson.JSONDecodeError):
+                continue  # Being replaced or removed right now
+            alive = _pid_alive(int(path.stem)) if path.stem.isdigit() else False
+
+            for name, family in families.items():
+                if family["type"] == "gauge" and not alive:
+                    continue
+                target = merged.setdefault(name, {**family, "samples": {}})
+                samples = target["samples"]
+                for labels, value in family["samples"]:
+                    labels = tuple(labels)
+                    if family["type"] == "histogram":
+                        current = samples.get(labels)
+                        if current is None:
+                            samples[labels] = [list(value[0]), value[1]]
+                        else:
+                            current[0] = [a + b for a, b in zip(current[0], value[0])]
+                            current[1] += value[1]
+                    else:
+                        samples[labels] = samples.get(labels, 0.0) + value
+        return merged
+
+    def expose(self, families: Optional[Dict[str, dict]] = None) -> str:
+        """Render metrics in the Prometheus text exposition format."""
+        if families is None:
+            families = self.collect()
+
+        lines = []
+        for name, family in families.items():
+            lines.append(f"# HELP {name} {family['doc']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            labelnames = family["labelnames"]
+            for labels, value in family["samples"].items():
+                if family["type"] == "histogram":
+                    counts, total = value
+                    cumulative = 0
+                    for bound, count in zip(family["buckets"] + [float("inf")], counts):
+                        cumulative += count
+                        le = _format_labels(labelnames + ["le"], labels + (_format_value(bound),))
+                        lines.append(f"{name}_bucket{le} {cumulative}")
+                    label_str = _format_labels(labelnames, labels)
+                    lines.append(f"{name}_sum{label_str} {_format_value(total)}")
+                    lines.append(f"{name}_count{label_str} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function: Optional[Callable] = None,
+        registry: Registry = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        # Optional callback evaluated at collection time instead of recorded values.
+        # It returns a number, or a dict of label values tuple -> number.
+        self._function = function
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        registry.register(self)
+
+    def _shard(self) -> dict:
+        """This thread's private values; only the owning thread ever writes to it."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            self._shards.append(values)
+            return values
+
+    def _merged(self) -> Dict[LabelValues, float]:
+        if self._function is not None:
+            result = self._function()
+            return result if isinstance(result, dict) else {(): result}
+        merged: Dict[LabelValues, float] = {}
+        for shard in self._shards:
+            for labels, value in dict(shard).items():
+                merged[labels] = merged.get(labels, 0.0) + value
+        return merged
+
+    def collect(self) -> dict:
+        return {
+            "type": self.type,
+            "doc": self.documentation,
+            "labelnames": self.labelnames,
+            "samples": self._merged(),
+        }
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+
+    type = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        values = self._shard()
+        values[labelvalues] = values.get(labelvalues, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down (use ``function`` for values read on demand)."""
+
+    type = "gauge"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        values = self._shard()
+        values[labelvalues] = values.get(labelvalues, 0.0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (e.g. latencies) over fixed buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(name, documentation, labelnames, **kwargs)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value: float, *labelvalues: str):
+        values = self._shard()
+        state = values.get(labelvalues)
+        if state is None:
+            # [per-bucket counts (last one is +Inf), sum]
+            state = values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        """Observe how long the ``with`` block takes, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def _merged(self):
+        merged = {}
+        for shard in self._shards:
+            for labels, (counts, total) in dict(shard).items():
+                current = merged.get(labels)
+                if current is None:
+                    merged[labels] = [list(counts), total]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+        return merged
+
+    def collect(self) -> dict:
+        family = super().collect()
+        family["buckets"] = self.buckets
+        return family
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(labelnames: List[str], labelvalues: Iterable[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, labelvalues):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# Application metrics. Pool and cache metrics are defined next to the engine
+# (app.db.database) and the caches (app.core.cache).
+HTTP_REQUEST_DURATION = Histogram(
+    "nextbite_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status code",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "nextbite_http_requests_in_flight",
+    "HTTP requests currently being handled",
+)
+STRIPE_REQUEST_DURATION = Histogram(
+    "nextbite_stripe_request_duration_seconds",
+    "Latency of Stripe API calls",
+    ["operation"],
+)
+SMTP_DURATION = Histogram(
+    "nextbite_smtp_duration_seconds",
+    "Latency of SMTP connects and message sends",
+    ["operation"],
+)
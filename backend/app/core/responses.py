@@ -0,0 +1,24 @@
+from typing import Any
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any):
+    """Serialize objects orjson does not handle natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """JSON response rendered with orjson.
+
+    Used as the app-wide default response class. Routes can also return it
+    directly with already-validated Pydantic models (or lists of them) or with
+    plain dicts built from rows; FastAPI then skips the second response_model
+    validation and the jsonable_encoder pass, and the content is serialized once.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
@@ -0,0 +1,299 @@
+"""
+Lightweight request tracing.
+
+Spans are only recorded inside a sampled trace. Sampling is decided once per
+request (or background batch) at the root span; everywhere else ``tracer.span()``
+is a single context variable lookup returning a shared no-op span, so
+instrumented code costs next to nothing when a request is not sampled.
+
+Incoming W3C ``traceparent`` headers are continued (a sampled parent is always
+sampled), and finished spans are exported in batches from a background thread
+to a JSON-lines file and/or an OTLP/HTTP (JSON) collector.
+"""
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import orjson
+from app.core.config import settings
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "kind",
+                 "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer.exporter.add(self)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """Stand-in returned when the current request is not being traced."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def parse_traceparent(header: Optional[str]):
+    """Return (trace_id, parent_span_id, sampled) from a traceparent header, or None."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    _, trace_id, span_id, flags = parts[:4]
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 0x01)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, sampled
+
+
+class BatchSpanExporter:
+    """Buffers finished spans and writes them out in batches from a daemon thread.
+
+    ``add`` is a deque append, so ending a span never blocks on I/O. When the
+    buffer is full, new spans are dropped (and counted) rather than queued.
+    """
+
+    def __init__(
+        self,
+        file_path: Optional[str] = None,
+        otlp_endpoint: Optional[str] = None,
+        service_name: str = "nextbite-api",
+        batch_size: int = 512,
+        flush_interval: float = 2.0,
+        max_queue_size: int = 8192,
+    ):
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self._queue: deque = deque()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.otlp_endpoint)
+
+    def add(self, span: Span):
+        if len(self._queue) >= self.max_queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if self._thread is None:
+            self.start()
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Span export failed: {str(e)}")
+
+    def flush(self):
+        """Export everything buffered so far."""
+        with self._flush_lock:
+            while self._queue:
+                batch: List[Span] = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                if self.file_path:
+                    self._write_file(batch)
+                if self.otlp_endpoint:
+                    self._post_otlp(batch)
+
+    def _write_file(self, batch: List[Span]):
+        lines = b"".join(orjson.dumps({
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "kind": span.kind,
+            "start_ns": span.start_ns,
+            "duration_ms": (span.end_ns - span.start_ns) / 1e6,
+            "attributes": span.attributes,
+            "error": span.error,
+        }, default=str) + b"\n" for span in batch)
+        with open(self.file_path, "ab") as f:
+            f.write(lines)
+
+    def _post_otlp(self, batch: List[Span]):
+        body = orjson.dumps({"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "nextbite"},
+                "spans": [_otlp_span(span) for span in batch],
+            }],
+        }]})
+        request = urllib.request.Request(
+            self.otlp_endpoint, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+
+# OTLP span kinds: 1 internal, 2 server, 3 client
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Span) -> dict:
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": _OTLP_KINDS.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    return data
+
+
+class Tracer:
+    """Creates spans. Disabled (everything is a no-op) when no exporter is configured."""
+
+    def __init__(self, exporter: BatchSpanExporter, sample_rate: float = 0.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter.enabled
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, kind: str = "server",
+                    attributes: Optional[Dict[str, Any]] = None):
+        """Start a root span (continuing ``traceparent`` if given), or NOOP_SPAN if not sampled."""
+        if not self.enabled:
+            return NOOP_SPAN
+
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = None, None
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled:
+            return NOOP_SPAN
+
+        return Span(self, name, trace_id or os.urandom(16).hex(), parent_id, kind, attributes)
+
+    def span(self, name: str, kind: str = "internal", **attributes):
+        """Child span of the current span; a no-op outside a sampled trace.
+
+        Use it as a context manager, or call ``end()`` yourself from callbacks
+        (e.g. SQLAlchemy events) that have no ``with`` block.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, kind, attributes)
+
+    def current_span(self):
+        return _current_span.get() or NOOP_SPAN
+
+
+tracer = Tracer(
+    BatchSpanExporter(
+        file_path=settings.TRACING_EXPORT_FILE,
+        otlp_endpoint=settings.TRACING_OTLP_ENDPOINT,
+        batch_size=settings.TRACING_BATCH_SIZE,
+        flush_interval=settings.TRACING_FLUSH_SECONDS,
+    ),
+    sample_rate=settings.TRACING_SAMPLE_RATE,
+)
@@ -0,0 +1,79 @@
+"""
+Archived order history.
+
+Once orders are partitioned by month (scripts/partitions.py), old months with
+only completed or cancelled orders are detached into the ``archive`` schema:
+``archive.orders`` (partitioned the same way) and ``archive.order_items``. The
+live tables stay small, so cart lookups and checkouts never touch history.
+
+History reads call ``load_archived_orders`` to add archived orders to the live
+ones. Archived rows load as ordinary ``Order``/``OrderItem`` objects; they're
+read-only (nothing writes to orders that are finished).
+"""
+import time
+from typing import Dict, List
+from sqlalchemy import Column, MetaData, Table, text
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models.order import Order
+from app.models.order_item import OrderItem
+
+ARCHIVE_SCHEMA = "archive"
+
+# How long a database without an archive is trusted to stay that way
+_MISSING_ARCHIVE_RECHECK_SECONDS = 60.0
+
+_archive_metadata = MetaData()
+
+
+def _archive_table(table: Table) -> Table:
+    """Same columns as ``table``, in the archive schema (no foreign keys: they'd point outside it)."""
+    return Table(
+        table.name, _archive_metadata,
+        *(Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in table.columns),
+        schema=ARCHIVE_SCHEMA,
+    )
+
+
+archive_orders = _archive_table(Order.__table__)
+archive_order_items = _archive_table(OrderItem.__table__)
+
+ArchivedOrder = aliased(Order, archive_orders, adapt_on_names=True)
+ArchivedOrderItem = aliased(OrderItem, archive_order_items, adapt_on_names=True)
+
+# Database URL -> True, or the monotonic time it was last seen without an archive
+_archive_state: Dict[str, object] = {}
+
+
+def archive_available(db: Session) -> bool:
+    """Whether ``db``'s database has archived orders (only Postgres ever does)."""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    key = str(bind.url)
+    state = _archive_state.get(key)
+    if state is True:
+        return True
+    if state is not None and time.monotonic() - state < _MISSING_ARCHIVE_RECHECK_SECONDS:
+        return False
+    found = db.execute(text("SELECT to_regclass(:name) IS NOT NULL"),
+                       {"name": f"{ARCHIVE_SCHEMA}.orders"}).scalar()
+    _archive_state[key] = True if found else time.monotonic()
+    return bool(found)
+
+
+def load_archived_orders(db: Session, *criteria) -> List[Order]:
+    """Archived orders matching ``criteria`` (on ``ArchivedOrder``), with their items loaded."""
+    if not archive_available(db):
+        return []
+    orders = db.query(ArchivedOrder).filter(*criteria).all()
+    if not orders:
+        return []
+
+    items: Dict[int, List[OrderItem]] = {order.id: [] for order in orders}
+    for item in db.query(ArchivedOrderItem).filter(ArchivedOrderItem.order_id.in_(list(items))):
+        items[item.order_id].append(item)
+    for order in orders:
+        # The relationship would look in the live order_items table
+        set_committed_value(order, "order_items", items[order.id])
+    return orders
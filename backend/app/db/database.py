@@ -1,17 +1,170 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+from app.core.tracing import NOOP_SPAN, tracer
 
-# Create database engine with connection pool settings
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using
-    pool_recycle=3600,   # Recycle connections after 1 hour
-    pool_size=5,         # Number of connections to maintain
-    max_overflow=10,     # Max connections beyond pool_size
-    connect_args={"connect_timeout": 10}  # Connection timeout
+POOL_WAIT = Histogram(
+    "nextbite_db_pool_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
 )
+POOL_TIMEOUTS = Counter(
+    "nextbite_db_pool_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT_SECONDS",
+)
+
+
+def pool_limits(connection_budget: int, workers: int) -> tuple:
+    """Split the global connection budget across worker processes.
+
+    Returns (pool_size, max_overflow) for one worker: a third of its share is
+    kept open and the rest is overflow, so the sum over all workers never
+    exceeds the budget (each worker gets at least one connection).
+    """
+    per_worker = max(connection_budget // max(workers, 1), 1)
+    pool_size = max(per_worker // 3, 1)
+    return pool_size, per_worker - pool_size
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start)
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def create_db_engine(database_url: str, pool_size: int = 5, max_overflow: int = 10) -> Engine:
+    """Create an engine with settings that suit the database behind ``database_url``.
+
+    Postgres gets a timed, sized connection pool with pre-ping and a connect
+    timeout. SQLite gets WAL journaling (readers don't block the writer),
+    ``synchronous=NORMAL``, a page cache of SQLITE_CACHE_SIZE_KB and foreign keys
+    enforced as on Postgres; an in-memory SQLite database keeps a single shared
+    connection (StaticPool), which is what tests and benchmarks want.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            poolclass=TimedQueuePool,
+            pool_pre_ping=True,  # Verify connections before using
+            pool_recycle=3600,   # Recycle connections after 1 hour
+            pool_size=pool_size,         # Number of connections to maintain
+            max_overflow=max_overflow,   # Max connections beyond pool_size
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            connect_args={"connect_timeout": 10}  # Connection timeout
+        )
+    
+    in_memory = _is_sqlite_memory(url)
+    # Sessions are used from the threadpool and background threads
+    connect_args = {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_SECONDS}
+    if in_memory:
+        sqlite_engine = create_engine(url, poolclass=StaticPool, connect_args=connect_args)
+    else:
+        sqlite_engine = create_engine(
+            url,
+            poolclass=TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            connect_args=connect_args,
+        )
+    
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")  # Negative = KiB
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+    
+    return sqlite_engine
+
+
+def pool_usage(pool) -> tuple:
+    """(checked out, overflow) connections of ``pool``; (0, 0) for pools that don't count them."""
+    if not hasattr(pool, "checkedout"):
+        return 0, 0  # e.g. the StaticPool of an in-memory SQLite database
+    return pool.checkedout(), max(pool.overflow(), 0)
+
+
+POOL_SIZE, MAX_OVERFLOW = pool_limits(settings.DB_CONNECTION_BUDGET, settings.WEB_CONCURRENCY or 1)
+
+engine = create_db_engine(settings.DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+
+Gauge(
+    "nextbite_db_pool_checked_out",
+    "Database connections currently checked out of the pool",
+    function=lambda: pool_usage(engine.pool)[0],
+)
+Gauge(
+    "nextbite_db_pool_overflow",
+    "Overflow connections currently open beyond pool_size",
+    function=lambda: pool_usage(engine.pool)[1],
+)
+Gauge(
+    "nextbite_db_pool_size",
+    "Configured number of pooled database connections",
+    function=lambda: engine.pool.size() if hasattr(engine.pool, "size") else 1,
+)
+
+# Tracing: a span per SQL statement and per session commit (flush included).
+# These are no-ops unless the current request is sampled.
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+    span = tracer.span("db.query", kind="client")
+    if span is not NOOP_SPAN:
+        span.set_attribute("db.statement", statement[:1000])
+        context._trace_span = span
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query_span(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        span.end()
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_query_span(exception_context):
+    span = getattr(exception_context.execution_context, "_trace_span", None)
+    if span is not None:
+        span.record_error(exception_context.original_exception)
+        span.end()
+
+
+@event.listens_for(Session, "before_commit")
+def _start_commit_span(session):
+    span = tracer.span("db.commit", kind="client")
+    if span is not NOOP_SPAN:
+        session.info["trace_commit_span"] = span
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _end_commit_span(session, transaction):
+    span = session.info.pop("trace_commit_span", None)
+    if span is not None:
+        span.end()
+
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
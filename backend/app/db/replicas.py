@@ -0,0 +1,239 @@
+"""
+Read replicas.
+
+Read-only endpoints take their session from ``get_read_db``, which hands out a
+session on a healthy replica (round-robin) when DATABASE_REPLICA_URLS is set
+and the primary session otherwise. Writes always go to the primary.
+
+A user whose request committed a write reads from the primary for the next
+READ_YOUR_WRITES_SECONDS, so the cart they just edited is never read back
+from a replica that hasn't replayed the change yet. The pin travels with the
+client: write responses carry an ``X-Read-After`` token (the user and the time
+of the write, signed with JWT_SECRET_KEY) that the client sends back on its
+next requests, so any worker of any instance honours it.
+ReadYourWritesMiddleware does the header handling.
+"""
+import base64
+import hashlib
+import hmac
+import itertools
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+from fastapi import Depends
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+from app.db.database import create_db_engine, get_db, POOL_SIZE, MAX_OVERFLOW
+from app.middleware.auth import get_current_active_user
+from app.models.user import User
+
+READ_SESSIONS = Counter(
+    "nextbite_db_read_sessions_total",
+    "Sessions handed to read-only endpoints, by target",
+    ["target"],
+)
+
+# Seconds since the last replayed transaction, or 0 when the replica has
+# replayed everything it received (an idle primary writes no WAL)
+_POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    """One read replica: its engine, session factory and last health check result."""
+
+    def __init__(self, name: str, url: str, pool_size: int, max_overflow: int):
+        self.name = name
+        self.engine = create_db_engine(url, pool_size=pool_size, max_overflow=max_overflow)
+        self.sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.healthy = False  # Until the first health check passes
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        @event.listens_for(self.engine, "handle_error")
+        def _mark_unhealthy(exception_context):
+            # Stop routing reads here right away instead of waiting for the next check
+            if exception_context.is_disconnect:
+                self.healthy = False
+                self.last_error = str(exception_context.original_exception)
+
+    def check(self, max_lag: float):
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                lag = None
+                if self.engine.dialect.name == "postgresql":
+                    lag = connection.execute(_POSTGRES_LAG_QUERY).scalar()
+                    lag = float(lag) if lag is not None else None
+        except Exception as e:
+            self.healthy = False
+            self.last_error = str(e)
+            return
+        self.lag_seconds = lag
+        if lag is not None and lag > max_lag:
+            self.healthy = False
+            self.last_error = f"replication lag {lag:.1f}s"
+        else:
+            self.healthy = True
+            self.last_error = None
+
+    def status(self) -> dict:
+        return {"healthy": self.healthy, "lag_seconds": self.lag_seconds, "error": self.last_error}
+
+
+class ReplicaSet:
+    """Round-robin over healthy replicas."""
+
+    def __init__(self, urls: List[str], pool_size: int, max_overflow: int,
+                 max_lag: float = 5.0, pin_seconds: float = 5.0):
+        self.replicas = [
+            Replica(f"replica-{i}", url, pool_size, max_overflow) for i, url in enumerate(urls)
+        ]
+        self.max_lag = max_lag
+        self.pin_seconds = pin_seconds  # How long after a write its user reads from the primary
+        self._next = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[Replica]:
+        """Next healthy replica, or None if there is none."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def check_health(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def status(self) -> dict:
+        return {replica.name: replica.status() for replica in self.replicas}
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+
+def _replica_urls() -> List[str]:
+    if not settings.DATABASE_REPLICA_URLS:
+        return []
+    return [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+
+replica_set = ReplicaSet(
+    _replica_urls(),
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    pin_seconds=settings.READ_YOUR_WRITES_SECONDS,
+)
+
+Gauge(
+    "nextbite_db_replica_healthy", "Whether a read replica is receiving reads (1) or not (0)", ["replica"],
+    function=lambda: {(replica.name,): float(replica.healthy) for replica in replica_set.replicas},
+)
+
+
+READ_AFTER_HEADER = "X-Read-After"
+
+# Per request (set by ReadYourWritesMiddleware): the user whose write this request
+# committed, and the write time from the token the client sent, if valid
+_request_writes: ContextVar[Optional[dict]] = ContextVar("request_writes", default=None)
+
+
+def _signature(payload: str) -> str:
+    digest = hmac.new(settings.JWT_SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+def read_after_token(user_id: int, written_at: float) -> str:
+    """``<user id>.<write time in ms>.<signature>``, for the X-Read-After header."""
+    payload = f"{user_id}.{int(written_at * 1000)}"
+    return f"{payload}.{_signature(payload)}"
+
+
+def parse_read_after_token(token: str) -> Optional[tuple]:
+    """(user id, write time) of a token this app signed, or None."""
+    payload, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature.encode(), _signature(payload).encode()):
+        return None
+    try:
+        user_id, written_ms = payload.split(".")
+        return int(user_id), int(written_ms) / 1000
+    except ValueError:
+        return None
+
+
+def begin_request(read_after: Optional[str]):
+    """Start tracking a request's writes; returns the state and a reset token for ``end_request``."""
+    state = {"writer": None, "read_after": parse_read_after_token(read_after) if read_after else None}
+    return state, _request_writes.set(state)
+
+
+def end_request(reset):
+    _request_writes.reset(reset)
+
+
+def _wrote_recently(user_id: int) -> bool:
+    state = _request_writes.get()
+    if state is None or state["read_after"] is None:
+        return False
+    token_user, written_at = state["read_after"]
+    return token_user == user_id and time.time() < written_at + replica_set.pin_seconds
+
+
+@event.listens_for(Session, "after_commit")
+def _note_write(session):
+    # Only request sessions carry a user id (set by get_current_user); reads don't commit
+    user_id = session.info.get("user_id")
+    state = _request_writes.get()
+    if user_id is not None and state is not None:
+        state["writer"] = user_id
+
+
+@event.listens_for(Session, "before_flush")
+def _refuse_replica_writes(session, flush_context, instances):
+    if session.info.get("replica"):
+        raise RuntimeError(f"Write attempted on a read replica session ({session.info['replica']})")
+
+
+def read_session(db: Session, current_user: User):
+    """A replica session when one is usable, else the request's primary session ``db``.
+
+    Falls back to the primary when no replica is configured or healthy, or when
+    the request carries the user's X-Read-After token from a write in the last
+    READ_YOUR_WRITES_SECONDS.
+    """
+    replica = None
+    if replica_set.enabled and not _wrote_recently(current_user.id):
+        replica = replica_set.choose()
+    if replica is None:
+        READ_SESSIONS.inc("primary")
+        yield db
+        return
+
+    READ_SESSIONS.inc("replica")
+    # The primary session has done its part (loading the user); return its
+    # connection to the pool rather than holding it while the replica works.
+    # ``current_user`` stays usable, detached with its columns loaded.
+    db.close()
+    session = replica.sessionmaker()
+    session.info["replica"] = replica.name
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def get_read_db(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Dependency for read-only endpoints: a replica session when one is usable."""
+    yield from read_session(db, current_user)
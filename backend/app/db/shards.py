@@ -0,0 +1,255 @@
+"""
+Country shards.
+
+Restaurants, menus and orders are only ever read within one country by
+non-admins, so each country can live in its own database. DATABASE_SHARDS maps
+countries to database URLs; countries that aren't listed (and users without a
+country) stay on DATABASE_URL, the "default" shard. Users, payment methods and
+the auth data stay on DATABASE_URL for everyone.
+
+Country-scoped endpoints take their session from ``get_shard_db`` (or
+``get_shard_read_db`` for reads), which picks the shard from the principal's
+country. Endpoints for one order use ``get_order_shard_db`` (or
+``get_order_shard_read_db``) instead, which finds the shard holding that order,
+so admins and managers can act on any country's orders. Admin-wide views fan
+out to every shard in parallel with ``shard_map.scatter`` and merge the results.
+
+Each shard keeps a reference copy of the users whose orders it holds (so
+foreign keys hold and receipts can be addressed), synced on first use per
+process. Ids are unique across shards as long as shards were set up with
+scripts/init_shards.py, which gives each shard its own id range.
+"""
+import asyncio
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+from fastapi import Depends
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.db.database import SessionLocal, create_db_engine, engine, get_db, POOL_SIZE, MAX_OVERFLOW
+from app.db.archive import ArchivedOrder, archive_available
+from app.db.replicas import read_session
+from app.middleware.auth import get_current_active_user
+from app.models.order import Order
+from app.models.user import User
+
+T = TypeVar("T")
+
+# Ids handed out per table per shard; shard N starts at N * SHARD_ID_STRIDE
+# (ids are 32-bit on Postgres, so this leaves room for 20 shards)
+SHARD_ID_STRIDE = 100_000_000
+
+DEFAULT_SHARD = "default"
+
+
+class Shard:
+    """One database holding the country-scoped data of one or more countries."""
+
+    def __init__(self, name: str, index: int, engine, sessionmaker):
+        self.name = name
+        self.index = index  # Position in DATABASE_SHARDS; picks the shard's id range
+        self.engine = engine
+        self.sessionmaker = sessionmaker
+
+    @property
+    def first_id(self) -> int:
+        return self.index * SHARD_ID_STRIDE
+
+
+class ShardMap:
+    """Country -> shard routing, plus parallel fan-out to every shard."""
+
+    def __init__(self, default: Shard, shards: Dict[str, Shard]):
+        self.default = default
+        self.by_country = shards
+        self._reference_users: Set[Tuple[str, int]] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.by_country)
+
+    def all(self) -> List[Shard]:
+        return [self.default, *self.by_country.values()]
+
+    def for_country(self, country: Optional[str]) -> Shard:
+        return self.by_country.get(country, self.default) if country else self.default
+
+    def named(self, name: Optional[str]) -> Shard:
+        """Shard by name (a country in DATABASE_SHARDS); unknown names map to the default shard."""
+        return self.by_country.get(name, self.default)
+
+    def for_id(self, row_id: int) -> Shard:
+        """Shard whose id range (see SHARD_ID_STRIDE) holds ``row_id``; the default shard if none does."""
+        index = row_id // SHARD_ID_STRIDE
+        return next((shard for shard in self.all() if shard.index == index), self.default)
+
+    def locate(self, db: Session, current_user: User, row_id: int, exists: Callable[[Session], bool]) -> Shard:
+        """Shard holding the row ``row_id`` for which ``exists`` is true.
+
+        The shard of the id's range is asked first, then the user's own shard,
+        then the rest: rows moved by scripts/init_shards.py --move kept their
+        DATABASE_URL ids, and SQLite shards have no id ranges. Falls back to the
+        id range's shard when no shard has the row (the caller then 404s).
+        Without shards this is the default shard, with no query.
+        """
+        first = self.for_id(row_id)
+        if not self.enabled:
+            return first
+        candidates = [first, self.for_country(current_user.country)]
+        candidates += [shard for shard in self.all() if shard not in candidates]
+        for shard in dict.fromkeys(candidates):
+            if shard is self.default:
+                if exists(db):
+                    return shard
+                continue
+            session = shard.sessionmaker()
+            try:
+                if exists(session):
+                    return shard
+            finally:
+                session.close()
+        return first
+
+    async def scatter(self, db: Session, load: Callable[[Session], T]) -> List[T]:
+        """Run ``load`` against every shard in parallel; results in shard order.
+
+        Without shards this is just ``[load(db)]`` on the request's own session.
+        Otherwise every shard gets a fresh session in a worker thread, so the
+        slowest shard sets the latency instead of the sum of all of them.
+        """
+        if not self.enabled:
+            return [load(db)]
+
+        def run(shard: Shard) -> T:
+            session = shard.sessionmaker()
+            try:
+                return load(session)
+            finally:
+                session.close()
+
+        return list(await asyncio.gather(*(asyncio.to_thread(run, shard) for shard in self.all())))
+
+    def ensure_reference_user(self, shard: Shard, session: Session, user: User):
+        """Copy ``user`` into ``shard`` once per process, for foreign keys and receipts."""
+        key = (shard.name, user.id)
+        if key in self._reference_users:
+            return
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        values["password_hash"] = "!"  # Logins are checked on DATABASE_URL only
+        session.merge(User(**values))
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()  # Another worker process inserted it first
+        self._reference_users.add(key)
+
+    def dispose(self):
+        for shard in self.by_country.values():
+            shard.engine.dispose()
+
+
+def _parse_shards(value: Optional[str]) -> Dict[str, str]:
+    """``"USA=postgresql://...,India=postgresql://..."`` -> {country: url}."""
+    shards = {}
+    for entry in (value or "").split(","):
+        if not entry.strip():
+            continue
+        country, separator, url = entry.partition("=")
+        if not separator or not country.strip() or not url.strip():
+            raise ValueError(f"DATABASE_SHARDS entry must be Country=URL, got {entry.strip()!r}")
+        shards[country.strip()] = url.strip()
+    return shards
+
+
+def _build_shard_map() -> ShardMap:
+    shards = {}
+    engines = {}
+    for index, (country, url) in enumerate(_parse_shards(settings.DATABASE_SHARDS).items(), start=1):
+        # Countries listed with the same URL share one shard (and one pool)
+        if url not in engines:
+            shard_engine = create_db_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+            engines[url] = Shard(country, index, shard_engine,
+                                 sessionmaker(autocommit=False, autoflush=False, bind=shard_engine))
+        shards[country] = engines[url]
+    return ShardMap(Shard(DEFAULT_SHARD, 0, engine, SessionLocal), shards)
+
+
+shard_map = _build_shard_map()
+
+
+def _order_exists(order_id: int, archived: bool = False) -> Callable[[Session], bool]:
+    def exists(session: Session) -> bool:
+        if session.query(Order.id).filter(Order.id == order_id).first() is not None:
+            return True
+        return archived and archive_available(session) and session.query(ArchivedOrder.id).filter(
+            ArchivedOrder.id == order_id
+        ).first() is not None
+    return exists
+
+
+def shard_session(shard: Shard, current_user: User):
+    session = shard.sessionmaker()
+    session.info["shard"] = shard.name
+    try:
+        shard_map.ensure_reference_user(shard, session, current_user)
+        session.info["user_id"] = current_user.id
+        yield session
+    finally:
+        session.close()
+
+
+def get_shard_db(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Dependency for country-scoped data: a session on the principal's shard."""
+    shard = shard_map.for_country(current_user.country)
+    if shard is shard_map.default:
+        yield db
+        return
+    yield from shard_session(shard, current_user)
+
+
+def get_shard_read_db(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Like ``get_shard_db`` for read-only endpoints; the default shard reads from replicas."""
+    shard = shard_map.for_country(current_user.country)
+    if shard is shard_map.default:
+        yield from read_session(db, current_user)
+        return
+    yield from shard_session(shard, current_user)
+
+
+@contextmanager
+def session_on(shard: Shard, db: Session, current_user: User):
+    """A session on ``shard`` for code that picks its shard itself (``db`` for the default shard)."""
+    if shard is shard_map.default:
+        yield db
+        return
+    yield from shard_session(shard, current_user)
+
+
+def get_order_shard_db(
+    order_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Dependency for endpoints acting on order ``order_id``: a session on the shard that holds it."""
+    shard = shard_map.locate(db, current_user, order_id, _order_exists(order_id))
+    with session_on(shard, db, current_user) as session:
+        yield session
+
+
+def get_order_shard_read_db(
+    order_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Like ``get_order_shard_db`` for reads (archived orders count); the default shard reads from replicas."""
+    shard = shard_map.locate(db, current_user, order_id, _order_exists(order_id, archived=True))
+    if shard is shard_map.default:
+        yield from read_session(db, current_user)
+        return
+    yield from shard_session(shard, current_user)
@@ -0,0 +1,211 @@
+import heapq
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Tuple
+from sqlalchemy import func, desc
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.db.shards import shard_map
+from app.models.menu_item import MenuItem
+from app.models.order import Order, OrderStatus
+from app.models.order_item import OrderItem
+from app.models.restaurant import Restaurant
+from app.models.user import User, UserRole
+from app.services.email import queue_emails, render_manager_digest_emails
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 500
+
+
+def day_window(day: date) -> Tuple[datetime, datetime]:
+    """Return the [start, end) UTC window for a calendar day."""
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _completed_on(start: datetime, end: datetime):
+    """Filter for orders completed inside the window.
+
+    Orders have no completion timestamp; the last update is when checkout or the
+    payment webhook moved them to COMPLETED.
+    """
+    completed_at = func.coalesce(Order.updated_at, Order.created_at)
+    return (
+        Order.status == OrderStatus.COMPLETED,
+        completed_at >= start,
+        completed_at < end,
+    )
+
+
+def stream_country_summaries(db: Session, start: datetime, end: datetime, top_items: int = 5) -> Iterator[dict]:
+    """Yield one aggregated summary per country, one country at a time.
+
+    Aggregation happens in SQL and rows are streamed from a server-side cursor
+    ordered by country, so memory is bounded by the restaurants of a single
+    country rather than by the number of orders.
+    """
+    rows = db.query(
+        Restaurant.country,
+        Restaurant.name,
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.total_amount), 0.0),
+    ).join(
+        Order, Order.restaurant_id == Restaurant.id
+    ).filter(
+        Restaurant.country.isnot(None), *_completed_on(start, end)
+    ).group_by(
+        Restaurant.country, Restaurant.id, Restaurant.name
+    ).order_by(
+        Restaurant.country, desc(func.sum(Order.total_amount))
+    ).execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE)
+
+    for country, restaurant_rows in groupby(rows, key=lambda row: row[0]):
+        restaurants = [
+            {"name": name, "order_count": order_count, "revenue": float(revenue)}
+            for _, name, order_count, revenue in restaurant_rows
+        ]
+        order_count = sum(r["order_count"] for r in restaurants)
+        revenue = sum(r["revenue"] for r in restaurants)
+        yield {
+            "country": country,
+            "order_count": order_count,
+            "revenue": revenue,
+            "average_order": revenue / order_count if order_count else 0.0,
+            "restaurants": restaurants,
+            "top_items": top_country_items(db, country, start, end, top_items),
+        }
+
+
+def top_country_items(db: Session, country: str, start: datetime, end: datetime, limit: int) -> List[dict]:
+    """Most ordered menu items in a country during the window."""
+    quantity = func.sum(OrderItem.quantity)
+    rows = db.query(MenuItem.name, quantity).join(
+        OrderItem, OrderItem.menu_item_id == MenuItem.id
+    ).join(
+        Order, Order.id == OrderItem.order_id
+    ).join(
+        Restaurant, Restaurant.id == Order.restaurant_id
+    ).filter(
+        Restaurant.country == country, *_completed_on(start, end)
+    ).group_by(MenuItem.id, MenuItem.name).order_by(desc(quantity)).limit(limit).all()
+    return [{"name": name, "quantity": int(qty)} for name, qty in rows]
+
+
+def empty_summary(country: str) -> dict:
+    return {
+        "country": country,
+        "order_count": 0,
+        "revenue": 0.0,
+        "average_order": 0.0,
+        "restaurants": [],
+        "top_items": [],
+    }
+
+
+def with_empty_countries(summaries: Iterator[dict], countries) -> Iterator[dict]:
+    """Pass summaries through, then add empty ones so every country gets a digest."""
+    seen = set()
+    for summary in summaries:
+        seen.add(summary["country"])
+        yield summary
+    for country in countries:
+        if country not in seen:
+            yield empty_summary(country)
+
+
+def merge_summaries(summaries: List[dict], top_items: int = 5) -> dict:
+    """Combine summaries of one country from several shards into one.
+
+    A country's restaurants normally live on a single shard, so this usually
+    gets one summary and returns it as is.
+    """
+    if len(summaries) == 1:
+        return summaries[0]
+    order_count = sum(s["order_count"] for s in summaries)
+    revenue = sum(s["revenue"] for s in summaries)
+    quantities: Dict[str, int] = {}
+    for summary in summaries:
+        for item in summary["top_items"]:
+            quantities[item["name"]] = quantities.get(item["name"], 0) + item["quantity"]
+    return {
+        "country": summaries[0]["country"],
+        "order_count": order_count,
+        "revenue": revenue,
+        "average_order": revenue / order_count if order_count else 0.0,
+        "restaurants": sorted(
+            (r for s in summaries for r in s["restaurants"]), key=lambda r: r["revenue"], reverse=True
+        ),
+        "top_items": [
+            {"name": name, "quantity": quantity}
+            for name, quantity in sorted(quantities.items(), key=lambda item: item[1], reverse=True)[:top_items]
+        ],
+    }
+
+
+def merged_country_summaries(sessions: Iterable[Session], start: datetime, end: datetime) -> Iterator[dict]:
+    """Country summaries of every shard, merged per country and still streamed in country order."""
+    streams = [stream_country_summaries(db, start, end) for db in sessions]
+    merged = heapq.merge(*streams, key=lambda summary: summary["country"])
+    for _, country_summaries in groupby(merged, key=lambda summary: summary["country"]):
+        yield merge_summaries(list(country_summaries))
+
+
+def managers_by_country(db: Session) -> dict:
+    """Active managers grouped by their assigned country."""
+    managers = db.query(User.country, User.email, User.full_name).filter(
+        User.role == UserRole.MANAGER,
+        User.is_active == True,
+        User.country.isnot(None)
+    ).order_by(User.country).all()
+    return {
+        country: [(email, full_name) for _, email, full_name in rows]
+        for country, rows in groupby(managers, key=lambda row: row[0])
+    }
+
+
+def run_daily_digest(day: date, commit_every: int = 200) -> int:
+    """Render and queue one digest per manager for ``day``. Returns the number queued.
+
+    Orders are summarized on every shard (one read session each, streamed side
+    by side); managers and the outbox are on DATABASE_URL. Outbox rows are
+    written and committed in batches through their own session, so committing
+    never closes an open cursor.
+    """
+    start, end = day_window(day)
+    read_dbs = [shard.sessionmaker() for shard in shard_map.all()]
+    write_db = SessionLocal()
+    queued = 0
+    pending = 0
+    try:
+        managers = managers_by_country(read_dbs[0])  # The default shard: users live there
+
+        summaries = (
+            summary for summary in merged_country_summaries(read_dbs, start, end)
+            if summary["country"] in managers
+        )
+        for summary in with_empty_countries(summaries, managers):
+            recipients = managers[summary["country"]]
+            contexts = [
+                {**summary, "name": full_name, "day": day.isoformat()}
+                for _, full_name in recipients
+            ]
+            subject = f"NextBite daily summary - {summary['country']} - {day.isoformat()}"
+            queue_emails(write_db, (
+                (email, subject, html)
+                for (email, _), html in zip(recipients, render_manager_digest_emails(contexts))
+            ))
+            queued += len(recipients)
+            pending += len(recipients)
+            if pending >= commit_every:
+                write_db.commit()
+                pending = 0
+
+        write_db.commit()
+        return queued
+    except Exception:
+        write_db.rollback()
+        raise
+    finally:
+        for read_db in read_dbs:
+            read_db.close()
+        write_db.close()
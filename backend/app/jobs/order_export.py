@@ -0,0 +1,263 @@
+"""
+Columnar export of completed orders, and fast aggregation over the export.
+
+``export_months`` streams completed orders and their line items from every
+shard (live and archived months) through server-side cursors into Arrow IPC
+files, compressed with zstd or lz4:
+
+    <directory>/orders/month=2024-05/country=India/<shard>.arrow
+    <directory>/order_items/month=2024-05/country=India/<shard>.arrow
+
+The month is the order's ``created_at`` month (UTC), the same key orders are
+partitioned by. Exporting a month again replaces its files, so a finished month
+only needs exporting once, and a re-run after late payments is safe.
+
+``summarize_orders`` and ``top_menu_items`` read the files memory-mapped
+through ``pyarrow.dataset`` and aggregate them without touching the database.
+Filters on month and country only open the matching directories.
+"""
+import os
+from datetime import date, datetime, time, timezone
+from itertools import groupby, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs
+from sqlalchemy.orm import Session
+from app.db.archive import ArchivedOrder, ArchivedOrderItem, archive_available
+from app.db.shards import Shard, shard_map
+from app.models.menu_item import MenuItem
+from app.models.order import Order, OrderStatus
+from app.models.order_item import OrderItem
+from app.models.restaurant import Restaurant
+
+# Rows fetched per round trip from the server-side cursor, and rows per record batch
+EXPORT_BATCH_SIZE = 50_000
+
+UNKNOWN_COUNTRY = "unknown"  # Partition of restaurants without a country
+
+ORDERS_SCHEMA = pa.schema([
+    ("order_id", pa.int64()),
+    ("user_id", pa.int64()),
+    ("restaurant_id", pa.int64()),
+    ("restaurant_name", pa.string()),
+    ("total_amount", pa.float64()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    ("completed_at", pa.timestamp("us", tz="UTC")),  # Last update: when payment completed it
+])
+
+ORDER_ITEMS_SCHEMA = pa.schema([
+    ("order_item_id", pa.int64()),
+    ("order_id", pa.int64()),
+    ("restaurant_id", pa.int64()),
+    ("menu_item_id", pa.int64()),
+    ("menu_item_name", pa.string()),
+    ("quantity", pa.int32()),
+    ("price_at_time", pa.float64()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+])
+
+# Directory names are the partition values; both are kept as strings
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string()), ("country", pa.string())]), flavor="hive")
+
+
+def month_key(month: date) -> str:
+    return f"{month:%Y-%m}"
+
+
+def month_window(month: date) -> Tuple[datetime, datetime]:
+    """Return the [start, end) UTC window of the calendar month containing ``month``."""
+    start = datetime.combine(month.replace(day=1), time.min, tzinfo=timezone.utc)
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def _order_rows(db: Session, start: datetime, end: datetime) -> Iterator[tuple]:
+    """(country, order columns...) of completed orders in the window, by country.
+
+    A month is either live or archived (archival moves whole partitions), so
+    each country comes up in one source only.
+    """
+    sources = [Order]
+    if archive_available(db):
+        sources.append(ArchivedOrder)
+    for order in sources:
+        yield from db.query(
+            Restaurant.country,
+            order.id, order.user_id, order.restaurant_id, Restaurant.name,
+            order.total_amount, order.created_at, order.updated_at,
+        ).join(
+            Restaurant, Restaurant.id == order.restaurant_id
+        ).filter(
+            order.status == OrderStatus.COMPLETED, order.created_at >= start, order.created_at < end
+        ).order_by(
+            Restaurant.country, order.id
+        ).execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+
+
+def _order_item_rows(db: Session, start: datetime, end: datetime) -> Iterator[tuple]:
+    """(country, item columns...) of the items of completed orders in the window, by country."""
+    sources = [(Order, OrderItem)]
+    if archive_available(db):
+        sources.append((ArchivedOrder, ArchivedOrderItem))
+    for order, item in sources:
+        yield from db.query(
+            Restaurant.country,
+            item.id, item.order_id, order.restaurant_id, item.menu_item_id, MenuItem.name,
+            item.quantity, item.price_at_time, order.created_at,
+        ).join(
+            order, order.id == item.order_id
+        ).join(
+            Restaurant, Restaurant.id == order.restaurant_id
+        ).outerjoin(
+            MenuItem, MenuItem.id == item.menu_item_id
+        ).filter(
+            order.status == OrderStatus.COMPLETED, order.created_at >= start, order.created_at < end
+        ).order_by(
+            Restaurant.country, item.id
+        ).execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+
+
+def _record_batches(rows: Iterable[tuple], schema: pa.Schema) -> Iterator[pa.RecordBatch]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, EXPORT_BATCH_SIZE))
+        if not chunk:
+            return
+        columns = zip(*chunk)
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        )
+
+
+def _write_partitions(rows: Iterable[tuple], schema: pa.Schema, month_dir: str, shard_name: str,
+                      compression: str) -> Dict[str, int]:
+    """Write ``rows`` (grouped by their leading country) as one file per country.
+
+    Files are written under temporary names and swapped in at the end; this
+    shard's files of countries that no longer have rows are removed. Returns
+    rows written per country.
+    """
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    file_name = f"{shard_name}.arrow"
+    temporary_name = f".{file_name}.tmp"  # Dot files are skipped by readers
+    written: Dict[str, int] = {}
+    temporary: List[Tuple[str, str]] = []
+    try:
+        for country, country_rows in groupby(rows, key=lambda row: row[0] or UNKNOWN_COUNTRY):
+            directory = os.path.join(month_dir, f"country={country}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, file_name)
+            temporary.append((os.path.join(directory, temporary_name), path))
+            count = 0
+            with pa.OSFile(temporary[-1][0], "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+                for batch in _record_batches((row[1:] for row in country_rows), schema):
+                    writer.write_batch(batch)
+                    count += batch.num_rows
+            written[country] = count
+    except BaseException:
+        for temporary_path, _ in temporary:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        raise
+
+    for temporary_path, path in temporary:
+        os.replace(temporary_path, path)
+    if os.path.isdir(month_dir):
+        for entry in os.listdir(month_dir):
+            stale = os.path.join(month_dir, entry, file_name)
+            if entry.removeprefix("country=") not in written and os.path.exists(stale):
+                os.remove(stale)
+    return written
+
+
+def export_month(shard: Shard, month: date, directory: str, compression: str = "zstd") -> Dict[str, Dict[str, int]]:
+    """Export one month of one shard. Returns {"orders"|"order_items": {country: rows}}."""
+    start, end = month_window(month)
+    partition = f"month={month_key(month)}"
+    db = shard.sessionmaker()
+    try:
+        return {
+            "orders": _write_partitions(
+                _order_rows(db, start, end), ORDERS_SCHEMA,
+                os.path.join(directory, "orders", partition), shard.name, compression,
+            ),
+            "order_items": _write_partitions(
+                _order_item_rows(db, start, end), ORDER_ITEMS_SCHEMA,
+                os.path.join(directory, "order_items", partition), shard.name, compression,
+            ),
+        }
+    finally:
+        db.close()
+
+
+def export_months(months: Sequence[date], directory: str, compression: str = "zstd",
+                  shards: Optional[Sequence[Shard]] = None) -> Iterator[Tuple[str, date, Dict[str, Dict[str, int]]]]:
+    """Export ``months`` from every shard, yielding (shard, month, rows written) as each finishes."""
+    for shard in shards or shard_map.all():
+        for month in months:
+            yield shard.name, month, export_month(shard, month, directory, compression)
+
+
+def open_export(directory: str, table: str = "orders") -> ds.Dataset:
+    """The exported ``orders`` or ``order_items`` files as one memory-mapped dataset."""
+    path = os.path.join(directory, table)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No exported {table} in {directory}; run the export first")
+    return ds.dataset(
+        path, format="ipc", partitioning=PARTITIONING,
+        filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def _partition_filter(first_month: Optional[date], last_month: Optional[date], countries: Optional[Sequence[str]]):
+    conditions = []
+    if first_month:
+        conditions.append(ds.field("month") >= month_key(first_month))
+    if last_month:
+        conditions.append(ds.field("month") <= month_key(last_month))
+    if countries:
+        conditions.append(ds.field("country").isin(list(countries)))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def summarize_orders(directory: str, group_by: Sequence[str] = ("month", "country"),
+                     first_month: Optional[date] = None, last_month: Optional[date] = None,
+                     countries: Optional[Sequence[str]] = None) -> List[dict]:
+    """Order count, revenue and average order per group, from the export.
+
+    ``group_by`` takes any of month, country, restaurant_id and restaurant_name.
+    """
+    table = open_export(directory, "orders").to_table(
+        columns=[*group_by, "order_id", "total_amount"],
+        filter=_partition_filter(first_month, last_month, countries),
+    )
+    summary = table.group_by(list(group_by)).aggregate([
+        ("order_id", "count"), ("total_amount", "sum"), ("total_amount", "mean"),
+    ]).rename_columns([*group_by, "order_count", "revenue", "average_order"])
+    return summary.sort_by([(key, "ascending") for key in group_by]).to_pylist()
+
+
+def top_menu_items(directory: str, limit: int = 10, group_by: Sequence[str] = (),
+                   first_month: Optional[date] = None, last_month: Optional[date] = None,
+                   countries: Optional[Sequence[str]] = None) -> List[dict]:
+    """Most ordered menu items (by quantity), overall or within each group, from the export."""
+    table = open_export(directory, "order_items").to_table(
+        columns=[*group_by, "menu_item_id", "menu_item_name", "quantity", "price_at_time"],
+        filter=_partition_filter(first_month, last_month, countries),
+    )
+    table = table.append_column("revenue", pc.multiply(table["quantity"], table["price_at_time"]))
+    keys = [*group_by, "menu_item_id", "menu_item_name"]
+    totals = table.group_by(keys).aggregate([("quantity", "sum"), ("revenue", "sum")]).rename_columns(
+        [*keys, "quantity", "revenue"]
+    ).sort_by([*((key, "ascending") for key in group_by), ("quantity", "descending")])
+
+    top: List[dict] = []
+    for _, rows in groupby(totals.to_pylist(), key=lambda row: tuple(row[key] for key in group_by)):
+        top.extend(islice(rows, limit))
+    return top
@@ -1,15 +1,102 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, users, restaurants, orders, payment_methods
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.concurrency import AdaptiveConcurrencyLimiter
+from app.middleware.drain import DrainMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.read_your_writes import ReadYourWritesMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.routes import auth, users, restaurants, orders, payment_methods, payments, metrics
+from app.services.payment_events import payment_event_worker
+from app.services.email_outbox import email_outbox_sender
+from app.services.cart_sweeper import cart_sweeper
+from app.services.templates import email_templates
+from app.services.metrics_snapshot import metrics_snapshot_writer
+from app.services.replica_health import replica_health_checker
+from app.services.readiness import loop_lag_monitor, readiness_probe
 from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.core.tracing import tracer
+from app.core.lifecycle import lifecycle
+from app.db.database import engine, POOL_SIZE, MAX_OVERFLOW
+from app.db.replicas import replica_set
+from app.db.shards import shard_map
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers on startup; shut down gracefully.
+
+    Shutdown order: stop taking traffic (``/ready`` fails), let in-flight
+    requests finish, let background workers finish their batch (unsent emails
+    go back to the outbox), flush telemetry, and finally close pooled database
+    connections so Postgres sees clean disconnects.
+    """
+    # Compile email templates off the startup path; the worker starts serving meanwhile
+    warm_templates = asyncio.create_task(asyncio.to_thread(email_templates.load))
+    await payment_event_worker.start()
+    await email_outbox_sender.start()
+    await cart_sweeper.start()
+    await metrics_snapshot_writer.start()
+    await loop_lag_monitor.start()
+    await replica_health_checker.start()
+    yield
+
+    lifecycle.begin_drain()
+    if not await lifecycle.wait_idle(settings.SHUTDOWN_TIMEOUT_SECONDS):
+        print(f"Shutdown: {lifecycle.in_flight} request(s) still running after "
+              f"{settings.SHUTDOWN_TIMEOUT_SECONDS}s")
+
+    await warm_templates
+    await asyncio.gather(
+        payment_event_worker.stop(timeout=settings.SHUTDOWN_WORKER_TIMEOUT_SECONDS),
+        email_outbox_sender.stop(timeout=settings.SHUTDOWN_WORKER_TIMEOUT_SECONDS),
+        cart_sweeper.stop(timeout=settings.SHUTDOWN_WORKER_TIMEOUT_SECONDS),
+    )
+    await loop_lag_monitor.stop()
+    await metrics_snapshot_writer.stop()
+    await asyncio.to_thread(tracer.exporter.flush)
+    await replica_health_checker.stop()  # Also closes replica connections
+    shard_map.dispose()
+    engine.dispose()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     description="Backend for NextBite Food Ordering Platform",
     version="1.0.0",
-    redirect_slashes=False  # Prevent redirects that lose auth headers
+    redirect_slashes=False,  # Prevent redirects that lose auth headers
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+# Read-your-writes tokens for clients of read replicas (innermost: wraps the routes only)
+if replica_set.enabled:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Shed load before requests queue up inside the DB pool. Added first so CORS
+# headers still reach the browser on 503s.
+if settings.CONCURRENCY_LIMIT_ENABLED:
+    initial_limit = settings.CONCURRENCY_INITIAL_LIMIT or POOL_SIZE + MAX_OVERFLOW
+    app.add_middleware(
+        AdaptiveConcurrencyLimiter,
+        initial_limit=initial_limit,
+        min_limit=min(settings.CONCURRENCY_MIN_LIMIT, initial_limit),
+        max_limit=settings.CONCURRENCY_MAX_LIMIT or initial_limit * 2,
+        max_queue=settings.CONCURRENCY_MAX_QUEUE,
+        queue_timeout=settings.CONCURRENCY_QUEUE_TIMEOUT_SECONDS,
+        retry_after=settings.CONCURRENCY_RETRY_AFTER_SECONDS,
+        latency_tolerance=settings.CONCURRENCY_LATENCY_TOLERANCE,
+        exempt_paths=[
+            "/", "/health", "/ready", "/metrics", "/docs", "/redoc", "/openapi.json",
+            # Long streams would read as a latency spike; capped by EXPORT_MAX_CONCURRENT instead
+            "/orders/export", "/users/export",
+        ],
+        exempt_get_prefixes=["/restaurants"],  # Served from the catalog cache
+    )
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -17,14 +104,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Read-After"],  # Read-your-writes token, see app/db/replicas.py
 )
 
+# Compress responses
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+# Record latency of every request, including time spent compressing
+app.add_middleware(MetricsMiddleware)
+
+# Track in-flight requests for graceful shutdown
+app.add_middleware(DrainMiddleware, lifecycle=lifecycle)
+
+# Root span for sampled requests; outermost so it covers the whole request
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(restaurants.router)
 app.include_router(orders.router)
 app.include_router(payment_methods.router)
+app.include_router(payments.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -43,6 +150,14 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for the load balancer: 503 when the database is unreachable or this worker is saturated."""
+    result = await readiness_probe.check()
+    status_code = 200 if result["status"] == "ready" else 503
+    return FastJSONResponse(result, status_code=status_code)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -60,6 +60,8 @@ async def get_current_user(
             detail="Inactive user"
         )
     
+    # Lets a commit on this session pin the user to the primary (read-your-writes)
+    db.info["user_id"] = user.id
     return user
 
 
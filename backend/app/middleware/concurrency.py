@@ -0,0 +1,181 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Iterable, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import Counter, Gauge
+
+REJECTED_REQUESTS = Counter(
+    "nextbite_concurrency_rejected_total",
+    "Requests shed with 503 by the concurrency limiter",
+    ["reason"],
+)
+
+BUSY_BODY = b'{"detail":"Server is busy, please retry shortly"}'
+
+# The limiter the gauges below report on: the last one built (Starlette builds
+# the middleware stack once per app)
+_live_limiter: Optional["AdaptiveConcurrencyLimiter"] = None
+
+
+def _live_gauge(read: Callable[["AdaptiveConcurrencyLimiter"], float]) -> Callable[[], dict]:
+    return lambda: {} if _live_limiter is None else {(): read(_live_limiter)}
+
+
+Gauge("nextbite_concurrency_limit", "Current adaptive concurrency limit",
+      function=_live_gauge(lambda limiter: limiter.limit))
+Gauge("nextbite_concurrency_in_flight", "Requests holding a concurrency slot",
+      function=_live_gauge(lambda limiter: limiter.in_flight))
+Gauge("nextbite_concurrency_queued", "Requests waiting for a concurrency slot",
+      function=_live_gauge(lambda limiter: len(limiter._waiters)))
+
+
+class AdaptiveConcurrencyLimiter:
+    """Caps in-flight requests per worker with an adaptive (AIMD) limit.
+
+    Requests beyond the limit wait in a short FIFO queue for at most
+    ``queue_timeout`` seconds; when the queue is full or the deadline passes they
+    get an immediate 503 with ``Retry-After`` instead of piling up inside the
+    connection pool until it times out.
+
+    The limit grows by about one per limit's worth of completed requests while
+    the limit is fully used, and is cut by ``backoff`` when recent latency rises
+    well above its long-run average or a request fails with a 5xx (e.g. a pool
+    timeout). Paths in ``exempt_paths`` (and GETs under ``exempt_get_prefixes``)
+    bypass the limiter.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        initial_limit: int = 15,
+        min_limit: int = 2,
+        max_limit: int = 30,
+        max_queue: int = 50,
+        queue_timeout: float = 2.0,
+        retry_after: int = 1,
+        latency_tolerance: float = 2.0,
+        backoff: float = 0.9,
+        exempt_paths: Iterable[str] = (),
+        exempt_get_prefixes: Iterable[str] = (),
+    ):
+        self.app = app
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = str(retry_after).encode()
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.exempt_paths = frozenset(exempt_paths)
+        self.exempt_get_prefixes = tuple(exempt_get_prefixes)
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._short_latency: Optional[float] = None  # Fast-moving average (recent requests)
+        self._long_latency: Optional[float] = None   # Slow-moving average (baseline)
+        self._last_decrease = 0.0
+
+        global _live_limiter
+        _live_limiter = self
+
+    def is_exempt(self, scope: Scope) -> bool:
+        path = scope["path"]
+        if path in self.exempt_paths or scope["method"] == "OPTIONS":
+            return True
+        return scope["method"] == "GET" and path.startswith(self.exempt_get_prefixes)
+
+    async def _acquire(self) -> Optional[str]:
+        """Take a slot, waiting in the queue if needed. Returns a rejection reason or None."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        acquired = False
+        try:
+            # The slot is handed over (in_flight already incremented) by _release
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+            acquired = True
+            return None
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            elif not acquired:
+                # A slot was handed over just as the wait ended (timeout, or the
+                # request was cancelled): nobody will use it, so pass it on
+                self._release()
+
+    def _release(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _record(self, latency: float, failed: bool, saturated: bool):
+        """Adjust the limit after a request completes."""
+        if self._short_latency is None:
+            self._short_latency = self._long_latency = latency
+        else:
+            self._short_latency += 0.1 * (latency - self._short_latency)
+            self._long_latency += 0.01 * (latency - self._long_latency)
+
+        now = time.monotonic()
+        if failed or self._short_latency > self._long_latency * self.latency_tolerance:
+            # Decrease at most once per recent-latency window, so one slow burst
+            # doesn't collapse the limit to the minimum
+            if now - self._last_decrease > self._short_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    async def _reject(self, send: Send, reason: str):
+        REJECTED_REQUESTS.inc(reason)
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(BUSY_BODY)).encode()),
+                (b"retry-after", self.retry_after),
+            ],
+        })
+        await send({"type": "http.response.body", "body": BUSY_BODY})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or self.is_exempt(scope):
+            await self.app(scope, receive, send)
+            return
+
+        reason = await self._acquire()
+        if reason is not None:
+            await self._reject(send, reason)
+            return
+
+        status_code = 500
+        saturated = self.in_flight >= int(self.limit)
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._release()
+            self._record(time.perf_counter() - start, status_code >= 500, saturated)
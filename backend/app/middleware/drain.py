@@ -0,0 +1,33 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.lifecycle import Lifecycle
+
+
+class DrainMiddleware:
+    """Counts in-flight requests and, once draining, asks clients to close their connection.
+
+    Requests are still served while draining (the load balancer needs a moment to
+    notice ``/ready`` failing); ``Connection: close`` makes keep-alive clients
+    reconnect, landing on another worker.
+    """
+
+    def __init__(self, app: ASGIApp, lifecycle: Lifecycle):
+        self.app = app
+        self.lifecycle = lifecycle
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        lifecycle = self.lifecycle
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and lifecycle.draining:
+                message["headers"] = list(message.get("headers", [])) + [(b"connection", b"close")]
+            await send(message)
+
+        lifecycle.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            lifecycle.in_flight -= 1
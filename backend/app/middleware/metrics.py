@@ -0,0 +1,58 @@
+import time
+from typing import Dict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+
+KNOWN_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+_route_paths: Dict[object, str] = {}
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route that handled the request (``/orders/{order_id}``).
+
+    Requests that match no route are labelled ``unmatched`` so scanners probing
+    random URLs cannot blow up the number of time series.
+    """
+    # The router stores the matched endpoint in the (shared) scope
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if not _route_paths:
+        _route_paths.update(
+            (route.endpoint, route.path)
+            for route in scope["app"].routes
+            if hasattr(route, "endpoint")
+        )
+    return _route_paths.get(endpoint, "unmatched")
+
+
+class MetricsMiddleware:
+    """Records request latency by route template, method and status, and in-flight requests."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start, method, route_template(scope), str(status_code)
+            )
@@ -0,0 +1,37 @@
+import time
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.db.replicas import READ_AFTER_HEADER, begin_request, end_request, read_after_token
+
+_HEADER_NAME = READ_AFTER_HEADER.lower().encode()
+
+
+class ReadYourWritesMiddleware:
+    """Carries read-your-writes pins to the primary in the X-Read-After header.
+
+    A response to a request that committed a write gets a signed token with the
+    user and the time of the write; clients send the latest one back with every
+    request, and ``read_session`` keeps that user's reads on the primary while
+    it is recent (see app/db/replicas.py).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state, reset = begin_request(Headers(scope=scope).get(READ_AFTER_HEADER))
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and state["writer"] is not None:
+                token = read_after_token(state["writer"], time.time())
+                message["headers"] = list(message.get("headers", [])) + [(_HEADER_NAME, token.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(reset)
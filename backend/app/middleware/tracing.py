@@ -0,0 +1,45 @@
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.tracing import NOOP_SPAN, Tracer
+from app.middleware.metrics import route_template
+
+
+class TracingMiddleware:
+    """Opens the root span of each sampled request.
+
+    Continues an incoming W3C ``traceparent`` and reports the trace back to the
+    client in a ``traceresponse`` header. Unsampled requests pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        span = self.tracer.start_trace(
+            f"{scope['method']} request",
+            traceparent=Headers(scope=scope).get("traceparent"),
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        if span is NOOP_SPAN:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"traceresponse", span.traceparent.encode("latin-1"))
+                ]
+            await send(message)
+
+        with span:
+            await self.app(scope, receive, send_wrapper)
+            route = route_template(scope)
+            span.name = f"{scope['method']} {route}"
+            span.set_attribute("http.route", route)
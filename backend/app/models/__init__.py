@@ -6,6 +6,8 @@ from app.models.menu_item import MenuItem
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.payment_method import PaymentMethod
+from app.models.payment_event import PaymentEvent
+from app.models.email_outbox import EmailOutbox
 
 __all__ = [
     "Base",
@@ -15,4 +17,6 @@ __all__ = [
     "Order",
     "OrderItem",
     "PaymentMethod",
+    "PaymentEvent",
+    "EmailOutbox",
 ]
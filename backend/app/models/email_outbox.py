@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, Index
+from sqlalchemy.sql import func
+import enum
+from app.db.database import Base
+
+
+class EmailStatus(str, enum.Enum):
+    """Delivery status of an outbox email."""
+    PENDING = "pending"  # Waiting to be sent (or retried)
+    FAILED = "failed"  # Gave up after repeated errors; the body is cleared
+
+
+class EmailOutbox(Base):
+    """Transactional email outbox, written in the same transaction as the data it describes.
+
+    Rows are deleted once the message has been handed to the SMTP server. Messages
+    that fail for good keep their recipient, subject and last error, but not their
+    body (credentials emails carry a password).
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_content = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatus), default=EmailStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox #{self.id} to {self.to_email} ({self.status.value})>"
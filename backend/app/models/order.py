@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -23,7 +23,8 @@ class Order(Base):
     status = Column(Enum(OrderStatus), default=OrderStatus.CART, nullable=False)
     total_amount = Column(Float, default=0.0, nullable=False)
     stripe_payment_intent_id = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # The partition key when orders are partitioned by month (scripts/partitions.py)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
@@ -31,6 +32,16 @@ class Order(Base):
     restaurant = relationship("Restaurant", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # A user's cart and order history
+        Index("ix_orders_user_id_status", "user_id", "status"),
+        # Carts by last activity, for the abandoned-cart sweeper (app/services/cart_sweeper.py)
+        Index(
+            "ix_orders_cart_activity", func.coalesce(updated_at, created_at),
+            postgresql_where=status == OrderStatus.CART, sqlite_where=status == OrderStatus.CART,
+        ),
+    )
+
     def calculate_total(self):
         """Calculate total amount from order items."""
         self.total_amount = sum(item.price_at_time * item.quantity for item in self.order_items)
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, JSON, Index
+from sqlalchemy.sql import func
+import enum
+from app.db.database import Base
+
+
+class PaymentEventStatus(str, enum.Enum):
+    """Processing status of an inbound Stripe webhook event."""
+    PENDING = "pending"  # Stored, waiting for a worker (or a retry)
+    PROCESSED = "processed"  # Applied to orders (or ignored as irrelevant)
+    FAILED = "failed"  # Gave up after repeated errors
+
+
+class PaymentEvent(Base):
+    """Inbox of Stripe webhook events, deduplicated by Stripe event id."""
+    __tablename__ = "payment_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    stripe_event_id = Column(String, unique=True, nullable=False)
+    type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(PaymentEventStatus), default=PaymentEventStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(String, nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_payment_events_status_id", "status", "id"),
+    )
+
+    def __repr__(self):
+        return f"<PaymentEvent {self.stripe_event_id} {self.type} ({self.status.value})>"
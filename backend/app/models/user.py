@@ -3,6 +3,7 @@ from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
 from app.db.database import Base
+from app.core.tracing import tracer
 import bcrypt
 
 
@@ -40,7 +41,8 @@ class User(Base):
             password = password.encode('utf-8')
         # Generate salt and hash password
         salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password, salt)
+        with tracer.span("bcrypt.hash"):
+            hashed = bcrypt.hashpw(password, salt)
         return hashed.decode('utf-8')
 
     def verify_password(self, password: str) -> bool:
@@ -52,7 +54,8 @@ class User(Base):
         stored_hash = self.password_hash
         if isinstance(stored_hash, str):
             stored_hash = stored_hash.encode('utf-8')
-        return bcrypt.checkpw(password, stored_hash)
+        with tracer.span("bcrypt.verify"):
+            return bcrypt.checkpw(password, stored_hash)
 
     def __repr__(self):
         return f"<User {self.email} ({self.role.value})>"
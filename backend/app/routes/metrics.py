@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.core.metrics import REGISTRY, CONTENT_TYPE
+from app.core.config import settings
+
+router = APIRouter(tags=["Monitoring"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics, merged across worker processes when METRICS_MULTIPROC_DIR is set."""
+    if settings.METRICS_MULTIPROC_DIR:
+        families = REGISTRY.collect_multiprocess(settings.METRICS_MULTIPROC_DIR)
+    else:
+        families = REGISTRY.collect()
+    return Response(REGISTRY.expose(families), media_type=CONTENT_TYPE)
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, selectinload
+from datetime import date
+from typing import List, Optional
 from app.db.database import get_db
+from app.db.archive import ArchivedOrder, load_archived_orders
+from app.db.shards import (
+    DEFAULT_SHARD, get_order_shard_db, get_order_shard_read_db, get_shard_read_db, session_on, shard_map,
+)
 from app.models.user import User, UserRole
 from app.models.order import Order, OrderStatus
 from app.models.order_item import OrderItem
@@ -10,14 +15,57 @@ from app.models.restaurant import Restaurant
 from app.schemas.order import OrderCreate, OrderResponse, OrderItemCreate, OrderItemResponse, OrderCheckout
 from app.middleware.auth import get_current_active_user
 from app.core.rbac import Permission, has_permission
-import stripe
-from app.core.config import settings
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from app.core.responses import FastJSONResponse
+from app.core.metrics import STRIPE_REQUEST_DURATION
+from app.core.tracing import tracer
+from app.services.email import queue_order_receipt_email
+from app.services.email_outbox import email_outbox_sender
+from app.services.exports import ExportFormat, created_window, export_response, stream_orders
+from app.services.stripe_client import get_stripe, stripe_configured
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
 
+def build_order_responses(db: Session, orders: List[Order]) -> List[OrderResponse]:
+    """Build order responses including their items and menu item names.
+
+    Menu item names for all orders are loaded in one query. Load the orders with
+    ``selectinload(Order.order_items)`` so their items don't cost a query each.
+    """
+    menu_item_ids = {item.menu_item_id for order in orders for item in order.order_items}
+    names = {}
+    if menu_item_ids:
+        names = dict(db.query(MenuItem.id, MenuItem.name).filter(MenuItem.id.in_(menu_item_ids)).all())
+    
+    return [
+        OrderResponse(
+            id=order.id,
+            user_id=order.user_id,
+            restaurant_id=order.restaurant_id,
+            status=order.status,
+            total_amount=order.total_amount,
+            created_at=order.created_at,
+            updated_at=order.updated_at,
+            order_items=[
+                OrderItemResponse(
+                    id=item.id,
+                    menu_item_id=item.menu_item_id,
+                    quantity=item.quantity,
+                    price_at_time=item.price_at_time,
+                    menu_item_name=names.get(item.menu_item_id)
+                )
+                for item in order.order_items
+            ]
+        )
+        for order in orders
+    ]
+
+
+def build_order_response(db: Session, order: Order) -> OrderResponse:
+    """Build an order response including its items and their menu item names."""
+    return build_order_responses(db, [order])[0]
+
+
 def check_permission(user: User, permission: Permission):
     """Check if user has required permission."""
     if not has_permission(user.role, permission):
@@ -36,6 +84,36 @@ async def create_order(
     """Create a new order (cart) - all roles can create."""
     check_permission(current_user, Permission.CREATE_ORDER)
     
+    # The cart lives on the restaurant's shard (admins can order from any country)
+    restaurant_id = order_data.restaurant_id
+    shard = shard_map.locate(
+        db, current_user, restaurant_id,
+        lambda session: session.query(Restaurant.id).filter(Restaurant.id == restaurant_id).first() is not None
+    )
+    if current_user.role == UserRole.ADMIN and shard_map.enabled:
+        # A user has one cart: drop any the admin left on another shard
+        for other in shard_map.all():
+            if other is not shard:
+                with session_on(other, db, current_user) as other_db:
+                    for cart in other_db.query(Order).filter(
+                        Order.user_id == current_user.id, Order.status == OrderStatus.CART
+                    ).all():
+                        delete_cart(other_db, cart)
+                    other_db.commit()
+    
+    with session_on(shard, db, current_user) as shard_db:
+        return create_cart(shard_db, order_data, current_user)
+
+
+def delete_cart(db: Session, cart: Order):
+    """Delete a cart and its items in two statements (the caller commits)."""
+    db.query(OrderItem).filter(OrderItem.order_id == cart.id).delete(synchronize_session=False)
+    db.query(Order).filter(Order.id == cart.id).delete(synchronize_session=False)
+    db.expunge(cart)
+
+
+def create_cart(db: Session, order_data: OrderCreate, current_user: User) -> OrderResponse:
+    """Open a cart at the restaurant, replacing the user's cart at another restaurant."""
     # Verify restaurant exists
     restaurant = db.query(Restaurant).filter(Restaurant.id == order_data.restaurant_id).first()
     if not restaurant:
@@ -56,9 +134,8 @@ async def create_order(
             return OrderResponse.model_validate(existing_cart)
         
         # If cart is for a different restaurant, delete the old cart and its items
-        db.query(OrderItem).filter(OrderItem.order_id == existing_cart.id).delete()
-        db.delete(existing_cart)
-        db.commit()
+        # (committed together with the new cart)
+        delete_cart(db, existing_cart)
     
     # Create new order in CART status
     new_order = Order(
@@ -76,45 +153,30 @@ async def create_order(
 
 @router.get("/", response_model=List[OrderResponse])
 async def get_user_orders(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get current user's orders."""
-    orders = db.query(Order).filter(Order.user_id == current_user.id).all()
-    
-    # Convert to responses with order items
-    order_responses = []
-    for order in orders:
-        order_items = []
-        for item in order.order_items:
-            menu_item = db.query(MenuItem).filter(MenuItem.id == item.menu_item_id).first()
-            order_item_response = OrderItemResponse(
-                id=item.id,
-                menu_item_id=item.menu_item_id,
-                quantity=item.quantity,
-                price_at_time=item.price_at_time,
-                menu_item_name=menu_item.name if menu_item else None
-            )
-            order_items.append(order_item_response)
-        
-        order_response = OrderResponse(
-            id=order.id,
-            user_id=order.user_id,
-            restaurant_id=order.restaurant_id,
-            status=order.status,
-            total_amount=order.total_amount,
-            created_at=order.created_at,
-            updated_at=order.updated_at,
-            order_items=order_items
-        )
-        order_responses.append(order_response)
+    def load_orders(session: Session) -> List[OrderResponse]:
+        orders = session.query(Order).options(selectinload(Order.order_items)).filter(
+            Order.user_id == current_user.id
+        ).all()
+        orders += load_archived_orders(session, ArchivedOrder.user_id == current_user.id)
+        return build_order_responses(session, orders)
+    
+    # Admins order from every country, so their orders can be on any shard
+    if current_user.role == UserRole.ADMIN:
+        orders = [order for shard_orders in await shard_map.scatter(db, load_orders) for order in shard_orders]
+    else:
+        orders = load_orders(db)
     
-    return order_responses
+    # Models are validated once here and serialized directly (no second response_model pass)
+    return FastJSONResponse(orders)
 
 
 @router.get("/all-carts", response_model=List[OrderResponse])
 async def get_all_carts(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all users' carts - ADMIN and MANAGER only."""
@@ -124,47 +186,69 @@ async def get_all_carts(
             detail="Only admins and managers can view all carts"
         )
     
-    # Get all cart orders
-    orders = db.query(Order).filter(Order.status == OrderStatus.CART).all()
-    
-    # Convert to responses with order items
-    order_responses = []
-    for order in orders:
-        order_items = []
-        for item in order.order_items:
-            menu_item = db.query(MenuItem).filter(MenuItem.id == item.menu_item_id).first()
-            order_item_response = OrderItemResponse(
-                id=item.id,
-                menu_item_id=item.menu_item_id,
-                quantity=item.quantity,
-                price_at_time=item.price_at_time,
-                menu_item_name=menu_item.name if menu_item else None
-            )
-            order_items.append(order_item_response)
-        
-        order_response = OrderResponse(
-            id=order.id,
-            user_id=order.user_id,
-            restaurant_id=order.restaurant_id,
-            status=order.status,
-            total_amount=order.total_amount,
-            created_at=order.created_at,
-            updated_at=order.updated_at,
-            order_items=order_items
-        )
-        order_responses.append(order_response)
+    def load_carts(session: Session) -> List[OrderResponse]:
+        orders = session.query(Order).options(selectinload(Order.order_items)).filter(
+            Order.status == OrderStatus.CART
+        ).all()
+        return build_order_responses(session, orders)
+    
+    # Admins see every country's carts, gathered from all shards in parallel;
+    # managers see the carts on their own shard
+    if current_user.role == UserRole.ADMIN:
+        carts = [cart for shard_carts in await shard_map.scatter(db, load_carts) for cart in shard_carts]
+    else:
+        carts = load_carts(db)
     
-    return order_responses
+    # Models are validated once here and serialized directly (no second response_model pass)
+    return FastJSONResponse(carts)
+
+
+@router.get("/export")
+async def export_orders(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    order_status: Optional[OrderStatus] = Query(None, alias="status"),
+    first_day: Optional[date] = Query(None, alias="from", description="First day of created_at (UTC)"),
+    last_day: Optional[date] = Query(None, alias="to", description="Last day of created_at (UTC), inclusive"),
+    country: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream orders with their items as NDJSON (one order per line) or CSV (one item per line).
+
+    ADMIN and MANAGER only; managers only get their own country's orders.
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins and managers can export orders"
+        )
+    if current_user.role == UserRole.MANAGER:
+        if country is not None and country != current_user.country:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Managers can only export their own country's orders"
+            )
+        country = current_user.country
+    
+    # A country lives on one shard; otherwise every shard is streamed in turn
+    shards = [shard_map.for_country(country)] if country else shard_map.all()
+    chunks = stream_orders(shards, export_format, order_status, created_window(first_day, last_day), country)
+    # The export streams from its own sessions; the request's session (which
+    # loaded the user) would otherwise keep its connection until the stream ends
+    db.close()
+    return export_response(chunks, export_format, "orders")
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_order_shard_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get order details - user can only see their own orders."""
     order = db.query(Order).filter(Order.id == order_id).first()
+    if not order:
+        order = next(iter(load_archived_orders(db, ArchivedOrder.id == order_id)), None)
     
     if not order:
         raise HTTPException(
@@ -179,43 +263,21 @@ async def get_order(
             detail="You can only view your own orders"
         )
     
-    # Build response with order items
-    order_items = []
-    for item in order.order_items:
-        menu_item = db.query(MenuItem).filter(MenuItem.id == item.menu_item_id).first()
-        order_item_response = OrderItemResponse(
-            id=item.id,
-            menu_item_id=item.menu_item_id,
-            quantity=item.quantity,
-            price_at_time=item.price_at_time,
-            menu_item_name=menu_item.name if menu_item else None
-        )
-        order_items.append(order_item_response)
-    
-    return OrderResponse(
-        id=order.id,
-        user_id=order.user_id,
-        restaurant_id=order.restaurant_id,
-        status=order.status,
-        total_amount=order.total_amount,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
-        order_items=order_items
-    )
+    return FastJSONResponse(build_order_response(db, order))
 
 
 @router.post("/{order_id}/items", response_model=OrderItemResponse, status_code=status.HTTP_201_CREATED)
 async def add_item_to_order(
     order_id: int,
     item_data: OrderItemCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_order_shard_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Add item to cart - all roles can add items."""
     check_permission(current_user, Permission.CREATE_ORDER)
     
-    # Get order
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # Get order, locked until the commit (the cart sweeper skips it meanwhile)
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -260,8 +322,6 @@ async def add_item_to_order(
     if existing_item:
         # Update quantity
         existing_item.quantity += item_data.quantity
-        db.commit()
-        db.refresh(existing_item)
         order_item = existing_item
     else:
         # Add new item
@@ -272,31 +332,33 @@ async def add_item_to_order(
             price_at_time=menu_item.price
         )
         db.add(order_item)
-        db.commit()
-        db.refresh(order_item)
+    db.flush()
     
-    # Update order total
+    # Update order total, in the same transaction as the item
     order.calculate_total()
-    db.commit()
     
-    return OrderItemResponse(
+    # Built before the commit expires the loaded objects, which would cost a reload each
+    response = OrderItemResponse(
         id=order_item.id,
         menu_item_id=order_item.menu_item_id,
         quantity=order_item.quantity,
         price_at_time=order_item.price_at_time,
         menu_item_name=menu_item.name
     )
+    db.commit()
+    
+    return response
 
 
 @router.delete("/{order_id}/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_item_from_order(
     order_id: int,
     item_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_order_shard_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Remove item from cart."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -340,14 +402,19 @@ async def remove_item_from_order(
 async def checkout_order(
     order_id: int,
     checkout_data: OrderCheckout,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_order_shard_db),
+    user_db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Checkout and pay for order - ADMIN and MANAGER only."""
     check_permission(current_user, Permission.CHECKOUT)
     
-    # Get order
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # Get order, with its items and their menu items for the receipt email; the
+    # row stays locked until the commit, so neither a second checkout nor the
+    # cart sweeper can take it meanwhile
+    order = db.query(Order).options(
+        selectinload(Order.order_items).selectinload(OrderItem.menu_item)
+    ).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -376,7 +443,8 @@ async def checkout_order(
     
     # Get payment method - admin/manager can use any user's payment method for their order
     from app.models.payment_method import PaymentMethod
-    payment_method = db.query(PaymentMethod).filter(
+    # Payment methods stay on DATABASE_URL (the same session as ``db`` unless sharded)
+    payment_method = user_db.query(PaymentMethod).filter(
         PaymentMethod.id == checkout_data.payment_method_id,
         PaymentMethod.user_id == order.user_id  # Use order owner's payment method
     ).first()
@@ -393,24 +461,43 @@ async def checkout_order(
     # Handle Cash payments
     if payment_method.brand == "Cash":
         order.status = OrderStatus.COMPLETED
+        queue_order_receipt_email(db, order, payment_method="Cash")
         db.commit()
         db.refresh(order)
     else:
+        if not stripe_configured():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Card payments are not configured"
+            )
+        
+        stripe = get_stripe()
         try:
             # Create Stripe payment intent
-            payment_intent = stripe.PaymentIntent.create(
-                amount=int(order.total_amount * 100),  # Amount in cents
-                currency="usd",
-                payment_method=payment_method.stripe_payment_method_id,
-                confirm=True,
-                automatic_payment_methods={
-                    "enabled": True,
-                    "allow_redirects": "never"
-                }
-            )
+            with STRIPE_REQUEST_DURATION.time("payment_intent.create"), \
+                    tracer.span("stripe.payment_intent.create", kind="client"):
+                payment_intent = stripe.PaymentIntent.create(
+                    amount=int(order.total_amount * 100),  # Amount in cents
+                    currency="usd",
+                    payment_method=payment_method.stripe_payment_method_id,
+                    confirm=True,
+                    automatic_payment_methods={
+                        "enabled": True,
+                        "allow_redirects": "never"
+                    },
+                    # Lets webhooks find the order (and its shard)
+                    metadata={"order_id": str(order.id), "shard": db.info.get("shard", DEFAULT_SHARD)}
+                )
             
             order.stripe_payment_intent_id = payment_intent.id
-            order.status = OrderStatus.COMPLETED
+            # 3DS and delayed methods finish asynchronously; the webhook settles them
+            if payment_intent.status == "succeeded":
+                order.status = OrderStatus.COMPLETED
+                queue_order_receipt_email(
+                    db, order, payment_method=f"{payment_method.brand} ****{payment_method.last4}"
+                )
+            else:
+                order.status = OrderStatus.PENDING
             db.commit()
             db.refresh(order)
             
@@ -420,34 +507,16 @@ async def checkout_order(
                 detail=f"Payment failed: {str(e)}"
             )
     
-    # Build response
-    order_items = []
-    for item in order.order_items:
-        menu_item = db.query(MenuItem).filter(MenuItem.id == item.menu_item_id).first()
-        order_items.append(OrderItemResponse(
-            id=item.id,
-            menu_item_id=item.menu_item_id,
-            quantity=item.quantity,
-            price_at_time=item.price_at_time,
-            menu_item_name=menu_item.name if menu_item else None
-        ))
-    
-    return OrderResponse(
-        id=order.id,
-        user_id=order.user_id,
-        restaurant_id=order.restaurant_id,
-        status=order.status,
-        total_amount=order.total_amount,
-        created_at=order.created_at,
-        updated_at=order.updated_at,
-        order_items=order_items
-    )
+    if order.status == OrderStatus.COMPLETED:
+        email_outbox_sender.wake()
+    
+    return FastJSONResponse(build_order_response(db, order))
 
 
 @router.delete("/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_order_shard_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Cancel order - ADMIN and MANAGER can cancel any order."""
@@ -1,16 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
-import stripe
 from app.db.database import get_db
+from app.db.replicas import get_read_db
 from app.models.user import User, UserRole
 from app.models.payment_method import PaymentMethod
 from app.schemas.payment import PaymentMethodCreate, PaymentMethodResponse, SetupIntentResponse
 from app.middleware.auth import get_current_active_user
 from app.core.rbac import Permission, has_permission
 from app.core.config import settings
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from app.core.metrics import STRIPE_REQUEST_DURATION
+from app.core.tracing import tracer
+from app.services.stripe_client import get_stripe, stripe_configured
 
 router = APIRouter(prefix="/payment-methods", tags=["Payment Methods"])
 
@@ -41,17 +42,20 @@ async def create_setup_intent(
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a Stripe SetupIntent to collect payment method details."""
-    if not settings.STRIPE_SECRET_KEY or settings.STRIPE_SECRET_KEY.startswith("sk_test_placeholder"):
+    if not stripe_configured():
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Stripe API key is not properly configured. Please check your .env file."
         )
-        
+    
+    stripe = get_stripe()
     try:
         # Create a SetupIntent
-        intent = stripe.SetupIntent.create(
-            automatic_payment_methods={"enabled": True},
-        )
+        with STRIPE_REQUEST_DURATION.time("setup_intent.create"), \
+                tracer.span("stripe.setup_intent.create", kind="client"):
+            intent = stripe.SetupIntent.create(
+                automatic_payment_methods={"enabled": True},
+            )
         return {"client_secret": intent.client_secret}
     except stripe.error.AuthenticationError:
         raise HTTPException(
@@ -68,7 +72,7 @@ async def create_setup_intent(
 @router.get("/", response_model=List[PaymentMethodResponse])
 async def list_payment_methods(
     user_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """List payment methods. Admins/Managers can view any user's payment methods."""
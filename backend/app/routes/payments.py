@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Header
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional
+import json
+from app.db.database import get_db
+from app.db.shards import shard_map
+from app.models.payment_event import PaymentEvent
+from app.services.payment_events import event_shard, payment_event_worker
+from app.services.stripe_client import get_stripe
+from app.core.config import settings
+
+router = APIRouter(prefix="/payments", tags=["Payments"])
+
+# Maximum age of a webhook signature timestamp, in seconds (Stripe's default)
+WEBHOOK_TOLERANCE = 300
+
+
+@router.post("/webhook")
+async def stripe_webhook(
+    request: Request,
+    stripe_signature: Optional[str] = Header(None, alias="Stripe-Signature"),
+    db: Session = Depends(get_db)
+):
+    """
+    Receive Stripe webhook events.
+    Events are verified, stored in the inbox and acknowledged immediately;
+    the payment event workers apply them to orders asynchronously.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Stripe webhook secret is not configured."
+        )
+
+    payload = await request.body()
+    stripe = get_stripe()
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"), stripe_signature or "", settings.STRIPE_WEBHOOK_SECRET,
+            tolerance=WEBHOOK_TOLERANCE
+        )
+        event = json.loads(payload)
+    except (stripe.error.SignatureVerificationError, ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid webhook signature or payload"
+        )
+
+    if not event.get("id") or not event.get("type"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Webhook payload is not a Stripe event"
+        )
+
+    # Stored in the inbox of the shard holding the order, so the worker settles
+    # it in one transaction with the order
+    shard = shard_map.named(event_shard(event))
+    inbox = db if shard is shard_map.default else shard.sessionmaker()
+    try:
+        inbox.add(PaymentEvent(
+            stripe_event_id=event["id"],
+            type=event["type"],
+            payload=event
+        ))
+        try:
+            inbox.commit()
+        except IntegrityError:
+            # Stripe retries deliveries; the event is already in the inbox
+            inbox.rollback()
+            return {"received": True, "duplicate": True}
+    finally:
+        if inbox is not db:
+            inbox.close()
+
+    payment_event_worker.wake()
+    return {"received": True}
@@ -1,19 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.db.database import get_db
+from typing import Callable, List, Optional, TypeVar
+from app.db.shards import get_shard_read_db, shard_map
 from app.models.user import User, UserRole
 from app.models.restaurant import Restaurant
 from app.models.menu_item import MenuItem
 from app.schemas.restaurant import RestaurantResponse, RestaurantWithMenu, MenuItemResponse
 from app.middleware.auth import get_current_active_user
+from app.core.cache import catalog_cache
 
 router = APIRouter(prefix="/restaurants", tags=["Restaurants"])
 
+T = TypeVar("T")
+
+
+def check_location_access(current_user: User, restaurant_country: Optional[str]):
+    """Non-admins can only access restaurants in their own country."""
+    if current_user.role != UserRole.ADMIN:
+        if restaurant_country != current_user.country:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only access restaurants in your assigned location"
+            )
+
+
+async def find_on_shards(db: Session, current_user: User, load: Callable[[Session], Optional[T]]) -> Optional[T]:
+    """Run ``load`` on the user's shard; for admins, on every shard, keeping the first hit."""
+    if current_user.role == UserRole.ADMIN:
+        results = await shard_map.scatter(db, load)
+    else:
+        results = [load(db)]
+    return next((result for result in results if result is not None), None)
+
 
 @router.get("/countries", response_model=List[str])
 async def list_countries(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_shard_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all available countries with restaurants. Only admins can see all countries."""
@@ -22,17 +45,28 @@ async def list_countries(
         # Non-admins only see their own country
         return [current_user.country] if current_user.country else []
     
-    countries = db.query(Restaurant.country).filter(
-        Restaurant.is_active == True,
-        Restaurant.country.isnot(None)
-    ).distinct().all()
-    return sorted([c[0] for c in countries if c[0]])
+    def load_countries(session: Session) -> List[str]:
+        countries = session.query(Restaurant.country).filter(
+            Restaurant.is_active == True,
+            Restaurant.country.isnot(None)
+        ).distinct().all()
+        return [c[0] for c in countries if c[0]]
+    
+    key = ("countries",)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        # Gathered from every shard in parallel
+        shard_countries = await shard_map.scatter(db, load_countries)
+        entry = catalog_cache.set(key, sorted({c for countries in shard_countries for c in countries}))
+    
+    return entry.response(request)
 
 
 @router.get("/", response_model=List[RestaurantResponse])
 async def list_restaurants(
+    request: Request,
     country: Optional[str] = Query(None, description="Filter by country (admin only)"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_shard_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -40,82 +74,110 @@ async def list_restaurants(
     - Admin: Can see all restaurants or filter by any country
     - Manager/Team Member: Only see restaurants in their assigned country
     """
-    query = db.query(Restaurant).filter(Restaurant.is_active == True)
-    
     if current_user.role == UserRole.ADMIN:
         # Admin can filter by any country or see all
-        if country:
-            query = query.filter(Restaurant.country == country)
+        country_filter = country
     else:
         # Non-admins only see restaurants in their own country
-        if current_user.country:
-            query = query.filter(Restaurant.country == current_user.country)
-        else:
+        if not current_user.country:
             # If user has no country set, show nothing (or you could show all)
             return []
+        country_filter = current_user.country
     
-    restaurants = query.all()
-    return [RestaurantResponse.model_validate(r) for r in restaurants]
+    def load_restaurants(session: Session) -> List[RestaurantResponse]:
+        query = session.query(Restaurant).filter(Restaurant.is_active == True)
+        if country_filter:
+            query = query.filter(Restaurant.country == country_filter)
+        return [RestaurantResponse.model_validate(r) for r in query.all()]
+    
+    key = ("restaurants", country_filter)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        if current_user.role == UserRole.ADMIN:
+            # Admins browse every country: gathered from all shards in parallel
+            restaurants = [r for shard_restaurants in await shard_map.scatter(db, load_restaurants)
+                           for r in shard_restaurants]
+        else:
+            restaurants = load_restaurants(db)
+        entry = catalog_cache.set(key, restaurants)
+    
+    return entry.response(request)
 
 
 @router.get("/{restaurant_id}", response_model=RestaurantResponse)
 async def get_restaurant(
     restaurant_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_shard_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get restaurant details. Non-admins can only access restaurants in their country."""
-    restaurant = db.query(Restaurant).filter(
-        Restaurant.id == restaurant_id,
-        Restaurant.is_active == True
-    ).first()
-    
-    if not restaurant:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Restaurant not found"
-        )
+    def load_restaurant(session: Session) -> Optional[RestaurantResponse]:
+        restaurant = session.query(Restaurant).filter(
+            Restaurant.id == restaurant_id,
+            Restaurant.is_active == True
+        ).first()
+        return RestaurantResponse.model_validate(restaurant) if restaurant else None
     
-    # Non-admins can only access restaurants in their country
-    if current_user.role != UserRole.ADMIN:
-        if restaurant.country != current_user.country:
+    key = ("restaurant", restaurant_id)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        restaurant = await find_on_shards(db, current_user, load_restaurant)
+        
+        if not restaurant:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only access restaurants in your assigned location"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Restaurant not found"
             )
+        
+        entry = catalog_cache.set(key, restaurant, meta={"country": restaurant.country})
     
-    return RestaurantResponse.model_validate(restaurant)
+    # Non-admins can only access restaurants in their country
+    check_location_access(current_user, entry.meta["country"])
+    
+    return entry.response(request)
 
 
 @router.get("/{restaurant_id}/menu", response_model=List[MenuItemResponse])
 async def get_restaurant_menu(
     restaurant_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_shard_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get menu items for a restaurant. Non-admins can only access their country's restaurants."""
-    restaurant = db.query(Restaurant).filter(
-        Restaurant.id == restaurant_id,
-        Restaurant.is_active == True
-    ).first()
+    def load_menu(session: Session) -> Optional[tuple]:
+        restaurant = session.query(Restaurant).filter(
+            Restaurant.id == restaurant_id,
+            Restaurant.is_active == True
+        ).first()
+        if not restaurant:
+            return None
+        
+        # Check access before loading the menu
+        check_location_access(current_user, restaurant.country)
+        
+        menu_items = session.query(MenuItem).filter(
+            MenuItem.restaurant_id == restaurant_id,
+            MenuItem.is_available == True
+        ).all()
+        return restaurant.country, [MenuItemResponse.model_validate(item) for item in menu_items]
     
-    if not restaurant:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Restaurant not found"
-        )
-    
-    # Non-admins can only access restaurants in their country
-    if current_user.role != UserRole.ADMIN:
-        if restaurant.country != current_user.country:
+    key = ("menu", restaurant_id)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        menu = await find_on_shards(db, current_user, load_menu)
+        
+        if not menu:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only access restaurants in your assigned location"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Restaurant not found"
             )
+        
+        country, menu_items = menu
+        entry = catalog_cache.set(key, menu_items, meta={"country": country})
     
-    menu_items = db.query(MenuItem).filter(
-        MenuItem.restaurant_id == restaurant_id,
-        MenuItem.is_available == True
-    ).all()
+    # Non-admins can only access restaurants in their country
+    check_location_access(current_user, entry.meta["country"])
     
-    return [MenuItemResponse.model_validate(item) for item in menu_items]
+    return entry.response(request)
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import date
+from typing import List, Optional
 import secrets
 import string
 from app.db.database import get_db
+from app.db.replicas import get_read_db
 from app.models.user import User, UserRole
 from app.schemas.user import UserResponse, UserCreateByAdmin, UserRoleUpdate, UserUpdate
 from app.middleware.auth import get_current_active_user
-from app.services.email import send_new_user_credentials_email
+from app.core.responses import FastJSONResponse
+from app.services.email import queue_new_user_credentials_email
+from app.services.email_outbox import email_outbox_sender
+from app.services.exports import ExportFormat, created_window, export_response, stream_users
 
 router = APIRouter(prefix="/users", tags=["User Management"])
 
@@ -31,7 +36,7 @@ def generate_random_password(length: int = 12) -> str:
 
 @router.get("/", response_model=List[UserResponse])
 async def list_users(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """List all users (Admin and Manager)."""
@@ -42,7 +47,32 @@ async def list_users(
         )
         
     users = db.query(User).all()
-    return [UserResponse.model_validate(user) for user in users]
+    return FastJSONResponse([UserResponse.model_validate(user) for user in users])
+
+
+@router.get("/export")
+async def export_users(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    first_day: Optional[date] = Query(None, alias="from", description="First day of created_at (UTC)"),
+    last_day: Optional[date] = Query(None, alias="to", description="Last day of created_at (UTC), inclusive"),
+    country: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream users as NDJSON or CSV (Admin and Manager)."""
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators and managers can export users"
+        )
+    
+    chunks = stream_users(export_format, role, is_active, created_window(first_day, last_day), country)
+    # The export streams from its own session; the request's session (which
+    # loaded the user) would otherwise keep its connection until the stream ends
+    db.close()
+    return export_response(chunks, export_format, "users")
 
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -72,19 +102,18 @@ async def create_user(
     )
     
     db.add(new_user)
+    
+    # Queue credentials email in the same transaction; the outbox sender delivers it
+    queue_new_user_credentials_email(
+        db,
+        email=new_user.email,
+        password=password,
+        role=new_user.role.value
+    )
+    
     db.commit()
     db.refresh(new_user)
-    
-    # Send email with credentials (async, non-blocking)
-    try:
-        await send_new_user_credentials_email(
-            email=new_user.email,
-            password=password,
-            role=new_user.role.value
-        )
-    except Exception as e:
-        # Log error but don't fail user creation
-        print(f"Failed to send email: {str(e)}")
+    email_outbox_sender.wake()
     
     return UserResponse.model_validate(new_user)
 
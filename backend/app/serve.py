@@ -0,0 +1,141 @@
+"""
+Production server entry point.
+
+Runs the API under uvicorn with one worker process per CPU core (or
+WEB_CONCURRENCY), the uvloop event loop and the httptools HTTP parser, and
+sizes each worker's database pool so that all workers together stay within
+DB_CONNECTION_BUDGET.
+
+On SIGTERM/SIGINT each worker first keeps serving for --drain-delay seconds
+with /ready failing, so the load balancer can take it out of rotation, then
+stops accepting connections, waits up to --timeout-graceful-shutdown for
+in-flight requests and runs the app's shutdown (see app.main.lifespan).
+A second signal skips the delay.
+
+Usage:
+    python -m app.serve [--workers N] [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import os
+from pathlib import Path
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+
+def default_workers() -> int:
+    """One worker per available CPU core."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that fails readiness for ``drain_delay`` seconds before stopping."""
+
+    drain_delay = 0.0
+
+    def handle_exit(self, sig, frame):
+        from app.core.lifecycle import lifecycle
+
+        if self.drain_delay <= 0 or lifecycle.draining:
+            super().handle_exit(sig, frame)
+            return
+
+        lifecycle.begin_drain()
+        print(f"Worker {os.getpid()} draining for {self.drain_delay}s before shutdown")
+        asyncio.get_event_loop().call_later(self.drain_delay, super().handle_exit, sig, frame)
+
+
+class Supervisor(Multiprocess):
+    """Signals all workers at once so they drain in parallel (uvicorn stops them one by one)."""
+
+    def shutdown(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        print(f"Stopped supervisor process [{self.pid}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the NextBite API in production mode")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: WEB_CONCURRENCY or one per CPU core)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--timeout-keep-alive", type=int, default=5)
+    parser.add_argument("--timeout-graceful-shutdown", type=int, default=None,
+                        help="Seconds in-flight requests get to finish (default: SHUTDOWN_TIMEOUT_SECONDS)")
+    parser.add_argument("--drain-delay", type=float, default=None,
+                        help="Seconds to keep serving with /ready failing (default: SHUTDOWN_DRAIN_DELAY_SECONDS)")
+    parser.add_argument("--no-access-log", action="store_true", help="Disable per-request access logging")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+
+    workers = args.workers or settings.WEB_CONCURRENCY or default_workers()
+
+    # Workers read this when sizing their connection pool (see app.db.database)
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    settings.WEB_CONCURRENCY = workers
+
+    if settings.DB_CONNECTION_BUDGET < workers:
+        print(f"Warning: DB_CONNECTION_BUDGET={settings.DB_CONNECTION_BUDGET} is less than "
+              f"{workers} workers; each worker still needs one connection")
+
+    if settings.METRICS_MULTIPROC_DIR:
+        # Snapshots of a previous run would be merged into this run's counters
+        metrics_dir = Path(settings.METRICS_MULTIPROC_DIR)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        for path in metrics_dir.glob("*.json"):
+            path.unlink()
+
+    # Preload: import the app once in the supervisor so configuration or import
+    # errors fail fast here instead of in every worker, and bytecode is warm.
+    importlib.import_module("app.main")
+    from app.db.database import POOL_SIZE, MAX_OVERFLOW
+
+    loop = "uvloop" if available("uvloop") else "asyncio"
+    http = "httptools" if available("httptools") else "h11"
+    print(f"Starting {workers} worker(s) on {args.host}:{args.port} (loop={loop}, http={http}, "
+          f"db pool per worker={POOL_SIZE}+{MAX_OVERFLOW} overflow)")
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.timeout_keep_alive,
+        timeout_graceful_shutdown=(
+            args.timeout_graceful_shutdown
+            if args.timeout_graceful_shutdown is not None
+            else int(settings.SHUTDOWN_TIMEOUT_SECONDS)
+        ),
+        access_log=not args.no_access_log,
+        proxy_headers=True,
+    )
+    server = DrainingServer(config=config)
+    server.drain_delay = args.drain_delay if args.drain_delay is not None else settings.SHUTDOWN_DRAIN_DELAY_SECONDS
+
+    # Same as uvicorn.run(), but with our server class
+    if workers > 1:
+        sock = config.bind_socket()
+        Supervisor(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
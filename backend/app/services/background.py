@@ -0,0 +1,84 @@
+import asyncio
+from typing import List
+
+
+class BackgroundWorker:
+    """Base class for in-process workers that drain a database-backed queue.
+
+    Subclasses implement ``run_batch`` (synchronous, executed in a thread so the
+    blocking SQLAlchemy session never stalls the event loop) and return how many
+    items they handled; workers that do async I/O override ``process`` instead.
+    Workers poll every ``poll_interval`` seconds and can be woken early with
+    ``wake()`` when new work is enqueued.
+    """
+
+    name = "worker"
+
+    def __init__(self, concurrency: int = 1, poll_interval: float = 1.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def run_batch(self) -> int:
+        """Process one batch of work and return the number of items handled."""
+        raise NotImplementedError
+
+    async def process(self) -> int:
+        """Process one batch of work from the event loop."""
+        return await asyncio.to_thread(self.run_batch)
+
+    async def close(self):
+        """Release resources held by the worker after it has stopped."""
+
+    def queue_depth(self) -> int:
+        """Number of items waiting to be processed."""
+        return 0
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def start(self):
+        """Start the worker pool."""
+        if self.running or self.concurrency <= 0:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"{self.name}-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    def wake(self):
+        """Wake idle workers so new work is picked up without waiting for the next poll."""
+        self._wakeup.set()
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop the worker pool, letting the batch in progress finish."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._tasks:
+            done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            self._tasks = []
+        await self.close()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                processed = await self.process()
+            except Exception as e:
+                print(f"{self.name} batch failed: {str(e)}")
+                processed = 0
+
+            if processed:
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from app.db.shards import shard_map
+from app.models.order import Order, OrderStatus
+from app.models.order_item import OrderItem
+from app.services.background import BackgroundWorker
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+
+CARTS_EXPIRED = Counter(
+    "nextbite_carts_expired_total",
+    "Abandoned carts deleted by the cart sweeper, by shard",
+    ["shard"],
+)
+
+# A cart's last activity: adding or removing items updates the order (its total)
+CART_ACTIVITY = func.coalesce(Order.updated_at, Order.created_at)  # Matches ix_orders_cart_activity
+
+
+def expire_carts(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Delete up to ``batch_size`` carts idle since before ``cutoff``, oldest first, in one transaction.
+
+    The carts are locked with ``FOR UPDATE SKIP LOCKED`` (Postgres), so sweepers
+    in other worker processes take different carts, and carts that checkout or
+    an item change holds locked are skipped. Both deletes repeat the expiry
+    predicate, so a cart checked out or touched since it was picked (where
+    nothing was locked, e.g. on SQLite) stays, with its items. Items go first:
+    nothing cascades in the database.
+    """
+    cart_ids = db.execute(
+        select(Order.id).where(
+            Order.status == OrderStatus.CART, CART_ACTIVITY < cutoff
+        ).order_by(CART_ACTIVITY).limit(batch_size).with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not cart_ids:
+        db.rollback()
+        return 0
+
+    expired = (Order.id.in_(cart_ids), Order.status == OrderStatus.CART, CART_ACTIVITY < cutoff)
+    no_sync = {"synchronize_session": False}  # Nothing is loaded in this session
+    db.execute(
+        delete(OrderItem).where(OrderItem.order_id.in_(select(Order.id).where(*expired))), execution_options=no_sync
+    )
+    deleted = db.execute(
+        delete(Order).where(*expired).returning(Order.id), execution_options=no_sync
+    ).scalars().all()
+    db.commit()
+    return len(deleted)
+
+
+def sweep_lag(db: Session, cutoff: datetime) -> float:
+    """Seconds the oldest expired cart still waiting has been past its TTL (0 when caught up)."""
+    oldest = db.execute(
+        select(func.min(CART_ACTIVITY)).where(Order.status == OrderStatus.CART, CART_ACTIVITY < cutoff)
+    ).scalar()
+    if oldest is None:
+        return 0.0
+    if oldest.tzinfo is None:  # SQLite
+        oldest = oldest.replace(tzinfo=timezone.utc)
+    return max((cutoff - oldest).total_seconds(), 0.0)
+
+
+class CartSweeper(BackgroundWorker):
+    """Deletes carts nobody touched for CART_TTL_SECONDS, in bounded batches on every shard.
+
+    Every worker process runs one; they share the work through SKIP LOCKED.
+    While a backlog remains, batches run back to back (one transaction each);
+    once every shard is caught up the sweeper sleeps for its poll interval.
+    """
+
+    name = "cart-sweeper"
+
+    def __init__(self, ttl_seconds: float, batch_size: int = 500, **kwargs):
+        super().__init__(**kwargs)
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.batch_size = batch_size
+        self.lag: Dict[str, float] = {}
+
+    def run_batch(self) -> int:
+        cutoff = datetime.now(timezone.utc) - self.ttl
+        expired = 0
+        for shard in shard_map.all():
+            db = shard.sessionmaker()
+            try:
+                count = expire_carts(db, cutoff, self.batch_size)
+                CARTS_EXPIRED.inc(shard.name, amount=count)
+                expired += count
+                # A short batch means nothing else was due (apart from carts locked right now)
+                self.lag[shard.name] = sweep_lag(db, cutoff) if count == self.batch_size else 0.0
+            except Exception as e:
+                db.rollback()
+                print(f"{self.name} batch failed on shard {shard.name}: {str(e)}")
+            finally:
+                db.close()
+        return expired
+
+
+cart_sweeper = CartSweeper(
+    ttl_seconds=settings.CART_TTL_SECONDS,
+    batch_size=settings.CART_SWEEP_BATCH_SIZE,
+    concurrency=1 if settings.CART_TTL_SECONDS > 0 else 0,
+    poll_interval=settings.CART_SWEEP_INTERVAL_SECONDS,
+)
+
+Gauge(
+    "nextbite_cart_sweeper_lag_seconds",
+    "How long the oldest expired cart has been waiting past its TTL, by shard",
+    ["shard"],
+    function=lambda: {(shard,): lag for shard, lag in cart_sweeper.lag.items()},
+)
@@ -1,12 +1,16 @@
-import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from jinja2 import Template
+from typing import Iterable, Iterator, List, Tuple
+from sqlalchemy.orm import Session
+from app.models.email_outbox import EmailOutbox
+from app.models.order import Order
+from app.services.templates import email_templates
 from app.core.config import settings
+from app.core.metrics import SMTP_DURATION
 
 
-async def send_email(to_email: str, subject: str, html_content: str):
-    """Send an email using SMTP."""
+def build_message(to_email: str, subject: str, html_content: str) -> MIMEMultipart:
+    """Build a MIME message ready to hand to the SMTP server."""
     message = MIMEMultipart("alternative")
     message["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
     message["To"] = to_email
@@ -14,125 +18,108 @@ async def send_email(to_email: str, subject: str, html_content: str):
     
     html_part = MIMEText(html_content, "html")
     message.attach(html_part)
+    return message
+
+
+async def send_email(to_email: str, subject: str, html_content: str):
+    """Send a single email immediately over a new SMTP connection.
+
+    Application emails go through the outbox (``queue_email``) instead.
+    """
+    if not settings.SMTP_HOST:
+        print(f"SMTP is not configured; not sending email to {to_email}")
+        return
+    
+    import aiosmtplib  # Deferred so workers boot without loading the SMTP client
+    
+    message = build_message(to_email, subject, html_content)
     
     try:
-        await aiosmtplib.send(
-            message,
-            hostname=settings.SMTP_HOST,
-            port=settings.SMTP_PORT,
-            username=settings.SMTP_USER,
-            password=settings.SMTP_PASSWORD,
-            use_tls=True,
-        )
+        with SMTP_DURATION.time("send"):
+            await aiosmtplib.send(
+                message,
+                hostname=settings.SMTP_HOST,
+                port=settings.SMTP_PORT,
+                username=settings.SMTP_USER,
+                password=settings.SMTP_PASSWORD,
+                use_tls=settings.SMTP_USE_TLS,
+            )
     except Exception as e:
         print(f"Failed to send email to {to_email}: {str(e)}")
-        # Don't raise exception to avoid blocking user creation
-
-
-async def send_new_user_credentials_email(email: str, password: str, role: str):
-    """Send credentials to newly created user."""
-    template = Template("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {
-                font-family: 'Arial', sans-serif;
-                background-color: #f4f4f4;
-                padding: 20px;
-            }
-            .container {
-                max-width: 600px;
-                margin: 0 auto;
-                background-color: white;
-                border-radius: 10px;
-                padding: 30px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }
-            h1 {
-                color: #FF6B35;
-                margin-bottom: 20px;
-            }
-            .credentials {
-                background-color: #f8f9fa;
-                padding: 20px;
-                border-radius: 5px;
-                margin: 20px 0;
-            }
-            .credential-item {
-                margin: 10px 0;
-            }
-            .label {
-                font-weight: bold;
-                color: #333;
-            }
-            .value {
-                color: #666;
-                font-family: 'Courier New', monospace;
-                background-color: #e9ecef;
-                padding: 5px 10px;
-                border-radius: 3px;
-                display: inline-block;
-            }
-            .warning {
-                color: #dc3545;
-                font-size: 14px;
-                margin-top: 20px;
-                padding: 10px;
-                background-color: #fff3cd;
-                border-radius: 5px;
-            }
-            .footer {
-                margin-top: 30px;
-                text-align: center;
-                color: #999;
-                font-size: 12px;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Welcome to NextBite! 🍔</h1>
-            <p>Hello,</p>
-            <p>An account has been created for you on NextBite. Here are your login credentials:</p>
-            
-            <div class="credentials">
-                <div class="credential-item">
-                    <span class="label">Email:</span>
-                    <span class="value">{{ email }}</span>
-                </div>
-                <div class="credential-item">
-                    <span class="label">Password:</span>
-                    <span class="value">{{ password }}</span>
-                </div>
-                <div class="credential-item">
-                    <span class="label">Role:</span>
-                    <span class="value">{{ role }}</span>
-                </div>
-            </div>
-            
-            <div class="warning">
-                ⚠️ <strong>Important:</strong> Please change your password after your first login for security reasons.
-            </div>
-            
-            <p>You can now log in to NextBite and start ordering delicious food!</p>
-            
-            <div class="footer">
-                <p>This is an automated email from NextBite. Please do not reply to this message.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """)
-    
-    html_content = template.render(
+
+
+def queue_email(db: Session, to_email: str, subject: str, html_content: str) -> EmailOutbox:
+    """Add an email to the outbox as part of the caller's transaction (does not commit)."""
+    outbox_email = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content
+    )
+    db.add(outbox_email)
+    return outbox_email
+
+
+def queue_emails(db: Session, messages: Iterable[Tuple[str, str, str]]) -> List[EmailOutbox]:
+    """Add many (to_email, subject, html_content) messages to the outbox (does not commit)."""
+    outbox_emails = [
+        EmailOutbox(to_email=to_email, subject=subject, html_content=html_content)
+        for to_email, subject, html_content in messages
+    ]
+    db.add_all(outbox_emails)
+    return outbox_emails
+
+
+def render_new_user_credentials_email(email: str, password: str, role: str) -> str:
+    """Render the credentials email for a newly created user."""
+    return email_templates.render(
+        "email/credentials.html",
         email=email,
         password=password,
         role=role.replace("_", " ").title()
     )
-    
-    await send_email(
+
+
+def render_order_receipt_email(context: dict) -> str:
+    """Render an order receipt. See ``templates/email/receipt.html`` for the context."""
+    return email_templates.render("email/receipt.html", **context)
+
+
+def render_manager_digest_emails(contexts: Iterable[dict]) -> Iterator[str]:
+    """Render daily digests for many managers with one compiled template."""
+    return email_templates.render_many("email/digest.html", contexts)
+
+
+def queue_new_user_credentials_email(db: Session, email: str, password: str, role: str) -> EmailOutbox:
+    """Queue the credentials email for a newly created user."""
+    return queue_email(
+        db,
         to_email=email,
         subject="Welcome to NextBite - Your Login Credentials",
+        html_content=render_new_user_credentials_email(email, password, role)
+    )
+
+
+def queue_order_receipt_email(db: Session, order: Order, payment_method: str) -> EmailOutbox:
+    """Queue a receipt for a completed order, addressed to the order owner."""
+    items = [
+        {
+            "name": item.menu_item.name if item.menu_item else f"Item #{item.menu_item_id}",
+            "quantity": item.quantity,
+            "price": item.price_at_time,
+        }
+        for item in order.order_items
+    ]
+    html_content = render_order_receipt_email({
+        "name": order.user.full_name,
+        "order_id": order.id,
+        "restaurant_name": order.restaurant.name,
+        "items": items,
+        "total_amount": order.total_amount,
+        "payment_method": payment_method,
+    })
+    return queue_email(
+        db,
+        to_email=order.user.email,
+        subject=f"Your NextBite receipt for order #{order.id}",
         html_content=html_content
     )
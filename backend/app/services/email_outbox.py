@@ -0,0 +1,239 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.db.shards import shard_map
+from app.models.email_outbox import EmailOutbox, EmailStatus
+from app.services.background import BackgroundWorker
+from app.services.email import build_message
+from app.core.config import settings
+from app.core.metrics import SMTP_DURATION
+from app.core.tracing import tracer
+
+# Longest wait between two delivery attempts of the same message
+MAX_RETRY_DELAY_SECONDS = 3600
+
+# SMTP timeouts one message may take in all (connect, send, reconnect and resend)
+SEND_TIMEOUTS_PER_MESSAGE = 3
+
+
+class EmailOutboxSender(BackgroundWorker):
+    """Drains the email outbox over a single long-lived, authenticated SMTP session.
+
+    Messages are claimed in batches by pushing their ``next_attempt_at`` forward by
+    a lease, so several app processes can run a sender without double-sending.
+    Each message gets at most SEND_TIMEOUTS_PER_MESSAGE SMTP timeouts, the lease
+    defaults to that times the batch size, and a batch stops (handing the rest
+    back) before a message could outlive the lease. Sent messages are deleted;
+    failures are retried with exponential backoff. Messages that fail for good
+    have their body removed, since it may hold credentials.
+    Receipts are queued on the shard holding their order, so every shard's
+    outbox is drained in turn.
+    """
+
+    name = "email-outbox"
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        max_attempts: int = 8,
+        retry_base_seconds: float = 30.0,
+        smtp_timeout: float = 30.0,
+        lease_seconds: Optional[float] = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.smtp_timeout = smtp_timeout
+        self.send_timeout = SEND_TIMEOUTS_PER_MESSAGE * smtp_timeout
+        self.lease_seconds = lease_seconds or batch_size * self.send_timeout
+        self._smtp = None
+        self._current_batch = None  # (session_factory, batch, sent_ids, failures) while a batch is being sent
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "connections": 0}
+
+    def claim_batch(
+        self, session_factory: Callable[[], Session] = SessionLocal
+    ) -> List[Tuple[int, str, str, str, int]]:
+        """Lease a batch of due messages and return their contents."""
+        db = session_factory()
+        try:
+            now = datetime.now(timezone.utc)
+            rows = db.query(EmailOutbox).filter(
+                EmailOutbox.status == EmailStatus.PENDING,
+                EmailOutbox.next_attempt_at <= now
+            ).order_by(
+                EmailOutbox.next_attempt_at, EmailOutbox.id
+            ).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            lease_until = now + timedelta(seconds=self.lease_seconds)
+            batch = []
+            for row in rows:
+                row.next_attempt_at = lease_until
+                batch.append((row.id, row.to_email, row.subject, row.html_content, row.attempts))
+            db.commit()
+            return batch
+        finally:
+            db.close()
+
+    def record_results(
+        self,
+        sent_ids: List[int],
+        failures: Dict[int, Tuple[int, str]],
+        release_ids: Iterable[int] = (),
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        """Delete delivered messages and reschedule (or give up on) failed ones.
+
+        Messages in ``release_ids`` were claimed but never attempted; their lease
+        is cancelled so any sender can pick them up right away.
+        """
+        db = session_factory()
+        try:
+            if sent_ids:
+                db.query(EmailOutbox).filter(
+                    EmailOutbox.id.in_(sent_ids)
+                ).delete(synchronize_session=False)
+
+            now = datetime.now(timezone.utc)
+            release_ids = list(release_ids)
+            if release_ids:
+                db.query(EmailOutbox).filter(
+                    EmailOutbox.id.in_(release_ids)
+                ).update({"next_attempt_at": now}, synchronize_session=False)
+
+            for outbox_id, (attempts, error) in failures.items():
+                values = {"attempts": attempts, "last_error": error[:500]}
+                if attempts >= self.max_attempts:
+                    # Nothing resends it; don't keep a body that may hold a password
+                    values["status"] = EmailStatus.FAILED
+                    values["html_content"] = ""
+                else:
+                    delay = min(self.retry_base_seconds * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+                    values["next_attempt_at"] = now + timedelta(seconds=delay)
+                db.query(EmailOutbox).filter(EmailOutbox.id == outbox_id).update(
+                    values, synchronize_session=False
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    async def process(self) -> int:
+        handled = 0
+        for shard in shard_map.all():
+            handled += await self._process_outbox(shard.sessionmaker)
+        return handled
+
+    async def _process_outbox(self, session_factory: Callable[[], Session]) -> int:
+        loop = asyncio.get_running_loop()
+        lease_ends = loop.time() + self.lease_seconds  # Taken before the claim, so never late
+        batch = await asyncio.to_thread(self.claim_batch, session_factory)
+        if not batch:
+            return 0
+
+        sent_ids = []
+        failures = {}
+        release_ids = []
+        self._current_batch = (session_factory, batch, sent_ids, failures)
+        with tracer.start_trace("email_outbox.batch", kind="internal", attributes={"batch.size": len(batch)}):
+            for index, (outbox_id, to_email, subject, html_content, attempts) in enumerate(batch):
+                if loop.time() + self.send_timeout > lease_ends:
+                    # Another sender may claim the rest once the lease ends
+                    release_ids = [row[0] for row in batch[index:]]
+                    break
+                try:
+                    await asyncio.wait_for(
+                        self._send(build_message(to_email, subject, html_content)), timeout=self.send_timeout
+                    )
+                    sent_ids.append(outbox_id)
+                except Exception as e:
+                    failures[outbox_id] = (attempts + 1, str(e) or type(e).__name__)
+                    print(f"Failed to send email to {to_email}: {str(e)}")
+                    if isinstance(e, asyncio.TimeoutError):
+                        self._drop_connection()  # Left mid-command
+
+            await asyncio.to_thread(self.record_results, sent_ids, failures, release_ids, session_factory)
+            self._current_batch = None
+
+        self.stats["sent"] += len(sent_ids)
+        for attempts, _ in failures.values():
+            self.stats["failed" if attempts >= self.max_attempts else "retried"] += 1
+        return len(batch)
+
+    async def _connect(self):
+        import aiosmtplib  # Deferred so workers boot without loading the SMTP client
+
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER or None,
+            password=settings.SMTP_PASSWORD or None,
+            use_tls=settings.SMTP_USE_TLS,
+            timeout=self.smtp_timeout,
+        )
+        with SMTP_DURATION.time("connect"), tracer.span("smtp.connect", kind="client"):
+            await smtp.connect()  # Also authenticates when credentials are set
+        self._smtp = smtp
+        self.stats["connections"] += 1
+
+    async def _send(self, message):
+        import aiosmtplib
+
+        if self._smtp is None or not self._smtp.is_connected:
+            await self._connect()
+        try:
+            with SMTP_DURATION.time("send"), tracer.span("smtp.send", kind="client"):
+                await self._smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # The server dropped the idle session; reconnect once and retry
+            await self._connect()
+            with SMTP_DURATION.time("send"), tracer.span("smtp.send", kind="client"):
+                await self._smtp.send_message(message)
+
+    def _drop_connection(self):
+        if self._smtp is not None:
+            self._smtp.close()
+        self._smtp = None
+
+    async def close(self):
+        import aiosmtplib
+
+        if self._current_batch is not None:
+            # Stopped mid-batch: record what was sent and hand the rest back
+            session_factory, batch, sent_ids, failures = self._current_batch
+            done = set(sent_ids) | set(failures)
+            release_ids = [row[0] for row in batch if row[0] not in done]
+            await asyncio.to_thread(self.record_results, sent_ids, failures, release_ids, session_factory)
+            self._current_batch = None
+
+        if self._smtp is not None and self._smtp.is_connected:
+            try:
+                await self._smtp.quit()
+            except aiosmtplib.SMTPException:
+                self._smtp.close()
+        self._smtp = None
+
+    def queue_depth(self) -> int:
+        depth = 0
+        for shard in shard_map.all():
+            db = shard.sessionmaker()
+            try:
+                depth += db.query(func.count(EmailOutbox.id)).filter(
+                    EmailOutbox.status == EmailStatus.PENDING
+                ).scalar()
+            finally:
+                db.close()
+        return depth
+
+
+email_outbox_sender = EmailOutboxSender(
+    batch_size=settings.EMAIL_OUTBOX_BATCH_SIZE,
+    max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    retry_base_seconds=settings.EMAIL_OUTBOX_RETRY_SECONDS,
+    smtp_timeout=settings.SMTP_TIMEOUT_SECONDS,
+    concurrency=1 if settings.EMAIL_OUTBOX_ENABLED and settings.SMTP_HOST else 0,
+    poll_interval=settings.EMAIL_OUTBOX_POLL_SECONDS,
+)
@@ -0,0 +1,279 @@
+"""
+Streaming exports of orders and users as NDJSON or CSV.
+
+Rows come from a server-side cursor (``yield_per``) as plain column tuples, so
+no ORM objects pile up in the identity map, and are serialized and sent in
+chunks of about EXPORT_CHUNK_SIZE bytes. Memory stays flat however many rows
+match. The generators are synchronous; StreamingResponse iterates them in the
+threadpool, so the cursor never blocks the event loop.
+
+Exports open their own sessions (a replica for the default shard when one is
+healthy), so they don't hold the request's session while streaming. Each worker
+runs at most EXPORT_MAX_CONCURRENT exports at a time; more get a 429.
+"""
+import csv
+import enum
+import io
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import groupby
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+import orjson
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.db.archive import ArchivedOrder, ArchivedOrderItem, archive_available
+from app.db.replicas import READ_SESSIONS, replica_set
+from app.db.shards import Shard, shard_map
+from app.models.order import Order, OrderStatus
+from app.models.order_item import OrderItem
+from app.models.restaurant import Restaurant
+from app.models.user import User, UserRole
+
+EXPORT_ROWS = Counter(
+    "nextbite_export_rows_total",
+    "Rows streamed by the export endpoints",
+    ["export", "format"],
+)
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Bytes serialized before a chunk is sent (and compressed, see CompressionMiddleware)
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+ORDER_COLUMNS = [
+    "id", "user_id", "restaurant_id", "country", "status", "total_amount", "created_at", "updated_at",
+]
+ORDER_ITEM_COLUMNS = ["item_id", "menu_item_id", "quantity", "price_at_time"]
+USER_COLUMNS = ["id", "user_uid", "email", "full_name", "role", "country", "is_active", "created_at"]
+
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE
+
+_export_slots = threading.BoundedSemaphore(settings.EXPORT_MAX_CONCURRENT)
+
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv"}  # Starlette adds the charset
+
+
+Window = Tuple[Optional[datetime], Optional[datetime]]
+
+
+def created_window(first_day: Optional[date], last_day: Optional[date]) -> Window:
+    """Bounds for an inclusive range of UTC days, as [start, end) datetimes (None when open)."""
+    start = datetime.combine(first_day, time.min, tzinfo=timezone.utc) if first_day else None
+    end = datetime.combine(last_day, time.min, tzinfo=timezone.utc) + timedelta(days=1) if last_day else None
+    return start, end
+
+
+def _export_session(shard: Shard) -> Session:
+    """A session for an export: a healthy replica for the default shard, else the shard itself."""
+    if shard is shard_map.default and replica_set.enabled:
+        replica = replica_set.choose()
+        if replica is not None:
+            READ_SESSIONS.inc("replica")
+            session = replica.sessionmaker()
+            session.info["replica"] = replica.name
+            return session
+    return shard.sessionmaker()
+
+
+def _csv_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+    return value
+
+
+def _chunks(lines: Iterable[bytes]) -> Iterator[bytes]:
+    buffer: List[bytes] = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _ndjson_lines(records: Iterable[dict]) -> Iterator[bytes]:
+    for record in records:
+        yield orjson.dumps(record, option=_ORJSON_OPTIONS)
+
+
+def _csv_lines(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # Header only: nothing matched
+
+
+def _order_rows(session: Session, status_filter: Optional[OrderStatus], window: Window,
+                country: Optional[str]) -> Iterator[tuple]:
+    """Orders joined with their items (one row per item, one for an empty order), by order id."""
+    sources = [(Order, OrderItem)]
+    if archive_available(session):
+        sources.append((ArchivedOrder, ArchivedOrderItem))
+    start, end = window
+    for order, item in sources:
+        query = session.query(
+            order.id, order.user_id, order.restaurant_id, Restaurant.country, order.status,
+            order.total_amount, order.created_at, order.updated_at,
+            item.id, item.menu_item_id, item.quantity, item.price_at_time,
+        ).join(
+            Restaurant, Restaurant.id == order.restaurant_id
+        ).outerjoin(
+            item, item.order_id == order.id
+        )
+        if status_filter is not None:
+            query = query.filter(order.status == status_filter)
+        if start is not None:
+            query = query.filter(order.created_at >= start)
+        if end is not None:
+            query = query.filter(order.created_at < end)
+        if country is not None:
+            query = query.filter(Restaurant.country == country)
+        yield from query.order_by(order.id, item.id).execution_options(
+            stream_results=True, yield_per=EXPORT_BATCH_SIZE
+        )
+
+
+def stream_orders(shards: Sequence[Shard], export_format: ExportFormat, status_filter: Optional[OrderStatus],
+                  window: Window, country: Optional[str]) -> Iterator[bytes]:
+    """Matching orders of ``shards``, one shard after the other, as NDJSON or CSV chunks."""
+    width = len(ORDER_COLUMNS)
+
+    def rows() -> Iterator[tuple]:
+        for shard in shards:
+            session = _export_session(shard)
+            try:
+                yield from _order_rows(session, status_filter, window, country)
+            finally:
+                session.close()
+
+    if export_format == ExportFormat.CSV:
+        lines = _csv_lines([*ORDER_COLUMNS, *ORDER_ITEM_COLUMNS], _counted(rows(), "orders", export_format))
+    else:
+        def records() -> Iterator[dict]:
+            for _, order_rows in groupby(rows(), key=lambda row: row[0]):
+                first = next(order_rows)
+                record = dict(zip(ORDER_COLUMNS, first[:width]))
+                record["items"] = [
+                    dict(zip(ORDER_ITEM_COLUMNS, row[width:]))
+                    for row in (first, *order_rows) if row[width] is not None
+                ]
+                yield record
+
+        lines = _ndjson_lines(_counted(records(), "orders", export_format))
+    yield from _chunks(lines)
+
+
+def _user_rows(session: Session, role: Optional[UserRole], is_active: Optional[bool], window: Window,
+               country: Optional[str]) -> Iterator[tuple]:
+    query = session.query(
+        User.id, User.user_uid, User.email, User.full_name, User.role, User.country, User.is_active,
+        User.created_at,
+    )
+    start, end = window
+    if role is not None:
+        query = query.filter(User.role == role)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if start is not None:
+        query = query.filter(User.created_at >= start)
+    if end is not None:
+        query = query.filter(User.created_at < end)
+    if country is not None:
+        query = query.filter(User.country == country)
+    return iter(query.order_by(User.id).execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+
+
+def stream_users(export_format: ExportFormat, role: Optional[UserRole], is_active: Optional[bool],
+                 window: Window, country: Optional[str]) -> Iterator[bytes]:
+    """Matching users (they all live on DATABASE_URL) as NDJSON or CSV chunks."""
+    session = _export_session(shard_map.default)
+    try:
+        rows = _counted(_user_rows(session, role, is_active, window, country), "users", export_format)
+        if export_format == ExportFormat.CSV:
+            lines = _csv_lines(USER_COLUMNS, rows)
+        else:
+            lines = _ndjson_lines(dict(zip(USER_COLUMNS, row)) for row in rows)
+        yield from _chunks(lines)
+    finally:
+        session.close()
+
+
+def _counted(rows: Iterable, export: str, export_format: ExportFormat) -> Iterator:
+    """Pass ``rows`` through, counting them in EXPORT_ROWS (a batch at a time)."""
+    count = 0
+    try:
+        for row in rows:
+            yield row
+            count += 1
+            if count == EXPORT_BATCH_SIZE:
+                EXPORT_ROWS.inc(export, export_format.value, amount=count)
+                count = 0
+    finally:
+        EXPORT_ROWS.inc(export, export_format.value, amount=count)
+
+
+class _ExportSlot:
+    """One of the worker's EXPORT_MAX_CONCURRENT slots, released exactly once."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._held = True
+
+    def release(self):
+        with self._lock:
+            if self._held:
+                self._held = False
+                _export_slots.release()
+
+
+def _releasing(chunks: Iterator[bytes], slot: _ExportSlot) -> Iterator[bytes]:
+    try:
+        yield from chunks
+    finally:
+        slot.release()
+
+
+def export_response(chunks: Iterator[bytes], export_format: ExportFormat, name: str) -> StreamingResponse:
+    """Stream ``chunks`` as a download, holding an export slot until the response ends.
+
+    Raises 429 when this worker already runs EXPORT_MAX_CONCURRENT exports.
+    """
+    if not _export_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many exports are running; try again shortly",
+            headers={"Retry-After": "10"},
+        )
+    slot = _ExportSlot()
+    extension = "csv" if export_format == ExportFormat.CSV else "ndjson"
+    return StreamingResponse(
+        _releasing(chunks, slot),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+        # The stream releases the slot when it ends or fails; this covers a
+        # client that went away (the stream is then never finished)
+        background=BackgroundTask(slot.release),
+    )
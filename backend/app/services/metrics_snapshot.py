@@ -0,0 +1,33 @@
+from typing import Optional
+from app.core.metrics import REGISTRY
+from app.services.background import BackgroundWorker
+from app.core.config import settings
+
+
+class MetricsSnapshotWriter(BackgroundWorker):
+    """Periodically writes this worker's metrics to METRICS_MULTIPROC_DIR.
+
+    ``/metrics`` can be served by any worker process, so each one publishes its
+    numbers for the others to merge. A final snapshot is written on shutdown.
+    """
+
+    name = "metrics-snapshot"
+
+    def __init__(self, directory: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+
+    def run_batch(self) -> int:
+        REGISTRY.write_snapshot(self.directory)
+        return 0  # Always sleep until the next flush
+
+    async def close(self):
+        if self.directory:
+            REGISTRY.write_snapshot(self.directory)
+
+
+metrics_snapshot_writer = MetricsSnapshotWriter(
+    directory=settings.METRICS_MULTIPROC_DIR,
+    concurrency=1 if settings.METRICS_MULTIPROC_DIR else 0,
+    poll_interval=settings.METRICS_FLUSH_SECONDS,
+)
@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from app.db.shards import shard_map
+from app.models.order import Order, OrderStatus
+from app.models.payment_event import PaymentEvent, PaymentEventStatus
+from app.services.background import BackgroundWorker
+from app.services.email import queue_order_receipt_email
+from app.core.config import settings
+
+# Webhook event type -> order status it moves the order to
+EVENT_ORDER_STATUS = {
+    "payment_intent.succeeded": OrderStatus.COMPLETED,
+    "payment_intent.processing": OrderStatus.PENDING,
+    "payment_intent.requires_action": OrderStatus.PENDING,
+    # Reopen the cart for another payment attempt, unless the user has opened
+    # another cart since (a user has one cart); the order is cancelled then
+    "payment_intent.payment_failed": OrderStatus.CART,
+    "payment_intent.canceled": OrderStatus.CANCELLED,
+    "charge.refunded": OrderStatus.CANCELLED,
+}
+
+# Longest wait between two attempts at the same event
+MAX_RETRY_DELAY_SECONDS = 3600
+
+# Transitions a webhook is allowed to make. Events can arrive out of order, so a
+# stale "processing" must never pull a completed order back to pending.
+ALLOWED_TRANSITIONS = {
+    OrderStatus.CART: {OrderStatus.PENDING, OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.PENDING: {OrderStatus.CART, OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.COMPLETED: {OrderStatus.CANCELLED},
+    OrderStatus.CANCELLED: set(),
+}
+
+
+def _payment_intent_ref(event: dict):
+    """Return (payment_intent_id, order_id) referenced by an event payload."""
+    obj = event.get("data", {}).get("object", {})
+    if obj.get("object") == "charge":
+        intent_id = obj.get("payment_intent")
+    else:
+        intent_id = obj.get("id")
+
+    order_id = (obj.get("metadata") or {}).get("order_id")
+    try:
+        order_id = int(order_id) if order_id is not None else None
+    except (ValueError, TypeError):
+        order_id = None
+    return intent_id, order_id
+
+
+def event_shard(event: dict) -> Optional[str]:
+    """Shard holding the event's order, from the metadata set at checkout."""
+    obj = event.get("data", {}).get("object", {})
+    return (obj.get("metadata") or {}).get("shard")
+
+
+def apply_event(order: Order, event: dict, can_reopen: bool = True) -> bool:
+    """Apply a single webhook event to its order. Returns True if the status changed.
+
+    ``can_reopen`` is False when the order's user already has a cart, so a failed
+    payment cancels the order instead of reopening it as a second cart.
+    """
+    new_status = EVENT_ORDER_STATUS.get(event["type"])
+    if new_status is None:
+        return False
+    if new_status == OrderStatus.CART and not can_reopen and new_status in ALLOWED_TRANSITIONS[order.status]:
+        new_status = OrderStatus.CANCELLED
+
+    if event["type"] == "charge.refunded" and not event["data"]["object"].get("refunded"):
+        # Partial refund: the order stays completed
+        return False
+
+    intent_id, _ = _payment_intent_ref(event)
+    if intent_id and not order.stripe_payment_intent_id:
+        order.stripe_payment_intent_id = intent_id
+
+    if new_status != order.status and new_status in ALLOWED_TRANSITIONS[order.status]:
+        order.status = new_status
+        return True
+    return False
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt at an event that failed ``attempts`` times."""
+    return min(settings.PAYMENT_EVENT_RETRY_SECONDS * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+
+
+def process_pending_events(db: Session, batch_size: int) -> int:
+    """Apply a batch of due inbox events to orders in one transaction.
+
+    An event that raises is retried with exponential backoff (so it doesn't
+    come back in every batch) until PAYMENT_EVENT_MAX_ATTEMPTS.
+    """
+    now = datetime.now(timezone.utc)
+    events = db.query(PaymentEvent).filter(
+        PaymentEvent.status == PaymentEventStatus.PENDING,
+        PaymentEvent.next_attempt_at <= now
+    ).order_by(PaymentEvent.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    if not events:
+        return 0
+
+    # Load every referenced order with a single query
+    refs = [_payment_intent_ref(event.payload) for event in events]
+    intent_ids = {intent_id for intent_id, _ in refs if intent_id}
+    order_ids = {order_id for _, order_id in refs if order_id}
+    orders = db.query(Order).filter(or_(
+        Order.stripe_payment_intent_id.in_(intent_ids),
+        Order.id.in_(order_ids),
+    )).all() if intent_ids or order_ids else []
+    orders_by_intent = {o.stripe_payment_intent_id: o for o in orders if o.stripe_payment_intent_id}
+    orders_by_id = {o.id: o for o in orders}
+    # Owners who already have a cart, which a failed payment must not reopen
+    # a second one next to (only looked up when a payment failed)
+    users_with_cart = set()
+    if any(event.type == "payment_intent.payment_failed" for event in events) and orders:
+        users_with_cart = {user_id for user_id, in db.query(Order.user_id).filter(
+            Order.user_id.in_({o.user_id for o in orders}), Order.status == OrderStatus.CART
+        ).distinct()}
+
+    for event, (intent_id, order_id) in zip(events, refs):
+        event.attempts += 1
+        try:
+            order = orders_by_intent.get(intent_id) or orders_by_id.get(order_id)
+            if order is not None:
+                can_reopen = order.status == OrderStatus.CART or order.user_id not in users_with_cart
+                if apply_event(order, event.payload, can_reopen) and order.status == OrderStatus.COMPLETED:
+                    queue_order_receipt_email(db, order, payment_method="Card")
+                if order.status == OrderStatus.CART:
+                    users_with_cart.add(order.user_id)
+                if order.stripe_payment_intent_id:
+                    orders_by_intent[order.stripe_payment_intent_id] = order
+            elif event.type in EVENT_ORDER_STATUS:
+                event.last_error = "No matching order"
+            event.status = PaymentEventStatus.PROCESSED
+            event.processed_at = now
+        except Exception as e:
+            event.last_error = str(e)
+            if event.attempts >= settings.PAYMENT_EVENT_MAX_ATTEMPTS:
+                event.status = PaymentEventStatus.FAILED
+            else:
+                event.next_attempt_at = now + timedelta(seconds=retry_delay(event.attempts))
+
+    db.commit()
+    return len(events)
+
+
+class PaymentEventWorker(BackgroundWorker):
+    """Worker pool that drains the payment event inbox in batches."""
+
+    name = "payment-events"
+
+    def __init__(self, batch_size: int = 100, **kwargs):
+        super().__init__(**kwargs)
+        self.batch_size = batch_size
+
+    def run_batch(self) -> int:
+        # Each shard has its own inbox, next to the orders its events settle
+        processed = 0
+        for shard in shard_map.all():
+            db = shard.sessionmaker()
+            try:
+                processed += process_pending_events(db, self.batch_size)
+            except Exception as e:
+                db.rollback()
+                print(f"{self.name} batch failed on shard {shard.name}: {str(e)}")
+            finally:
+                db.close()
+        return processed
+
+    def queue_depth(self) -> int:
+        depth = 0
+        for shard in shard_map.all():
+            db = shard.sessionmaker()
+            try:
+                depth += db.query(func.count(PaymentEvent.id)).filter(
+                    PaymentEvent.status == PaymentEventStatus.PENDING
+                ).scalar()
+            finally:
+                db.close()
+        return depth
+
+
+payment_event_worker = PaymentEventWorker(
+    batch_size=settings.PAYMENT_EVENT_BATCH_SIZE,
+    concurrency=settings.PAYMENT_EVENT_WORKERS,
+    poll_interval=settings.PAYMENT_EVENT_POLL_SECONDS,
+)
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from typing import Optional
+from sqlalchemy import text
+from app.db.database import engine, pool_usage, POOL_SIZE, MAX_OVERFLOW
+from app.db.replicas import replica_set
+from app.services.background import BackgroundWorker
+from app.services.payment_events import payment_event_worker
+from app.services.email_outbox import email_outbox_sender
+from app.core.lifecycle import lifecycle
+from app.core.metrics import Gauge
+from app.core.config import settings
+
+
+class LoopLagMonitor(BackgroundWorker):
+    """Measures how late the event loop wakes up from a timed sleep.
+
+    A loop blocked by CPU-bound or synchronous work wakes up late, so the lag
+    is a direct measure of how long every other request on this worker waits.
+    """
+
+    name = "loop-lag"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lag = 0.0
+        self._expected: Optional[float] = None
+
+    async def process(self) -> int:
+        now = asyncio.get_running_loop().time()
+        if self._expected is not None:
+            self.lag = max(now - self._expected, 0.0)
+        self._expected = now + self.poll_interval
+        return 0  # Sleep for poll_interval until the next measurement
+
+
+class ReadinessProbe:
+    """Decides whether this worker should receive traffic.
+
+    The database check (``SELECT 1`` plus the background queue depths) runs at
+    most once per ``probe_interval`` and is shared by concurrent ``/ready``
+    calls, so a load balancer polling every worker adds no real load.
+    """
+
+    def __init__(self, probe_interval: float = 2.0, probe_timeout: float = 2.0):
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self._db_result = {"ok": False, "error": "not probed yet"}
+        self._checked_at = 0.0
+        self._probing = False
+        self._lock = asyncio.Lock()
+
+    def _probe_db(self) -> dict:
+        start = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            result = {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+            result["queues"] = {
+                "payment_events": payment_event_worker.queue_depth(),
+                "email_outbox": email_outbox_sender.queue_depth(),
+            }
+            return result
+        except Exception as e:
+            return {"ok": False, "error": str(e)[:200]}
+        finally:
+            self._probing = False
+
+    async def db_status(self) -> dict:
+        async with self._lock:
+            if time.monotonic() - self._checked_at < self.probe_interval:
+                return self._db_result
+            # A probe stuck waiting on an exhausted pool is still running in its
+            # thread; don't pile up more of them, keep reporting the timeout.
+            if not self._probing:
+                self._probing = True
+                try:
+                    self._db_result = await asyncio.wait_for(
+                        asyncio.to_thread(self._probe_db), timeout=self.probe_timeout
+                    )
+                except asyncio.TimeoutError:
+                    self._db_result = {"ok": False, "error": f"probe timed out after {self.probe_timeout}s"}
+            self._checked_at = time.monotonic()
+            return self._db_result
+
+    @staticmethod
+    def pool_status() -> dict:
+        capacity = POOL_SIZE + MAX_OVERFLOW
+        checked_out, _ = pool_usage(engine.pool)
+        return {
+            "checked_out": checked_out,
+            "capacity": capacity,
+            "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+        }
+
+    async def check(self) -> dict:
+        """Run all checks; ``ready`` is False if any configured threshold is exceeded."""
+        if lifecycle.draining:
+            # Tell the load balancer to stop routing here; no need to probe anything
+            return {"status": "not_ready", "reasons": ["shutting down"], "checks": {}}
+
+        db = await self.db_status()
+        pool = self.pool_status()
+        lag = loop_lag_monitor.lag
+
+        reasons = []
+        if not db["ok"]:
+            reasons.append("database unreachable")
+        if pool["saturation"] >= settings.READY_MAX_POOL_SATURATION:
+            reasons.append("connection pool saturated")
+        if lag > settings.READY_MAX_LOOP_LAG_SECONDS:
+            reasons.append("event loop lagging")
+
+        queues = db.get("queues", {})
+        limits = {
+            "payment_events": settings.READY_MAX_PAYMENT_EVENT_BACKLOG,
+            "email_outbox": settings.READY_MAX_EMAIL_BACKLOG,
+        }
+        for queue, limit in limits.items():
+            if limit is not None and queues.get(queue, 0) > limit:
+                reasons.append(f"{queue} backlog above {limit}")
+
+        return {
+            "status": "not_ready" if reasons else "ready",
+            "reasons": reasons,
+            "checks": {
+                "database": db,
+                "pool": pool,
+                "event_loop_lag_ms": round(lag * 1000, 2),
+                # Informational: reads fall back to the primary without a healthy replica
+                "replicas": replica_set.status(),
+            },
+        }
+
+
+loop_lag_monitor = LoopLagMonitor(poll_interval=settings.READY_LOOP_LAG_INTERVAL_SECONDS)
+
+readiness_probe = ReadinessProbe(
+    probe_interval=settings.READY_DB_PROBE_INTERVAL_SECONDS,
+    probe_timeout=settings.READY_DB_PROBE_TIMEOUT_SECONDS,
+)
+
+Gauge(
+    "nextbite_event_loop_lag_seconds",
+    "How late the event loop woke up from its last timed sleep",
+    function=lambda: loop_lag_monitor.lag,
+)
@@ -0,0 +1,27 @@
+from app.db.replicas import replica_set
+from app.services.background import BackgroundWorker
+from app.core.config import settings
+
+
+class ReplicaHealthChecker(BackgroundWorker):
+    """Periodically checks each read replica's connectivity and replication lag.
+
+    Replicas receive no reads until their first check passes, and stop
+    receiving them as soon as a check fails or lags behind
+    REPLICA_MAX_LAG_SECONDS.
+    """
+
+    name = "replica-health"
+
+    def run_batch(self) -> int:
+        replica_set.check_health()
+        return 0  # Always sleep until the next check
+
+    async def close(self):
+        replica_set.dispose()
+
+
+replica_health_checker = ReplicaHealthChecker(
+    concurrency=1 if replica_set.enabled else 0,
+    poll_interval=settings.REPLICA_HEALTH_CHECK_SECONDS,
+)
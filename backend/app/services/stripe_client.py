@@ -0,0 +1,28 @@
+"""
+Lazily loaded Stripe SDK.
+
+Importing ``stripe`` pulls in every API resource module and is the slowest
+import in the app, so it is deferred until the first payment call instead of
+happening while a worker boots.
+"""
+from app.core.config import settings
+
+_stripe = None
+
+
+def stripe_configured() -> bool:
+    """Whether a real (non-placeholder) Stripe secret key is set."""
+    key = settings.STRIPE_SECRET_KEY
+    return bool(key) and not key.startswith("sk_test_placeholder") and "your_stripe_secret_key" not in key
+
+
+def get_stripe():
+    """Return the ``stripe`` module, importing and configuring it on first use."""
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        if settings.STRIPE_API_BASE:
+            stripe.api_base = settings.STRIPE_API_BASE
+        _stripe = stripe
+    return _stripe
@@ -0,0 +1,68 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Optional
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+
+class TemplateRegistry:
+    """Compiles Jinja2 templates once and renders them by name.
+
+    ``load()`` compiles every template up front (at startup) and keeps the compiled
+    objects, so rendering never touches the filesystem or the Jinja2 compiler.
+    With a bytecode cache directory, compiled code is also reused across processes.
+    Jinja2 itself is only imported when the environment is first needed.
+    """
+
+    def __init__(self, template_dir: Path, bytecode_cache_dir: Optional[str] = None):
+        self.template_dir = template_dir
+        self.bytecode_cache_dir = bytecode_cache_dir
+        self._env: Optional["Environment"] = None
+        self._templates: Dict[str, "Template"] = {}
+
+    @property
+    def env(self) -> "Environment":
+        if self._env is None:
+            from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, StrictUndefined, select_autoescape
+
+            bytecode_cache = None
+            if self.bytecode_cache_dir:
+                Path(self.bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(self.bytecode_cache_dir)
+
+            self._env = Environment(
+                loader=FileSystemLoader(str(self.template_dir)),
+                autoescape=select_autoescape(["html"]),
+                undefined=StrictUndefined,
+                bytecode_cache=bytecode_cache,
+                auto_reload=False,  # Templates ship with the code; skip mtime checks
+            )
+        return self._env
+
+    def load(self, prefix: str = "email/"):
+        """Compile all templates under ``prefix``."""
+        for name in self.env.list_templates(filter_func=lambda n: n.startswith(prefix)):
+            self._templates[name] = self.env.get_template(name)
+
+    def get(self, name: str) -> "Template":
+        """Return a compiled template, compiling it on first use if not preloaded."""
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates[name] = self.env.get_template(name)
+        return template
+
+    def render(self, template_name: str, **context) -> str:
+        """Render a single template."""
+        return self.get(template_name).render(context)
+
+    def render_many(self, template_name: str, contexts: Iterable[dict]) -> Iterator[str]:
+        """Render one template for many contexts, e.g. for bulk sends."""
+        template = self.get(template_name)
+        for context in contexts:
+            yield template.render(context)
+
+
+email_templates = TemplateRegistry(TEMPLATE_DIR, bytecode_cache_dir=settings.EMAIL_TEMPLATE_CACHE_DIR)
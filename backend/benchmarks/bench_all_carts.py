@@ -0,0 +1,97 @@
+"""
+Before/after benchmark for serializing the GET /orders/all-carts response.
+
+"before" is FastAPI's default path for a route with ``response_model`` that
+returns a list of models: re-validate against the response field, run
+jsonable_encoder, then render with the stdlib ``json`` module.
+"after" is the route returning ``FastJSONResponse`` directly: the models built
+by the route are serialized once with orjson.
+
+Usage:
+    python benchmarks/bench_all_carts.py [--carts 500] [--items 5] [--rounds 20]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.core.responses import FastJSONResponse
+from app.models.order import OrderStatus
+from app.schemas.order import OrderResponse, OrderItemResponse
+
+
+def make_carts(carts: int, items: int) -> List[OrderResponse]:
+    now = datetime.now(timezone.utc)
+    return [
+        OrderResponse(
+            id=order_id,
+            user_id=order_id % 97,
+            restaurant_id=order_id % 13,
+            status=OrderStatus.CART,
+            total_amount=12.5 * items,
+            created_at=now,
+            updated_at=now,
+            order_items=[
+                OrderItemResponse(
+                    id=order_id * 100 + i,
+                    menu_item_id=i,
+                    quantity=1 + i % 3,
+                    price_at_time=12.5,
+                    menu_item_name=f"Menu item {i}",
+                )
+                for i in range(items)
+            ],
+        )
+        for order_id in range(carts)
+    ]
+
+
+def before(field, content) -> bytes:
+    encoded = asyncio.run(serialize_response(field=field, response_content=content))
+    return JSONResponse(encoded).body
+
+
+def after(content) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def measure(fn, rounds: int) -> List[float]:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark all-carts response serialization")
+    parser.add_argument("--carts", type=int, default=500)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    content = make_carts(args.carts, args.items)
+    field = create_response_field(name="Response_get_all_carts", type_=List[OrderResponse], mode="serialization")
+
+    before_timings = measure(lambda: before(field, content), args.rounds)
+    after_timings = measure(lambda: after(content), args.rounds)
+
+    print(f"{args.carts} carts x {args.items} items, {args.rounds} rounds (median)")
+    before_median = statistics.median(before_timings)
+    after_median = statistics.median(after_timings)
+    print(f"before (validate + jsonable_encoder + json): {before_median * 1000:8.2f} ms")
+    print(f"after  (FastJSONResponse / orjson):          {after_median * 1000:8.2f} ms")
+    print(f"speedup: {before_median / after_median:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
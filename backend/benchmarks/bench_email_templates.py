@@ -0,0 +1,79 @@
+"""
+Microbenchmark: email rendering with the precompiled template registry versus
+compiling the template on every message (the previous behaviour of
+``send_new_user_credentials_email``, which built a ``jinja2.Template`` per call).
+
+Usage:
+    python benchmarks/bench_email_templates.py [--messages 10000]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from app.services.templates import TemplateRegistry, TEMPLATE_DIR
+
+TEMPLATE = "email/credentials.html"
+
+
+def make_contexts(count: int) -> list:
+    return [
+        {"email": f"user{i}@nextbite.com", "password": f"Secret-{i:06d}!", "role": "Team Member"}
+        for i in range(count)
+    ]
+
+
+def compile_per_message(contexts: list) -> int:
+    """Previous path: the template source is compiled for every message."""
+    env = Environment(
+        loader=FileSystemLoader(str(TEMPLATE_DIR)),
+        autoescape=select_autoescape(["html"]),
+        cache_size=0,  # No template cache, so every get_template recompiles
+    )
+    size = 0
+    for context in contexts:
+        size += len(env.get_template(TEMPLATE).render(context))
+    return size
+
+
+def registry_render(contexts: list) -> int:
+    registry = TemplateRegistry(TEMPLATE_DIR)
+    registry.load()
+    size = 0
+    for context in contexts:
+        size += len(registry.render(TEMPLATE, **context))
+    return size
+
+
+def registry_render_many(contexts: list) -> int:
+    registry = TemplateRegistry(TEMPLATE_DIR)
+    registry.load()
+    return sum(len(html) for html in registry.render_many(TEMPLATE, contexts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email template rendering")
+    parser.add_argument("--messages", type=int, default=10000)
+    args = parser.parse_args()
+
+    contexts = make_contexts(args.messages)
+    results = {}
+    for name, fn in [
+        ("compile per message", compile_per_message),
+        ("registry render", registry_render),
+        ("registry render_many", registry_render_many),
+    ]:
+        start = time.perf_counter()
+        fn(contexts)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed
+        print(f"{name:<22} {elapsed:8.3f}s  {args.messages / elapsed:10.0f} msg/s")
+
+    baseline = results["compile per message"]
+    print(f"\nspeedup (render_many vs compile per message): {baseline / results['registry render_many']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
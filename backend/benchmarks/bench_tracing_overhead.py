@@ -0,0 +1,56 @@
+"""
+Microbenchmark: cost of a traced boundary (``with tracer.span(...)``) when the
+request is not sampled, compared with no instrumentation at all and with a
+sampled request whose spans are exported to /dev/null.
+
+Usage:
+    python benchmarks/bench_tracing_overhead.py [--calls 1000000]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from app.core.tracing import BatchSpanExporter, Tracer
+
+
+def bare(tracer: Tracer, calls: int):
+    for _ in range(calls):
+        pass
+
+
+def unsampled(tracer: Tracer, calls: int):
+    for _ in range(calls):
+        with tracer.span("db.query"):
+            pass
+
+
+def sampled(tracer: Tracer, calls: int):
+    with tracer.start_trace("bench", traceparent="00-" + "1" * 32 + "-" + "2" * 16 + "-01"):
+        for _ in range(calls):
+            with tracer.span("db.query"):
+                pass
+    tracer.exporter.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tracing overhead per span")
+    parser.add_argument("--calls", type=int, default=1000000)
+    args = parser.parse_args()
+
+    tracer = Tracer(BatchSpanExporter(file_path=os.devnull, max_queue_size=args.calls + 1), sample_rate=0.0)
+    results = {}
+    for name, fn in [("no instrumentation", bare), ("unsampled span", unsampled), ("sampled span", sampled)]:
+        start = time.perf_counter()
+        fn(tracer, args.calls)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed
+        print(f"{name:<20} {elapsed:8.3f}s  {elapsed / args.calls * 1e9:8.0f} ns/call")
+
+    overhead = (results["unsampled span"] - results["no instrumentation"]) / args.calls * 1e9
+    print(f"\nunsampled overhead: {overhead:.0f} ns per span")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+Load test driving realistic user journeys against a running app.
+
+Each virtual user logs in as one of the accounts seeded by scripts/init_db.py
+(extra customer accounts are registered when there are more users than seeded
+customers, since each user has a single cart) and repeats a journey: list restaurants, open a menu, create a cart, add
+items, check out with Cash (or a card when --card-share > 0, which needs
+scripts/fake_stripe.py behind STRIPE_API_BASE) and view their orders. A share
+of the virtual users are admins who look at all carts instead.
+
+Latency is recorded per endpoint (method + route template) and written to a
+JSON report with throughput and p50/p95/p99, so runs can be diffed between
+commits with --compare.
+
+Usage:
+    python scripts/init_db.py
+    python -m app.serve --workers 4
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --users 50 \\
+        --duration 60 --output loadtest.json [--compare previous.json]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+
+# Accounts created by scripts/init_db.py
+ADMIN_ACCOUNTS = [
+    ("admin@nextbite.com", "Admin@123"),
+    ("nick.fury@nextbite.com", "Fury@123"),
+]
+CUSTOMER_ACCOUNTS = [
+    ("captain.marvel@nextbite.com", "Marvel@123"),
+    ("captain.america@nextbite.com", "America@123"),
+    ("thanos@nextbite.com", "Thanos@123"),
+    ("thor@nextbite.com", "Thor@123"),
+    ("travis@nextbite.com", "Travis@123"),
+]
+# Extra customers registered when there are more customer users than seeded accounts
+LOADTEST_PASSWORD = "LoadTest@123"
+LOADTEST_COUNTRIES = ["India", "USA"]
+
+
+class JourneyAborted(Exception):
+    """A step failed, so the rest of the journey cannot run."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Collects latencies and status codes per endpoint once the warmup is over."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {}
+        self.journeys = Counter()
+        self.recording = False
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+
+    def start(self):
+        self.recording = True
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.stopped_at = time.perf_counter()
+
+    def record(self, endpoint: str, seconds: float, status: str):
+        if not self.recording:
+            return
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        self.statuses.setdefault(endpoint, Counter())[status] += 1
+
+    def journey(self, name: str, ok: bool):
+        if self.recording:
+            self.journeys[f"{name}.{'ok' if ok else 'failed'}"] += 1
+
+    def report(self) -> dict:
+        elapsed = max(self.stopped_at - self.started_at, 1e-9)
+        endpoints = {}
+        total_requests = total_errors = 0
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            statuses = self.statuses[endpoint]
+            errors = sum(n for code, n in statuses.items() if not code.startswith(("2", "3")))
+            total_requests += len(values)
+            total_errors += errors
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": errors,
+                "statuses": dict(sorted(statuses.items())),
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "latency_ms": {
+                    "mean": round(sum(values) / len(values) * 1000, 2),
+                    "p50": round(percentile(values, 50) * 1000, 2),
+                    "p95": round(percentile(values, 95) * 1000, 2),
+                    "p99": round(percentile(values, 99) * 1000, 2),
+                    "max": round(values[-1] * 1000, 2),
+                },
+            }
+        return {
+            "duration_seconds": round(elapsed, 2),
+            "requests": total_requests,
+            "errors": total_errors,
+            "throughput_rps": round(total_requests / elapsed, 2),
+            "journeys": dict(sorted(self.journeys.items())),
+            "endpoints": endpoints,
+        }
+
+
+class VirtualUser:
+    """One logged-in client repeating a journey until the test ends."""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random,
+                 account, args):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.email, self.password = account
+        self.args = args
+        self.headers: Dict[str, str] = {}
+        self.user_id: Optional[int] = None
+
+    async def request(self, method: str, endpoint: str, url: str, expected=(200,), **kwargs):
+        """Send a request, record it under ``endpoint`` and return the parsed JSON body."""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(endpoint, time.perf_counter() - start, type(e).__name__)
+            raise JourneyAborted(f"{endpoint}: {type(e).__name__}")
+        self.recorder.record(endpoint, time.perf_counter() - start, str(response.status_code))
+        if response.status_code not in expected:
+            raise JourneyAborted(f"{endpoint}: HTTP {response.status_code}", response.status_code)
+        return response.json() if response.content else None
+
+    async def login(self):
+        self.headers = {}
+        body = await self.request(
+            "POST", "POST /auth/login", "/auth/login",
+            json={"email": self.email, "password": self.password},
+        )
+        self.headers = {"Authorization": f"Bearer {body['access_token']}"}
+        self.user_id = body["user"]["id"]
+
+    async def think(self):
+        if self.args.think_time > 0:
+            await asyncio.sleep(self.rng.expovariate(1 / self.args.think_time))
+
+    async def customer_journey(self):
+        restaurants = await self.request("GET", "GET /restaurants/", "/restaurants/")
+        if not restaurants:
+            raise JourneyAborted("no restaurants visible; run scripts/init_db.py")
+        restaurant = self.rng.choice(restaurants)
+        await self.think()
+
+        menu = await self.request(
+            "GET", "GET /restaurants/{restaurant_id}/menu", f"/restaurants/{restaurant['id']}/menu"
+        )
+        menu = [item for item in menu if item.get("is_available", True)]
+        if not menu:
+            raise JourneyAborted(f"restaurant {restaurant['id']} has no menu")
+        await self.think()
+
+        order = await self.request(
+            "POST", "POST /orders/", "/orders/", expected=(201,),
+            json={"restaurant_id": restaurant["id"]},
+        )
+        for _ in range(self.rng.randint(1, self.args.max_items)):
+            await self.request(
+                "POST", "POST /orders/{order_id}/items", f"/orders/{order['id']}/items", expected=(201,),
+                json={"menu_item_id": self.rng.choice(menu)["id"], "quantity": self.rng.randint(1, 3)},
+            )
+            await self.think()
+
+        payment_methods = await self.request("GET", "GET /payment-methods/", "/payment-methods/")
+        use_card = self.rng.random() < self.args.card_share
+        candidates = [pm for pm in payment_methods if (pm["brand"] != "Cash") == use_card]
+        if not candidates:
+            raise JourneyAborted(f"{self.email} has no {'card' if use_card else 'Cash'} payment method")
+        await self.request(
+            "POST", "POST /orders/{order_id}/checkout", f"/orders/{order['id']}/checkout",
+            json={"payment_method_id": self.rng.choice(candidates)["id"]},
+        )
+        await self.think()
+
+        await self.request("GET", "GET /orders/", "/orders/")
+
+    async def admin_journey(self):
+        await self.request("GET", "GET /orders/all-carts", "/orders/all-carts")
+        await self.think()
+        await self.request("GET", "GET /restaurants/", "/restaurants/")
+
+    async def run(self, deadline: float, is_admin: bool):
+        name = "admin" if is_admin else "customer"
+        journeys_since_login = None
+        while time.perf_counter() < deadline:
+            try:
+                if journeys_since_login is None or journeys_since_login >= self.args.journeys_per_login:
+                    await self.login()
+                    journeys_since_login = 0
+                if is_admin:
+                    await self.admin_journey()
+                else:
+                    await self.customer_journey()
+                journeys_since_login += 1
+                self.recorder.journey(name, True)
+            except JourneyAborted as e:
+                self.recorder.journey(name, False)
+                if self.args.verbose:
+                    print(f"  {self.email}: {e}")
+                # Back off briefly so a failing endpoint isn't hammered in a tight loop
+                await asyncio.sleep(0.1 + self.rng.random() * 0.4)
+                if e.status == 401 or not self.headers:
+                    journeys_since_login = None
+
+
+async def prepare_customers(client: httpx.AsyncClient, args, count: int) -> List[tuple]:
+    """Accounts for ``count`` customer users, each with a Cash (and if needed a card) payment method.
+
+    Every user has a single cart, so virtual users sharing an account would
+    check out each other's carts. The seeded accounts are used first and extra
+    ``loadtest<n>@nextbite.com`` team members are registered for the rest.
+    """
+    admin_email, admin_password = ADMIN_ACCOUNTS[0]
+    response = await client.post("/auth/login", json={"email": admin_email, "password": admin_password})
+    response.raise_for_status()
+    admin_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    accounts = list(CUSTOMER_ACCOUNTS[:count])
+    for n in range(count - len(accounts)):
+        accounts.append((f"loadtest{n}@nextbite.com", LOADTEST_PASSWORD))
+
+    for email, password in accounts:
+        response = await client.post("/auth/login", json={"email": email, "password": password})
+        if response.status_code == 401 and email.startswith("loadtest"):
+            n = int(email[len("loadtest"):].split("@")[0])
+            response = await client.post("/auth/register", json={
+                "email": email, "password": password, "full_name": f"Load Test {n}",
+                "country": LOADTEST_COUNTRIES[n % len(LOADTEST_COUNTRIES)],
+            })
+            print(f"  Registered {email}")
+        response.raise_for_status()
+        user_id = response.json()["user"]["id"]
+
+        response = await client.get("/payment-methods/", params={"user_id": user_id}, headers=admin_headers)
+        response.raise_for_status()
+        brands = {pm["brand"] for pm in response.json()}
+        wanted = [("Cash", "0000", f"loadtest_cash_{user_id}")]
+        if args.card_share > 0:
+            wanted.append(("visa", "4242", f"pm_card_visa_loadtest_{user_id}"))
+        for brand, last4, stripe_id in wanted:
+            if brand in brands:
+                continue
+            response = await client.post("/payment-methods/", headers=admin_headers, json={
+                "user_id": user_id, "brand": brand, "last4": last4, "stripe_payment_method_id": stripe_id,
+            })
+            response.raise_for_status()
+            print(f"  Added {brand} payment method for {email}")
+    return accounts
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: dict, current: dict):
+    """Print p50/p95/p99 and throughput changes per endpoint against an earlier report."""
+    print(f"\nCompared with {previous.get('commit') or 'previous run'} ({previous.get('started_at')}):")
+    print(f"{'endpoint':<38} {'rps':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+
+    def change(old: float, new: float) -> str:
+        if not old:
+            return f"{new:>8.1f}         "
+        return f"{new:>8.1f} ({(new - old) / old * 100:+5.0f}%)"
+
+    old_endpoints = previous["results"]["endpoints"]
+    for endpoint, stats in current["results"]["endpoints"].items():
+        old = old_endpoints.get(endpoint)
+        if old is None:
+            print(f"{endpoint:<38} (new)")
+            continue
+        print(f"{endpoint:<38} {change(old['throughput_rps'], stats['throughput_rps'])}"
+              + "".join(f" {change(old['latency_ms'][p], stats['latency_ms'][p])}" for p in ("p50", "p95", "p99")))
+
+
+def print_report(report: dict):
+    results = report["results"]
+    print(f"\n{results['requests']} requests in {results['duration_seconds']}s "
+          f"({results['throughput_rps']} req/s), {results['errors']} errors")
+    print(f"Journeys: {results['journeys']}")
+    print(f"{'endpoint':<38} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in results["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{endpoint:<38} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>8} "
+              f"{latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9}")
+
+
+async def run(args) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        admins = round(args.users * args.admin_share)
+        print("Preparing accounts...")
+        customers = await prepare_customers(client, args, args.users - admins)
+
+        rng = random.Random(args.seed)
+        started_at = datetime.now(timezone.utc).isoformat()
+        start = time.perf_counter()
+        deadline = start + args.warmup + args.duration
+
+        tasks = []
+        for i in range(args.users):
+            is_admin = i < admins
+            account = ADMIN_ACCOUNTS[i % len(ADMIN_ACCOUNTS)] if is_admin else customers[i - admins]
+            user = VirtualUser(client, recorder, random.Random(rng.random()), account, args)
+            tasks.append(asyncio.create_task(user.run(deadline, is_admin)))
+            # Spread logins over the ramp-up instead of starting every user at once
+            if args.ramp_up > 0:
+                await asyncio.sleep(args.ramp_up / args.users)
+
+        print(f"Running {args.users} users ({admins} admins) for {args.warmup}s warmup + {args.duration}s...")
+        await asyncio.sleep(max(0.0, start + args.warmup - time.perf_counter()))
+        recorder.start()
+        await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+        recorder.stop()
+        await asyncio.gather(*tasks)
+
+    return {
+        "commit": git_commit(),
+        "started_at": started_at,
+        "config": {
+            "base_url": args.base_url,
+            "users": args.users,
+            "admin_share": args.admin_share,
+            "card_share": args.card_share,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "think_time": args.think_time,
+            "max_items": args.max_items,
+            "journeys_per_login": args.journeys_per_login,
+            "seed": args.seed,
+        },
+        "results": recorder.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=10, help="Seconds before measuring starts")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which users start")
+    parser.add_argument("--admin-share", type=float, default=0.1, help="Share of users viewing all carts")
+    parser.add_argument("--card-share", type=float, default=0.0,
+                        help="Share of checkouts paid by card (needs the fake Stripe server)")
+    parser.add_argument("--max-items", type=int, default=4, help="Max items added per cart")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between steps, seconds")
+    parser.add_argument("--journeys-per-login", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout, seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="loadtest.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", help="Earlier report to diff this run against")
+    parser.add_argument("--verbose", action="store_true", help="Print why journeys failed")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
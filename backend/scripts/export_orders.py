@@ -0,0 +1,99 @@
+"""
+Export completed orders to compressed Arrow files, and aggregate the export.
+
+    export     Stream completed orders and their items, month by month, from
+               DATABASE_URL and every shard into ORDER_EXPORT_DIR (see
+               app/jobs/order_export.py for the layout). Months are created_at
+               months in UTC; the default is last month, so it can run monthly
+               from cron, e.g.:
+
+                   30 1 1 * * cd /srv/nextbite/backend && python scripts/export_orders.py export
+
+    summary    Orders, revenue and average order per month and country (or
+               --by), read from the memory-mapped export only.
+    top-items  Most ordered menu items, overall or per --by group.
+
+Usage:
+    python scripts/export_orders.py export [--from 2023-01] [--to 2024-12] [--compression lz4]
+    python scripts/export_orders.py summary [--by month,country] [--from 2024-01] [--country India]
+    python scripts/export_orders.py top-items [--by country] [--limit 10]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from datetime import date, datetime, timezone
+from app.core.config import settings
+from app.jobs.order_export import export_months, month_key, summarize_orders, top_menu_items
+
+
+def parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def months_between(first: date, last: date):
+    month = first
+    while month <= last:
+        yield month
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def last_month() -> date:
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    return date(this_month.year - (this_month.month == 1), (this_month.month - 2) % 12 + 1, 1)
+
+
+def print_table(rows, columns):
+    if not rows:
+        print("(no exported orders match)")
+        return
+    cells = [[f"{row[c]:,.2f}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "summary", "top-items"])
+    parser.add_argument("--from", dest="first", type=parse_month, help="First month, YYYY-MM")
+    parser.add_argument("--to", dest="last", type=parse_month, help="Last month, YYYY-MM")
+    parser.add_argument("--directory", default=settings.ORDER_EXPORT_DIR, help="Export directory")
+    parser.add_argument("--compression", choices=["zstd", "lz4"], default="zstd",
+                        help="export: zstd is smaller, lz4 is faster to read")
+    parser.add_argument("--by", default=None,
+                        help="summary/top-items: comma-separated month, country, restaurant_id, restaurant_name")
+    parser.add_argument("--country", action="append", help="summary/top-items: only this country (repeatable)")
+    parser.add_argument("--limit", type=int, default=10, help="top-items: items per group")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        # Just --from runs up to last month; just --to exports that one month
+        last = args.last or (last_month() if args.first else None)
+        first = args.first or last or last_month()
+        months = list(months_between(first, last or first))
+        started = time.perf_counter()
+        for shard, month, written in export_months(months, args.directory, args.compression):
+            orders = sum(written["orders"].values())
+            items = sum(written["order_items"].values())
+            print(f"  {shard} {month_key(month)}: {orders} orders, {items} items")
+        print(f"✓ Exported {len(months)} month(s) to {args.directory} in {time.perf_counter() - started:.1f}s")
+        return
+
+    started = time.perf_counter()
+    if args.command == "summary":
+        group_by = args.by.split(",") if args.by else ["month", "country"]
+        rows = summarize_orders(args.directory, group_by, args.first, args.last, args.country)
+        print_table(rows, [*group_by, "order_count", "revenue", "average_order"])
+    else:
+        group_by = args.by.split(",") if args.by else []
+        rows = top_menu_items(args.directory, args.limit, group_by, args.first, args.last, args.country)
+        print_table(rows, [*group_by, "menu_item_name", "quantity", "revenue"])
+    print(f"({time.perf_counter() - started:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Local stand-in for the Stripe API used by the backend.
+
+Serves the PaymentIntent and SetupIntent endpoints the app calls so that
+checkout and setup-intent flows can be load-tested offline. Latency, error
+rates and decline codes are configurable and driven by a seeded RNG so runs
+are reproducible.
+
+Point the app at it with:
+    STRIPE_API_BASE=http://127.0.0.1:12111
+
+Usage:
+    python scripts/fake_stripe.py --port 12111 --latency lognormal:3.5,0.4 \\
+        --error-rate 0.01 --decline-rate 0.05 \\
+        --decline-codes insufficient_funds:3,card_declined:1,expired_card:1
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import random
+import secrets
+import time
+from urllib.parse import parse_qsl
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+DECLINE_MESSAGES = {
+    "card_declined": "Your card was declined.",
+    "generic_decline": "Your card was declined.",
+    "insufficient_funds": "Your card has insufficient funds.",
+    "lost_card": "Your card was declined.",
+    "stolen_card": "Your card was declined.",
+    "expired_card": "Your card has expired.",
+    "incorrect_cvc": "Your card's security code is incorrect.",
+    "processing_error": "An error occurred while processing your card. Try again in a little bit.",
+}
+
+# Decline reasons Stripe reports under their own error code rather than card_declined
+ERROR_CODES = {"expired_card", "incorrect_cvc", "processing_error"}
+
+
+class LatencyDistribution:
+    """Latency distribution parsed from a spec like ``lognormal:3.5,0.4``.
+
+    Values are in milliseconds. Supported kinds:
+    - ``fixed:MS``
+    - ``uniform:LOW,HIGH``
+    - ``normal:MEAN,STDDEV``
+    - ``lognormal:MU,SIGMA`` (parameters of the underlying normal, in log-ms)
+    - ``exponential:MEAN``
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}', expected one of {self.KINDS}")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        """Return a latency in seconds."""
+        p = self.params
+        if self.kind == "fixed":
+            ms = p[0] if p else 0.0
+        elif self.kind == "uniform":
+            ms = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            ms = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            ms = rng.lognormvariate(p[0], p[1])
+        else:
+            ms = rng.expovariate(1.0 / p[0])
+        return max(ms, 0.0) / 1000.0
+
+
+def parse_weighted_codes(spec: str) -> list:
+    """Parse ``code:weight,code:weight`` into a list of (code, weight) tuples."""
+    codes = []
+    for part in spec.split(","):
+        if not part:
+            continue
+        code, _, weight = part.partition(":")
+        codes.append((code, float(weight or 1)))
+    return codes
+
+
+def parse_form(body: bytes) -> dict:
+    """Decode Stripe's form encoding (``a[b]=c``) into a flat dict."""
+    return dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+
+
+def create_app(
+    latency: LatencyDistribution,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    decline_rate: float = 0.0,
+    decline_codes: list = None,
+    requires_action_rate: float = 0.0,
+    seed: int = 0,
+) -> FastAPI:
+    """Build the fake Stripe ASGI app with the given failure profile."""
+    app = FastAPI(title="Fake Stripe", docs_url=None, redoc_url=None)
+    rng = random.Random(seed)
+    decline_codes = decline_codes or [("card_declined", 1.0)]
+    payment_intents = {}
+    setup_intents = {}
+    stats = {"requests": 0, "api_errors": 0, "rate_limited": 0, "declines": 0}
+
+    def new_id(prefix: str) -> str:
+        return f"{prefix}_{secrets.token_hex(12)}"
+
+    def error_response(status_code: int, error: dict) -> JSONResponse:
+        return JSONResponse(status_code=status_code, content={"error": error})
+
+    async def simulate() -> JSONResponse:
+        """Apply latency and injected infrastructure failures."""
+        stats["requests"] += 1
+        await asyncio.sleep(latency.sample(rng))
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return error_response(429, {
+                "type": "invalid_request_error",
+                "code": "rate_limit",
+                "message": "Too many requests hit the API too quickly.",
+            })
+        if roll < rate_limit_rate + error_rate:
+            stats["api_errors"] += 1
+            return error_response(500, {
+                "type": "api_error",
+                "message": "An unknown error occurred (injected by fake Stripe).",
+            })
+        return None
+
+    @app.post("/v1/payment_intents")
+    async def create_payment_intent(request: Request):
+        failure = await simulate()
+        if failure is not None:
+            return failure
+
+        params = parse_form(await request.body())
+        if "amount" not in params or "currency" not in params:
+            return error_response(400, {
+                "type": "invalid_request_error",
+                "message": "Missing required param: amount or currency.",
+                "param": "amount" if "amount" not in params else "currency",
+            })
+
+        intent_id = new_id("pi")
+        intent = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": int(params["amount"]),
+            "amount_received": 0,
+            "currency": params["currency"],
+            "client_secret": f"{intent_id}_secret_{secrets.token_hex(8)}",
+            "created": int(time.time()),
+            "livemode": False,
+            "payment_method": params.get("payment_method"),
+            "metadata": {
+                key[len("metadata["):-1]: value
+                for key, value in params.items() if key.startswith("metadata[")
+            },
+            "status": "requires_confirmation",
+        }
+
+        if params.get("confirm", "").lower() == "true":
+            if rng.random() < decline_rate:
+                stats["declines"] += 1
+                code = rng.choices(
+                    [c for c, _ in decline_codes],
+                    weights=[w for _, w in decline_codes],
+                )[0]
+                intent["status"] = "requires_payment_method"
+                payment_intents[intent_id] = intent
+                return error_response(402, {
+                    "type": "card_error",
+                    "code": code if code in ERROR_CODES else "card_declined",
+                    "decline_code": code,
+                    "message": DECLINE_MESSAGES.get(code, "Your card was declined."),
+                    "param": "payment_method",
+                    "payment_intent": intent,
+                })
+            if rng.random() < requires_action_rate:
+                intent["status"] = "requires_action"
+                intent["next_action"] = {"type": "use_stripe_sdk"}
+            else:
+                intent["status"] = "succeeded"
+                intent["amount_received"] = intent["amount"]
+
+        payment_intents[intent_id] = intent
+        return intent
+
+    @app.get("/v1/payment_intents/{intent_id}")
+    async def retrieve_payment_intent(intent_id: str):
+        failure = await simulate()
+        if failure is not None:
+            return failure
+        if intent_id not in payment_intents:
+            return error_response(404, {
+                "type": "invalid_request_error",
+                "code": "resource_missing",
+                "message": f"No such payment_intent: '{intent_id}'",
+                "param": "intent",
+            })
+        return payment_intents[intent_id]
+
+    @app.post("/v1/setup_intents")
+    async def create_setup_intent(request: Request):
+        failure = await simulate()
+        if failure is not None:
+            return failure
+
+        parse_form(await request.body())
+        intent_id = new_id("seti")
+        intent = {
+            "id": intent_id,
+            "object": "setup_intent",
+            "client_secret": f"{intent_id}_secret_{secrets.token_hex(8)}",
+            "created": int(time.time()),
+            "livemode": False,
+            "status": "requires_payment_method",
+            "usage": "off_session",
+        }
+        setup_intents[intent_id] = intent
+        return intent
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        """Counters for injected behaviour, useful when checking a benchmark run."""
+        return {
+            **stats,
+            "payment_intents": len(payment_intents),
+            "setup_intents": len(setup_intents),
+            "latency": latency.spec,
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Stripe API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="Latency distribution in ms, e.g. fixed:50, uniform:20,80, lognormal:3.5,0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with a 500 api_error")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with a 429 rate limit error")
+    parser.add_argument("--decline-rate", type=float, default=0.0,
+                        help="Fraction of confirmed PaymentIntents that are declined")
+    parser.add_argument("--decline-codes", default="card_declined:1",
+                        help="Weighted decline codes, e.g. insufficient_funds:3,expired_card:1")
+    parser.add_argument("--requires-action-rate", type=float, default=0.0,
+                        help="Fraction of confirmed PaymentIntents left in requires_action (3DS)")
+    parser.add_argument("--seed", type=int, default=0, help="RNG seed for reproducible runs")
+    args = parser.parse_args()
+
+    app = create_app(
+        latency=LatencyDistribution(args.latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        decline_rate=args.decline_rate,
+        decline_codes=parse_weighted_codes(args.decline_codes),
+        requires_action_rate=args.requires_action_rate,
+        seed=args.seed,
+    )
+
+    import uvicorn
+    print(f"Fake Stripe listening on http://{args.host}:{args.port} (latency={args.latency})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
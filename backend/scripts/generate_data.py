@@ -0,0 +1,371 @@
+"""
+Generate a large, deterministic synthetic dataset for performance work.
+
+Creates users (with a Cash payment method each), restaurants per country with
+their menus, and a history of orders with items. Which users order, which
+restaurants they pick and which dishes they add all follow Zipf-like
+popularity (``--skew``), so a few dishes and restaurants are far more popular
+than the rest, as in real traffic. The same arguments (including --end-date)
+always produce the same rows.
+
+Rows are bulk-loaded with Postgres ``COPY`` in batches, or with batched
+``executemany`` inserts on SQLite and other databases, so millions of rows load
+in minutes. Ids are assigned here (after any existing rows), so child rows need
+no round trip, and Postgres sequences are moved past them afterwards.
+
+All generated users share the password given by --password.
+
+Usage:
+    python scripts/generate_data.py --users 100000 --restaurants-per-country 500 \\
+        --items-per-menu 40 --orders 1000000 [--reset] [--database-url sqlite:///nextbite.db]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import io
+import random
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, List, Sequence
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.engine import Connection
+from app.core.config import settings
+from app.db.database import create_db_engine
+from app.models import Base, MenuItem, Order, OrderItem, PaymentMethod, Restaurant, User
+from app.models.order import OrderStatus
+from app.models.user import UserRole
+
+CUISINES = {
+    "India": ["Spice", "Tandoor", "Masala", "Curry", "Biryani", "Dosa", "Chaat", "Tikka"],
+    "USA": ["Burger", "Diner", "Grill", "Smokehouse", "Pizza", "Taco", "Deli", "Wings"],
+}
+PLACES = ["Garden", "House", "Kitchen", "Corner", "Express", "Palace", "Shack", "Street", "Bistro", "Hub"]
+DISHES = [
+    "Chicken", "Paneer", "Lamb", "Veggie", "Beef", "Fish", "Prawn", "Mushroom", "Tofu", "Egg",
+]
+STYLES = [
+    "Curry", "Burger", "Wrap", "Bowl", "Salad", "Platter", "Skewers", "Sandwich", "Fried Rice", "Noodles",
+    "Pizza", "Tacos", "Soup", "Roll", "Masala",
+]
+
+# Share of historical orders per final status (carts are generated separately)
+STATUS_WEIGHTS = [(OrderStatus.COMPLETED, 0.92), (OrderStatus.CANCELLED, 0.06), (OrderStatus.PENDING, 0.02)]
+
+
+class ZipfSampler:
+    """Picks items with probability proportional to 1 / rank ** skew.
+
+    Ranks are assigned in a shuffled order, so the most popular item is not
+    simply the first one.
+    """
+
+    def __init__(self, items: Sequence, skew: float, rng: random.Random):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cumulative = list(accumulate(1.0 / (rank ** skew) for rank in range(1, len(self.items) + 1)))
+
+    def sample(self, rng: random.Random):
+        return self.items[bisect(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+def batched(rows: Iterable, size: int) -> Iterator[List]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BulkLoader:
+    """Writes row tuples into a table with COPY (Postgres) or batched executemany."""
+
+    def __init__(self, connection: Connection, batch_size: int):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.use_copy = connection.dialect.name == "postgresql"
+        self.counts = {}
+
+    def load(self, table: Table, columns: List[str], rows: Iterable[tuple]):
+        for batch in batched(rows, self.batch_size):
+            if self.use_copy:
+                self._copy(table, columns, batch)
+            else:
+                self.connection.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(batch)
+
+    def _copy(self, table: Table, columns: List[str], batch: List[tuple]):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow([_copy_value(value) for value in row])
+        buffer.seek(0)
+        # Unquoted empty fields are NULL in COPY's CSV format
+        cursor = self.connection.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+
+def _copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (OrderStatus, UserRole)):
+        return value.name  # SQLAlchemy stores enum names
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class DataGenerator:
+    """Deterministic rows for every table, with ids starting after ``first_ids``."""
+
+    def __init__(self, args, first_ids: dict, password_hash: str):
+        self.args = args
+        self.first_ids = first_ids
+        self.password_hash = password_hash
+        self.rng = random.Random(args.seed)
+        self.end = datetime.combine(args.end_date, datetime.min.time(), tzinfo=timezone.utc)
+        self.start = self.end - timedelta(days=args.days)
+        self.countries = args.countries
+        # Filled in as rows are generated, for use by child tables
+        self.users_by_country = {country: [] for country in self.countries}
+        self.restaurants_by_country = {country: [] for country in self.countries}
+        self.menus = {}  # restaurant id -> [(menu item id, price)]
+
+    def timestamp(self) -> datetime:
+        """A time within the history window, busier around lunch and dinner."""
+        day = self.rng.randrange(self.args.days)
+        hour = self.rng.choice((11, 12, 12, 13, 13, 14, 17, 18, 19, 19, 20, 20, 21, 9, 15, 22))
+        return self.start + timedelta(days=day, hours=hour, seconds=self.rng.randrange(3600))
+
+    def users(self) -> Iterator[tuple]:
+        first_id = self.first_ids["users"]
+        for n in range(self.args.users):
+            user_id = first_id + n
+            country = self.countries[n % len(self.countries)]
+            if n < len(self.countries):
+                role = UserRole.MANAGER  # At least one manager per country for the digest
+            else:
+                role = UserRole.MANAGER if self.rng.random() < self.args.manager_share else UserRole.TEAM_MEMBER
+            self.users_by_country[country].append(user_id)
+            created_at = self.start - timedelta(days=self.rng.randrange(1, 365))
+            yield (user_id, f"NB-{_base36(user_id):0>6}", f"Generated User {user_id}",
+                   f"user{user_id}@{self.args.email_domain}", self.password_hash, role, country,
+                   True, created_at, None)
+
+    def payment_methods(self) -> Iterator[tuple]:
+        first_id = self.first_ids["payment_methods"]
+        for n, user_id in enumerate(uid for users in self.users_by_country.values() for uid in users):
+            yield (first_id + n, user_id, f"cash_generated_{user_id}", "CASH", "Cash", True, self.start)
+
+    def restaurants(self) -> Iterator[tuple]:
+        restaurant_id = self.first_ids["restaurants"]
+        for country in self.countries:
+            cuisine = CUISINES.get(country, CUISINES["USA"])
+            for n in range(self.args.restaurants_per_country):
+                name = f"{self.rng.choice(cuisine)} {self.rng.choice(PLACES)} {n + 1}"
+                self.restaurants_by_country[country].append(restaurant_id)
+                yield (restaurant_id, name, f"{name} in {country}", country, None, True,
+                       self.start - timedelta(days=self.rng.randrange(30, 720)))
+                restaurant_id += 1
+
+    def menu_items(self) -> Iterator[tuple]:
+        item_id = self.first_ids["menu_items"]
+        for restaurants in self.restaurants_by_country.values():
+            for restaurant_id in restaurants:
+                menu = self.menus[restaurant_id] = []
+                for n in range(self.args.items_per_menu):
+                    price = round(min(max(self.rng.lognormvariate(2.4, 0.45), 2.0), 60.0), 2)
+                    menu.append((item_id, price))
+                    yield (item_id, restaurant_id, f"{self.rng.choice(DISHES)} {self.rng.choice(STYLES)} {n + 1}",
+                           None, price, None, self.rng.random() > 0.03, self.start)
+                    item_id += 1
+
+    def orders(self) -> Iterator[tuple]:
+        """Yield (order row, [order item rows]) for the history plus open carts."""
+        rng = self.rng
+        user_pickers = {c: ZipfSampler(u, self.args.skew, rng) for c, u in self.users_by_country.items() if u}
+        restaurant_pickers = {c: ZipfSampler(r, self.args.skew, rng)
+                              for c, r in self.restaurants_by_country.items() if r}
+        item_pickers = {}
+        countries = [c for c in self.countries if c in user_pickers and c in restaurant_pickers]
+        if not countries or not self.menus or not any(self.menus.values()):
+            return
+        statuses, weights = zip(*STATUS_WEIGHTS)
+        cumulative_status = list(accumulate(weights))
+
+        order_id = self.first_ids["orders"]
+        item_id = self.first_ids["order_items"]
+        cart_users = set()
+        for n in range(self.args.orders + self.args.carts):
+            country = countries[n % len(countries)]
+            is_cart = n >= self.args.orders
+            if is_cart:
+                # One open cart per user at most
+                user_id = user_pickers[country].sample(rng)
+                if user_id in cart_users:
+                    user_id = rng.choice(self.users_by_country[country])
+                    if user_id in cart_users:
+                        continue
+                cart_users.add(user_id)
+                status = OrderStatus.CART
+                created_at = self.end - timedelta(minutes=rng.randrange(1, 24 * 60))
+            else:
+                user_id = user_pickers[country].sample(rng)
+                status = statuses[bisect(cumulative_status, rng.random() * cumulative_status[-1])]
+                created_at = self.timestamp()
+
+            restaurant_id = restaurant_pickers[country].sample(rng)
+            menu = self.menus[restaurant_id]
+            if not menu:
+                continue
+            picker = item_pickers.get(restaurant_id)
+            if picker is None:
+                picker = item_pickers[restaurant_id] = ZipfSampler(menu, self.args.skew, random.Random(restaurant_id))
+
+            lines = {}
+            for _ in range(rng.randint(1, self.args.max_items_per_order)):
+                menu_item_id, price = picker.sample(rng)
+                quantity, _ = lines.get(menu_item_id, (0, price))
+                lines[menu_item_id] = (quantity + rng.choice((1, 1, 1, 2, 2, 3)), price)
+            items = []
+            for menu_item_id, (quantity, price) in lines.items():
+                items.append((item_id, order_id, menu_item_id, quantity, price))
+                item_id += 1
+            total = round(sum(quantity * price for quantity, price in lines.values()), 2)
+
+            updated_at = None if is_cart else created_at + timedelta(seconds=rng.randrange(20, 900))
+            yield (order_id, user_id, restaurant_id, status, total, None, created_at, updated_at), items
+            order_id += 1
+
+
+def _base36(number: int) -> str:
+    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    result = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        result = digits[remainder] + result
+        if number == 0:
+            return result
+
+
+USER_COLUMNS = ["id", "user_uid", "full_name", "email", "password_hash", "role", "country",
+                "is_active", "created_at", "updated_at"]
+PAYMENT_METHOD_COLUMNS = ["id", "user_id", "stripe_payment_method_id", "last4", "brand", "is_default", "created_at"]
+RESTAURANT_COLUMNS = ["id", "name", "description", "country", "image_url", "is_active", "created_at"]
+MENU_ITEM_COLUMNS = ["id", "restaurant_id", "name", "description", "price", "image_url", "is_available", "created_at"]
+ORDER_COLUMNS = ["id", "user_id", "restaurant_id", "status", "total_amount", "stripe_payment_intent_id",
+                 "created_at", "updated_at"]
+ORDER_ITEM_COLUMNS = ["id", "order_id", "menu_item_id", "quantity", "price_at_time"]
+
+GENERATED_MODELS = [User, PaymentMethod, Restaurant, MenuItem, Order, OrderItem]
+
+
+def next_ids(connection: Connection) -> dict:
+    """First free id per table, so generated rows go after existing ones."""
+    return {
+        model.__tablename__: (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+        for model in GENERATED_MODELS
+    }
+
+
+def reset_tables(connection: Connection):
+    """Delete all rows from every table (the whole schema, since orders are referenced widely)."""
+    if connection.dialect.name == "postgresql":
+        names = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        connection.execute(text(f"TRUNCATE {names} RESTART IDENTITY CASCADE"))
+    else:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+
+def fix_sequences(connection: Connection):
+    """Move Postgres id sequences past the explicitly assigned ids."""
+    if connection.dialect.name != "postgresql":
+        return
+    for model in GENERATED_MODELS:
+        table = model.__tablename__
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"GREATEST((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Defaults to DATABASE_URL")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--countries", type=lambda s: s.split(","), default=["India", "USA"])
+    parser.add_argument("--restaurants-per-country", type=int, default=100)
+    parser.add_argument("--items-per-menu", type=int, default=30)
+    parser.add_argument("--orders", type=int, default=100000, help="Historical (non-cart) orders")
+    parser.add_argument("--carts", type=int, default=1000, help="Open carts (at most one per user)")
+    parser.add_argument("--max-items-per-order", type=int, default=6)
+    parser.add_argument("--days", type=int, default=90, help="Days of order history")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=datetime.now(timezone.utc).date(),
+                        help="History ends at the start of this day (UTC); fix it for identical reruns")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for popularity (0 = uniform)")
+    parser.add_argument("--manager-share", type=float, default=0.02)
+    parser.add_argument("--email-domain", default="generated.nextbite.com")
+    parser.add_argument("--password", default="Generated@123", help="Password of every generated user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per COPY / executemany batch")
+    parser.add_argument("--reset", action="store_true", help="Delete all existing rows first")
+    args = parser.parse_args()
+
+    url = args.database_url or settings.DATABASE_URL
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    password_hash = User.hash_password(args.password)
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        if connection.dialect.name == "sqlite":
+            # Durability doesn't matter for a bulk load that can simply be rerun
+            connection.exec_driver_sql("PRAGMA synchronous=OFF")
+        if args.reset:
+            reset_tables(connection)
+        generator = DataGenerator(args, next_ids(connection), password_hash)
+        loader = BulkLoader(connection, args.batch_size)
+
+        def load(model, columns, rows):
+            step = time.perf_counter()
+            loader.load(model.__table__, columns, rows)
+            print(f"   ✓ {model.__tablename__}: {loader.counts.get(model.__tablename__, 0)} rows "
+                  f"in {time.perf_counter() - step:.1f}s")
+
+        print(f"Generating data into {engine.url.render_as_string(hide_password=True)}")
+        load(User, USER_COLUMNS, generator.users())
+        load(PaymentMethod, PAYMENT_METHOD_COLUMNS, generator.payment_methods())
+        load(Restaurant, RESTAURANT_COLUMNS, generator.restaurants())
+        load(MenuItem, MENU_ITEM_COLUMNS, generator.menu_items())
+
+        # Orders and their items are generated together and loaded batch by batch,
+        # so memory stays bounded by --batch-size
+        step = time.perf_counter()
+        for batch in batched(generator.orders(), args.batch_size):
+            loader.load(Order.__table__, ORDER_COLUMNS, (order for order, _ in batch))
+            loader.load(OrderItem.__table__, ORDER_ITEM_COLUMNS, (item for _, items in batch for item in items))
+        print(f"   ✓ orders: {loader.counts.get('orders', 0)} rows, "
+              f"order_items: {loader.counts.get('order_items', 0)} rows in {time.perf_counter() - step:.1f}s")
+
+        fix_sequences(connection)
+
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        connection.commit()
+    engine.dispose()
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
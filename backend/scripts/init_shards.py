@@ -0,0 +1,118 @@
+"""
+Set up the country shards listed in DATABASE_SHARDS.
+
+For every shard this creates the tables and, on Postgres, moves the id
+sequences of the shard's tables to the shard's own range (shard N starts at
+N * SHARD_ID_STRIDE), so ids stay unique across shards. SQLite has no
+sequences; SQLite shards are only meant for local testing.
+
+With --move, each sharded country's restaurants, menu items, orders and order
+items are copied (with their ids) from DATABASE_URL to its shard, together
+with reference rows for the users who placed those orders, and then deleted
+from DATABASE_URL. Rows already on the shard are skipped, so an interrupted
+move can simply be run again. Run it with the app stopped (or the payment and
+email workers drained), then restart the app so the catalog cache starts empty.
+
+Usage:
+    python scripts/init_shards.py [--move] [--batch-size 5000]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from sqlalchemy import Table, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import ColumnElement
+from app.db.database import engine
+from app.db.shards import Shard, shard_map
+from app.models import Base, MenuItem, Order, OrderItem, Restaurant, User
+from app.models.email_outbox import EmailOutbox
+from app.models.payment_event import PaymentEvent
+
+# Tables whose ids a shard hands out itself
+SHARD_SEQUENCE_TABLES = [
+    Restaurant.__tablename__, MenuItem.__tablename__, Order.__tablename__, OrderItem.__tablename__,
+    EmailOutbox.__tablename__, PaymentEvent.__tablename__,
+]
+
+
+def offset_sequences(connection: Connection, shard: Shard):
+    """Start the shard's id sequences at its range (never moving one backwards)."""
+    for table in SHARD_SEQUENCE_TABLES:
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"GREATEST((SELECT COALESCE(MAX(id), 0) FROM {table}), :first_id))"
+        ), {"first_id": shard.first_id})
+
+
+def copy_rows(source: Connection, target: Connection, table: Table, condition: ColumnElement,
+              batch_size: int, overrides: dict = None) -> int:
+    """Copy the rows of ``table`` matching ``condition``, skipping ids the target already has."""
+    copied = 0
+    result = source.execution_options(yield_per=batch_size).execute(select(table).where(condition))
+    for partition in result.mappings().partitions():
+        rows = [{**row, **(overrides or {})} for row in partition]
+        ids = [row["id"] for row in rows]
+        existing = set(target.execute(select(table.c.id).where(table.c.id.in_(ids))).scalars())
+        rows = [row for row in rows if row["id"] not in existing]
+        if rows:
+            target.execute(table.insert(), rows)
+            copied += len(rows)
+    return copied
+
+
+def move_country(country: str, shard: Shard, batch_size: int):
+    restaurant_ids = select(Restaurant.id).where(Restaurant.country == country).scalar_subquery()
+    order_ids = select(Order.id).where(Order.restaurant_id.in_(restaurant_ids)).scalar_subquery()
+    user_ids = select(Order.user_id).where(Order.restaurant_id.in_(restaurant_ids)).distinct().scalar_subquery()
+
+    # Parents before children, so foreign keys hold on the shard
+    tables = [
+        (User.__table__, User.id.in_(user_ids), {"password_hash": "!"}),  # Logins stay on DATABASE_URL
+        (Restaurant.__table__, Restaurant.country == country, None),
+        (MenuItem.__table__, MenuItem.restaurant_id.in_(restaurant_ids), None),
+        (Order.__table__, Order.restaurant_id.in_(restaurant_ids), None),
+        (OrderItem.__table__, OrderItem.order_id.in_(order_ids), None),
+    ]
+    with engine.connect() as source, shard.engine.begin() as target:
+        for table, condition, overrides in tables:
+            copied = copy_rows(source, target, table, condition, batch_size, overrides)
+            print(f"  {country}: copied {copied} {table.name}")
+
+    # Only once the shard has committed; users stay, they own the login
+    with engine.begin() as source:
+        for table, condition, _ in reversed(tables[1:]):
+            deleted = source.execute(table.delete().where(condition)).rowcount
+            print(f"  {country}: deleted {deleted} {table.name} from DATABASE_URL")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--move", action="store_true",
+                        help="Move each sharded country's restaurants and orders out of DATABASE_URL")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if not shard_map.enabled:
+        print("DATABASE_SHARDS is not set; nothing to do")
+        return
+
+    shards = {shard.name: shard for shard in shard_map.by_country.values()}
+    for shard in shards.values():
+        Base.metadata.create_all(bind=shard.engine)
+        if shard.engine.dialect.name == "postgresql":
+            with shard.engine.begin() as connection:
+                offset_sequences(connection, shard)
+            print(f"Shard {shard.name}: tables ready, ids start at {shard.first_id}")
+        else:
+            print(f"Shard {shard.name}: tables ready (SQLite: ids are not offset, use for local testing only)")
+
+    if args.move:
+        for country, shard in shard_map.by_country.items():
+            print(f"Moving {country} to shard {shard.name}...")
+            move_country(country, shard, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Monthly range partitioning of orders by created_at, and archival of old months.
+
+Commands (Postgres only; run against DATABASE_URL and every shard in
+DATABASE_SHARDS, or a single one with --shard):
+
+    setup    Convert ``orders`` into a table partitioned by month (one
+             transaction; the table is locked while its rows are copied) and
+             create the ``archive`` schema. Run once, with the app stopped.
+    create   Create the partitions for the current and the next --ahead months.
+             Run it from cron; rows that landed in the default partition
+             meanwhile are moved into their month.
+    archive  Detach months that ended more than --retention-months ago and
+             only hold completed or cancelled orders into archive.orders, and
+             move their items to archive.order_items. The API still returns
+             them in order history (app/db/archive.py).
+    list     Show live and archived partitions with estimated row counts.
+
+Months are calendar months in UTC. Keep the retention longer than the refund
+window: webhooks only settle live orders.
+
+Usage:
+    python scripts/partitions.py setup [--ahead 3]
+    python scripts/partitions.py create [--ahead 3]
+    python scripts/partitions.py archive [--retention-months 12] [--dry-run]
+    python scripts/partitions.py list [--shard India]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.db.archive import ARCHIVE_SCHEMA
+from app.db.shards import DEFAULT_SHARD, shard_map
+from app.models.order import Order, OrderStatus
+
+DEFAULT_PARTITION = "orders_default"
+
+# Orders that can still change; a month holding any of these stays live
+OPEN_STATUSES = (OrderStatus.CART.name, OrderStatus.PENDING.name)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"orders_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month of a partition created by this script, None for anything else."""
+    try:
+        return datetime.strptime(name, "orders_p%Y_%m").date()
+    except ValueError:
+        return None
+
+
+def bounds(month: date) -> str:
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def is_partitioned(connection: Connection) -> bool:
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('public.orders'))"
+    )).scalar()
+
+
+def partitions(connection: Connection, parent: str) -> List[Tuple[str, float]]:
+    """(name, estimated rows) of each partition of ``parent``, by name."""
+    return connection.execute(text(
+        "SELECT c.relname, c.reltuples FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:parent) ORDER BY c.relname"
+    ), {"parent": parent}).all()
+
+
+def create_partition(connection: Connection, month: date) -> bool:
+    """Create ``month``'s partition; False if it already exists."""
+    name = partition_name(month)
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": f"public.{name}"}).scalar():
+        return False
+
+    in_month = (f"created_at >= '{month.isoformat()}' AND created_at < '{add_months(month, 1).isoformat()}'")
+    stray = connection.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE {in_month}")).scalar()
+    if not stray:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF orders {bounds(month)}"))
+        return True
+
+    # The default partition may not hold rows of a new partition's range, so
+    # take it out while its rows for this month move over
+    connection.execute(text(f"ALTER TABLE orders DETACH PARTITION {DEFAULT_PARTITION}"))
+    connection.execute(text(f"CREATE TABLE {name} PARTITION OF orders {bounds(month)}"))
+    connection.execute(text(f"INSERT INTO orders SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+    connection.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+    connection.execute(text(f"ALTER TABLE orders ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    print(f"  moved {stray} orders from {DEFAULT_PARTITION} to {name}")
+    return True
+
+
+def create_ahead(connection: Connection, ahead: int, first_month: Optional[date] = None):
+    this_month = month_start(datetime.now(timezone.utc).date())
+    month = first_month or this_month
+    while month <= add_months(this_month, ahead):
+        if create_partition(connection, month):
+            print(f"  created {partition_name(month)}")
+        month = add_months(month, 1)
+
+
+def create_archive(connection: Connection):
+    connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    if not connection.execute(text("SELECT to_regclass(:name)"), {"name": f"{ARCHIVE_SCHEMA}.orders"}).scalar():
+        # No defaults: nothing is ever inserted here, partitions are attached
+        connection.execute(text(
+            f"CREATE TABLE {ARCHIVE_SCHEMA}.orders (LIKE public.orders) PARTITION BY RANGE (created_at)"
+        ))
+        connection.execute(text(f"ALTER TABLE {ARCHIVE_SCHEMA}.orders ADD PRIMARY KEY (id, created_at)"))
+        # Same definitions as the live indexes, so attached partitions reuse theirs
+        for index in Order.__table__.indexes:
+            if index.dialect_options["postgresql"]["where"] is not None:
+                continue  # Partial indexes cover carts, which are never archived
+            columns = ", ".join(column.name for column in index.columns)
+            connection.execute(text(f"CREATE INDEX ON {ARCHIVE_SCHEMA}.orders ({columns})"))
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.order_items (LIKE public.order_items INCLUDING INDEXES)"
+    ))
+
+
+def setup(connection: Connection, ahead: int):
+    connection.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+    if is_partitioned(connection):
+        print("  orders is already partitioned")
+        create_archive(connection)
+        create_ahead(connection, ahead)
+        return
+
+    connection.execute(text("LOCK TABLE orders IN ACCESS EXCLUSIVE MODE"))
+    connection.execute(text("UPDATE orders SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL"))
+    first = connection.execute(text("SELECT min(created_at) FROM orders")).scalar()
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence('orders', 'id')")).scalar()
+
+    connection.execute(text("ALTER TABLE orders RENAME TO orders_unpartitioned"))
+    # A partitioned table's unique keys include the partition key, so nothing
+    # can reference orders.id alone any more
+    for table, constraint in connection.execute(text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = 'orders_unpartitioned'::regclass"
+    )).all():
+        connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+
+    connection.execute(text(
+        "CREATE TABLE orders (LIKE orders_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+    ))
+    connection.execute(text("ALTER TABLE orders ALTER COLUMN created_at SET NOT NULL"))
+    connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF orders DEFAULT"))
+    first_month = month_start(first.astimezone(timezone.utc).date()) if first else None
+    create_ahead(connection, ahead, first_month)
+
+    copied = connection.execute(text("INSERT INTO orders SELECT * FROM orders_unpartitioned")).rowcount
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY orders.id"))
+    connection.execute(text("DROP TABLE orders_unpartitioned"))
+    # After the copy (faster), and after the drop (the old indexes had these names)
+    connection.execute(text("ALTER TABLE orders ADD PRIMARY KEY (id, created_at)"))
+    for index in Order.__table__.indexes:
+        index.create(connection)
+    connection.execute(text("ALTER TABLE orders ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    connection.execute(text("ALTER TABLE orders ADD FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)"))
+    print(f"  orders partitioned by month, {copied} rows copied")
+    create_archive(connection)
+
+
+def archive(connection: Connection, retention_months: int, dry_run: bool):
+    connection.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+    if not is_partitioned(connection):
+        print("  orders is not partitioned; run setup first")
+        return
+    cutoff = add_months(month_start(datetime.now(timezone.utc).date()), -retention_months)
+    statuses = ", ".join(f"'{status}'" for status in OPEN_STATUSES)
+
+    for name, _ in partitions(connection, "public.orders"):
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        open_orders = connection.execute(text(
+            f"SELECT count(*) FROM {name} WHERE status::text IN ({statuses})"
+        )).scalar()
+        if open_orders:
+            print(f"  {name}: kept, {open_orders} cart or pending orders")
+            continue
+        if dry_run:
+            print(f"  {name}: would be archived")
+            continue
+
+        items = connection.execute(text(
+            f"INSERT INTO {ARCHIVE_SCHEMA}.order_items "
+            f"SELECT * FROM order_items WHERE order_id IN (SELECT id FROM {name})"
+        )).rowcount
+        connection.execute(text(f"DELETE FROM order_items WHERE order_id IN (SELECT id FROM {name})"))
+        connection.execute(text(f"ALTER TABLE orders DETACH PARTITION {name}"))
+        connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        connection.execute(text(
+            f"ALTER TABLE {ARCHIVE_SCHEMA}.orders ATTACH PARTITION {ARCHIVE_SCHEMA}.{name} {bounds(month)}"
+        ))
+        print(f"  {name}: archived with {items} items")
+
+
+def list_partitions(connection: Connection):
+    for parent in ("public.orders", f"{ARCHIVE_SCHEMA}.orders"):
+        print(f"  {parent}:")
+        rows = partitions(connection, parent)
+        if not rows:
+            print("    (none)")
+        for name, estimate in rows:
+            print(f"    {name:<20} ~{max(int(estimate), 0)} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["setup", "create", "archive", "list"])
+    parser.add_argument("--ahead", type=int, default=3, help="Months to create partitions for in advance")
+    parser.add_argument("--retention-months", type=int, default=12,
+                        help="Months of orders to keep live (archive only)")
+    parser.add_argument("--dry-run", action="store_true", help="Show what archive would do")
+    parser.add_argument("--shard", help="Only this shard (a country in DATABASE_SHARDS, or 'default')")
+    args = parser.parse_args()
+
+    # Countries sharing a database share a shard, named after the first of them
+    shards = {shard.name: shard for shard in shard_map.all()}
+    if args.shard:
+        shard = shard_map.default if args.shard == DEFAULT_SHARD else shard_map.by_country.get(args.shard)
+        if shard is None:
+            parser.error(f"unknown shard {args.shard!r}")
+        shards = {shard.name: shard}
+
+    for name, shard in shards.items():
+        print(f"Shard {name}:")
+        if shard.engine.dialect.name != "postgresql":
+            print("  skipped: partitioning needs Postgres")
+            continue
+        with shard.engine.begin() as connection:
+            if args.command == "setup":
+                setup(connection, args.ahead)
+            elif args.command == "create":
+                if is_partitioned(connection):
+                    connection.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+                    create_ahead(connection, args.ahead)
+                else:
+                    print("  orders is not partitioned; run setup first")
+            elif args.command == "archive":
+                archive(connection, args.retention_months, args.dry_run)
+            else:
+                list_partitions(connection)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Queue the manager daily-digest emails.
+
+Aggregates one day's completed orders per country and queues one digest per
+active manager in the email outbox; the app's outbox sender delivers them.
+Intended to run once a day from cron, e.g.:
+
+    15 0 * * * cd /srv/nextbite/backend && python scripts/send_daily_digest.py
+
+Usage:
+    python scripts/send_daily_digest.py [--date YYYY-MM-DD]   (default: yesterday, UTC)
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from app.jobs.daily_digest import run_daily_digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue manager daily-digest emails")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="Day to summarize (UTC), defaults to yesterday")
+    args = parser.parse_args()
+
+    day = args.date or (datetime.now(timezone.utc).date() - timedelta(days=1))
+    queued = run_daily_digest(day)
+    print(f"✓ Queued {queued} digest email(s) for {day.isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time. Tests use their own engines, never the app's
+# database, and no shards.
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.pop("DATABASE_SHARDS", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ.setdefault("JWT_SECRET_KEY", "tests")
@@ -0,0 +1,46 @@
+import asyncio
+from app.core.metrics import REGISTRY
+from app.middleware.concurrency import AdaptiveConcurrencyLimiter
+
+
+async def noop_app(scope, receive, send):
+    pass
+
+
+async def wait_for_312(awaitable, timeout):
+    """``asyncio.wait_for`` as of Python 3.12, which lets a cancellation through
+    even when the awaited future already has its result (as a plain await does;
+    the test never reaches the timeout)."""
+    return await awaitable
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on(monkeypatch):
+    monkeypatch.setattr(asyncio, "wait_for", wait_for_312)
+
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(noop_app, initial_limit=1, min_limit=1)
+        assert await limiter._acquire() is None
+        waiting = asyncio.create_task(limiter._acquire())
+        await asyncio.sleep(0)  # Queued behind the held slot
+
+        # The slot is handed to the waiter, which is cancelled before it resumes
+        limiter._release()
+        waiting.cancel()
+        try:
+            await waiting
+        except asyncio.CancelledError:
+            pass
+        else:
+            limiter._release()  # It got the slot after all; done with it
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.in_flight == 0
+    assert not limiter._waiters
+
+
+def test_gauges_report_the_latest_limiter():
+    AdaptiveConcurrencyLimiter(noop_app, initial_limit=4)
+    AdaptiveConcurrencyLimiter(noop_app, initial_limit=7)  # A second one must not re-register
+
+    assert "nextbite_concurrency_limit 7" in REGISTRY.expose()
@@ -0,0 +1,171 @@
+"""
+The email outbox sender against a real SMTP server (aiosmtpd) and an in-memory
+SQLite outbox.
+"""
+import asyncio
+import socket
+from datetime import datetime, timedelta, timezone
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.db.database import create_db_engine
+from app.models import Base
+from app.models.email_outbox import EmailOutbox, EmailStatus
+from app.services.email import queue_email
+from app.services.email_outbox import EmailOutboxSender
+
+REJECTED = "bounce@example.com"
+
+
+class RecordingHandler:
+    """Keeps delivered messages; refuses REJECTED with a temporary error."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == REJECTED:
+            return "450 Mailbox busy, try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        self.sessions.add(id(session))
+        self.messages.append((envelope.rcpt_tos[0], envelope.content.decode()))
+        return "250 Message accepted for delivery"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(settings, "SMTP_HOST", controller.hostname)
+    monkeypatch.setattr(settings, "SMTP_PORT", controller.port)
+    monkeypatch.setattr(settings, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_USER", None)
+    monkeypatch.setattr(settings, "SMTP_PASSWORD", None)
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def outbox():
+    """Session factory of a fresh outbox database."""
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def queue(session_factory, *recipients):
+    db = session_factory()
+    try:
+        for recipient in recipients:
+            queue_email(db, recipient, f"Hello {recipient}", f"<p>Secret for {recipient}</p>")
+        db.commit()
+    finally:
+        db.close()
+
+
+def outbox_rows(session_factory):
+    db = session_factory()
+    try:
+        return {row.to_email: row for row in db.query(EmailOutbox).all()}
+    finally:
+        db.close()
+
+
+def run(sender, session_factory) -> int:
+    async def process():
+        try:
+            return await sender._process_outbox(session_factory)
+        finally:
+            await sender.close()
+
+    return asyncio.run(process())
+
+
+def test_batch_is_sent_over_one_session(smtp_server, outbox):
+    recipients = [f"user{i}@example.com" for i in range(5)]
+    queue(outbox, *recipients)
+    sender = EmailOutboxSender(batch_size=10)
+
+    assert run(sender, outbox) == 5
+
+    assert [to for to, _ in smtp_server.messages] == recipients
+    assert len(smtp_server.sessions) == 1
+    assert sender.stats["connections"] == 1
+    assert sender.stats["sent"] == 5
+    assert outbox_rows(outbox) == {}
+
+
+def test_failure_is_retried_with_backoff(smtp_server, outbox):
+    queue(outbox, "first@example.com", REJECTED, "last@example.com")
+    sender = EmailOutboxSender(batch_size=10, retry_base_seconds=30.0)
+    before = datetime.now(timezone.utc)
+
+    run(sender, outbox)
+
+    # The refusal doesn't stop the rest of the batch
+    assert [to for to, _ in smtp_server.messages] == ["first@example.com", "last@example.com"]
+    rows = outbox_rows(outbox)
+    assert list(rows) == [REJECTED]
+    row = rows[REJECTED]
+    assert row.status == EmailStatus.PENDING
+    assert row.attempts == 1
+    assert "Mailbox busy" in row.last_error
+    retry_at = row.next_attempt_at.replace(tzinfo=timezone.utc)
+    assert before + timedelta(seconds=29) <= retry_at <= datetime.now(timezone.utc) + timedelta(seconds=31)
+    assert sender.stats["retried"] == 1
+
+    # Not due yet: nothing to claim
+    assert run(sender, outbox) == 0
+
+
+def test_message_fails_after_max_attempts(smtp_server, outbox):
+    queue(outbox, REJECTED)
+    sender = EmailOutboxSender(batch_size=10, max_attempts=3, retry_base_seconds=0.0)
+
+    for attempt in range(1, 4):
+        assert run(sender, outbox) == 1
+        row = outbox_rows(outbox)[REJECTED]
+        assert row.attempts == attempt
+        assert row.status == (EmailStatus.FAILED if attempt == 3 else EmailStatus.PENDING)
+
+    # Given up: never claimed again, and the body (credentials, maybe) is gone
+    assert run(sender, outbox) == 0
+    assert row.html_content == ""
+    assert sender.stats == {"sent": 0, "retried": 2, "failed": 1, "connections": 3}
+
+
+def test_batch_stops_before_outliving_its_lease(smtp_server, outbox):
+    smtp_server.delay = 0.2
+    queue(outbox, "a@example.com", "b@example.com", "c@example.com")
+    # Each message may take 3 x 0.3s, so only one fits in a 1s lease
+    sender = EmailOutboxSender(batch_size=10, smtp_timeout=0.3, lease_seconds=1.0)
+
+    run(sender, outbox)
+
+    assert [to for to, _ in smtp_server.messages] == ["a@example.com"]
+    rows = outbox_rows(outbox)
+    assert sorted(rows) == ["b@example.com", "c@example.com"]
+    # Handed back untried, due right away
+    assert all(row.attempts == 0 for row in rows.values())
+    assert all(row.next_attempt_at.replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc)
+               for row in rows.values())
+
+
+def test_default_lease_covers_a_whole_batch():
+    sender = EmailOutboxSender(batch_size=50, smtp_timeout=30.0)
+    assert sender.lease_seconds >= 50 * sender.send_timeout
@@ -0,0 +1,71 @@
+"""
+The export endpoints against a file-backed SQLite database with a real
+connection pool.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from app.core.security import create_access_token
+from app.db.database import create_db_engine, get_db
+from app.models import Base, Order, Restaurant, User
+from app.models.order import OrderStatus
+from app.models.user import UserRole
+from app.routes import orders, users
+from app.services import exports
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        User(id=1, email="admin@example.com", password_hash="x", role=UserRole.ADMIN, country="USA"),
+        Restaurant(id=1, name="Diner", country="USA"),
+    ])
+    session.add(Order(user_id=1, restaurant_id=1, status=OrderStatus.COMPLETED, total_amount=10.0))
+    session.commit()
+    session.close()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def test_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(exports, "_export_session", lambda shard: session_factory())
+    app = FastAPI()
+    app.include_router(users.router)
+    app.include_router(orders.router)
+    app.dependency_overrides[get_db] = test_db
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path, rows", [("/users/export", "_user_rows"), ("/orders/export", "_order_rows")])
+def test_export_holds_one_connection_while_streaming(engine, client, monkeypatch, path, rows):
+    load_rows = getattr(exports, rows)
+    checked_out = []
+
+    def sampled_rows(*args):
+        for row in load_rows(*args):
+            checked_out.append(engine.pool.checkedout())
+            yield row
+
+    monkeypatch.setattr(exports, rows, sampled_rows)
+    token = create_access_token({"sub": "1"})
+
+    response = client.get(path, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.text
+    # The export's own session only: the request's session gave its connection back
+    assert checked_out == [1]
@@ -0,0 +1,111 @@
+"""
+Applying the payment event inbox to orders, on an in-memory SQLite database.
+"""
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.db.database import create_db_engine
+from app.models import Base, Order, PaymentEvent, Restaurant, User
+from app.models.order import OrderStatus
+from app.models.payment_event import PaymentEventStatus
+from app.services import payment_events
+from app.services.payment_events import process_pending_events
+
+
+@pytest.fixture
+def db():
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session.add_all([
+        User(id=1, email="owner@example.com", password_hash="x"),
+        Restaurant(id=1, name="Diner", country="USA"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_order(db, status: OrderStatus, intent_id=None) -> Order:
+    order = Order(user_id=1, restaurant_id=1, status=status, total_amount=10.0, stripe_payment_intent_id=intent_id)
+    db.add(order)
+    db.commit()
+    return order
+
+
+def add_event(db, event_type: str, intent_id: str, number: int = 1) -> PaymentEvent:
+    event = PaymentEvent(
+        stripe_event_id=f"evt_{intent_id}_{number}", type=event_type,
+        payload={"type": event_type, "data": {"object": {"object": "payment_intent", "id": intent_id}}},
+    )
+    db.add(event)
+    db.commit()
+    return event
+
+
+def test_failed_payment_reopens_the_cart(db):
+    order = add_order(db, OrderStatus.PENDING, "pi_1")
+    add_event(db, "payment_intent.payment_failed", "pi_1")
+
+    assert process_pending_events(db, 10) == 1
+    db.refresh(order)
+    assert order.status == OrderStatus.CART
+
+
+def test_failed_payment_cancels_when_the_user_has_another_cart(db):
+    order = add_order(db, OrderStatus.PENDING, "pi_1")
+    cart = add_order(db, OrderStatus.CART)
+    add_event(db, "payment_intent.payment_failed", "pi_1")
+
+    process_pending_events(db, 10)
+    db.refresh(order)
+    db.refresh(cart)
+    assert order.status == OrderStatus.CANCELLED
+    assert cart.status == OrderStatus.CART
+
+
+def test_failed_payments_in_one_batch_reopen_one_cart(db):
+    first = add_order(db, OrderStatus.PENDING, "pi_1")
+    second = add_order(db, OrderStatus.PENDING, "pi_2")
+    add_event(db, "payment_intent.payment_failed", "pi_1")
+    add_event(db, "payment_intent.payment_failed", "pi_2")
+
+    process_pending_events(db, 10)
+    db.refresh(first)
+    db.refresh(second)
+    assert (first.status, second.status) == (OrderStatus.CART, OrderStatus.CANCELLED)
+
+
+def test_stale_failure_leaves_a_completed_order_alone(db):
+    order = add_order(db, OrderStatus.COMPLETED, "pi_1")
+    add_order(db, OrderStatus.CART)
+    add_event(db, "payment_intent.payment_failed", "pi_1")
+
+    process_pending_events(db, 10)
+    db.refresh(order)
+    assert order.status == OrderStatus.COMPLETED
+    assert db.query(PaymentEvent).one().status == PaymentEventStatus.PROCESSED
+
+
+def test_failing_event_is_retried_with_backoff(db, monkeypatch):
+    def broken_apply_event(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(payment_events, "apply_event", broken_apply_event)
+    monkeypatch.setattr(settings, "PAYMENT_EVENT_RETRY_SECONDS", 30.0)
+    add_order(db, OrderStatus.PENDING, "pi_1")
+    add_event(db, "payment_intent.succeeded", "pi_1")
+    before = datetime.now(timezone.utc)
+
+    assert process_pending_events(db, 10) == 1
+    event = db.query(PaymentEvent).one()
+    assert event.status == PaymentEventStatus.PENDING
+    assert event.attempts == 1
+    assert event.last_error == "boom"
+    retry_at = event.next_attempt_at.replace(tzinfo=timezone.utc)
+    assert before + timedelta(seconds=29) <= retry_at <= datetime.now(timezone.utc) + timedelta(seconds=31)
+
+    # Not due yet: left out of the next batch
+    assert process_pending_events(db, 10) == 0
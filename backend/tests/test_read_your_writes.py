@@ -0,0 +1,58 @@
+import asyncio
+import time
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.db.replicas import _wrote_recently, parse_read_after_token, read_after_token, replica_set
+from app.middleware.read_your_writes import ReadYourWritesMiddleware
+
+
+def test_token_round_trip():
+    written_at = time.time()
+    user_id, parsed_at = parse_read_after_token(read_after_token(42, written_at))
+    assert user_id == 42
+    assert abs(parsed_at - written_at) < 0.001
+
+
+def test_tampered_token_is_rejected():
+    token = read_after_token(42, time.time())
+    user_and_time, _, signature = token.rpartition(".")
+    assert parse_read_after_token(f"7.{user_and_time.split('.')[1]}.{signature}") is None
+    assert parse_read_after_token(token[:-1] + ("A" if token[-1] != "A" else "B")) is None
+    assert parse_read_after_token("garbage") is None
+
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=ReadYourWritesMiddleware(app)), base_url="http://test")
+
+
+async def respond(send, body: bytes):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+def test_write_response_carries_a_token_that_pins_reads(monkeypatch):
+    monkeypatch.setattr(replica_set, "pin_seconds", 5.0)
+    engine = create_engine("sqlite://")
+
+    async def app(scope, receive, send):
+        if scope["method"] == "POST":
+            session = Session(engine)
+            session.info["user_id"] = 42  # As get_current_user does
+            session.commit()
+            session.close()
+            await respond(send, b"written")
+        else:
+            await respond(send, b"primary" if _wrote_recently(42) else b"replica")
+
+    async def scenario():
+        async with client_for(app) as client:
+            assert "x-read-after" not in (await client.get("/")).headers
+            token = (await client.post("/")).headers["x-read-after"]
+            assert (await client.get("/", headers={"X-Read-After": token})).text == "primary"
+            assert (await client.get("/")).text == "replica"
+
+            monkeypatch.setattr(replica_set, "pin_seconds", 0.0)
+            assert (await client.get("/", headers={"X-Read-After": token})).text == "replica"
+
+    asyncio.run(scenario())
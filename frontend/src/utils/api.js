@@ -14,6 +14,11 @@ export const setLastLoginTime = () => {
     lastLoginTime = Date.now();
 };
 
+// Read-your-writes token from the API's last write response. Sending it back
+// keeps our reads on the primary database (not a lagging replica) for a few
+// seconds after a write
+let readAfter = null;
+
 // Add a request interceptor to add the auth token to requests
 api.interceptors.request.use(
     (config) => {
@@ -21,6 +26,9 @@ api.interceptors.request.use(
         if (token) {
             config.headers.Authorization = `Bearer ${token}`;
         }
+        if (readAfter) {
+            config.headers['X-Read-After'] = readAfter;
+        }
         return config;
     },
     (error) => {
@@ -30,7 +38,13 @@ api.interceptors.request.use(
 
 // Add a response interceptor to handle auth errors
 api.interceptors.response.use(
-    (response) => response,
+    (response) => {
+        const token = response.headers['x-read-after'];
+        if (token) {
+            readAfter = token;
+        }
+        return response;
+    },
     (error) => {
         const isAuthRequest = error.config?.url?.includes('/auth/');
         const justLoggedIn = Date.now() - lastLoginTime < 5000;